@@ -0,0 +1,57 @@
+""" A module containing tests guarding the import time of the modules """
+
+import os
+import subprocess
+import sys
+import unittest
+
+
+# The modules whose import is guarded, and the heavy packages which must not
+# be imported along with them.
+GUARDED_MODULES = ['Serializable', 'Teachers', 'TeachersDataBase', 'LinearSolvers']
+HEAVY_PACKAGES = ['h5py', 'matplotlib', 'scipy']
+
+# The maximum time in seconds the guarded modules may add to the import of numpy.
+IMPORT_TIME_BUDGET = 0.25
+
+
+def runPython(code):
+    """ Utility method for running the given code in a fresh interpreter """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=directory, check=True,
+        capture_output=True, text=True)
+    return output.stdout.strip()
+
+
+class ImportTimeTest(unittest.TestCase):
+    """ Test class guarding against regressions of the import time """
+
+    def testHeavyPackagesAreNotImported(self):
+        """ Test that importing the modules doesn't import the heavy packages """
+        code = (
+            'import sys\n'
+            'import {}\n'
+            'print(",".join(name for name in {!r} if name in sys.modules))'
+        ).format(', '.join(GUARDED_MODULES), HEAVY_PACKAGES)
+
+        self.assertEqual('', runPython(code))
+
+    def testImportTime(self):
+        """ Test that the modules are imported within the time budget """
+        # Measure the best of a few fresh interpreters, the import of numpy
+        # is measured separately, since the modules can't do without it.
+        code = (
+            'import time\n'
+            'import numpy\n'
+            't1 = time.perf_counter()\n'
+            'import {}\n'
+            'print(time.perf_counter() - t1)'
+        ).format(', '.join(GUARDED_MODULES))
+
+        import_time = min(float(runPython(code)) for _ in range(3))
+        self.assertLess(import_time, IMPORT_TIME_BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
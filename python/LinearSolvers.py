@@ -1,9 +1,6 @@
 """ This module implements methods for solving linear matrix equations """
 
 import numpy
-from scipy.linalg import solve_triangular
-from scipy.sparse import csr_matrix
-from scipy.sparse.linalg import spsolve
 
 import time
 
@@ -89,6 +86,9 @@ class LinearSolvers(object):
 		use_cholesky = (cholesky_L is not None and self.directInverseCholesky())
 
 		if use_cholesky:
+			# Imported on first use, since importing scipy is slow.
+			from scipy.linalg import solve_triangular
+
 			# We already have the decomposition; thus solve L y = b for y first.
 			y = solve_triangular(cholesky_L, rhs_vector, lower=True)
 
@@ -126,9 +126,13 @@ class LinearSolvers(object):
 			raise Exception(
 				'The matrix is not sparse enough. Use one of the other methods instead.')
 
+		# Imported on first use, since importing scipy is slow.
+		from scipy.sparse import csr_matrix
+		from scipy.sparse.linalg import spsolve
+
 		# Convert the input LHS matrix to sparse and solve.
 		lhs_sparse = csr_matrix(lhs_matrix)
-		solution = spsolve(lhs_sparse, b)
+		solution = spsolve(lhs_sparse, rhs_vector)
 
 		return solution
 
@@ -256,41 +260,40 @@ class LinearSolvers(object):
 
 		return solution
 
-# Define matrix dimension and reate an identity matrix first.
-dimension = 5000
-A = numpy.eye(dimension)
-
-# Make it tridiagonal but still diagonally dominent (to keep it positive def.).
-for index in range(23):
-	A[index, index + 1] = 0.1 * numpy.random.uniform(low=0.0, high=1.0, size=(1,))
-	A[index + 1, index] = A[index, index + 1]
-
-# Random vector as b.
-b = numpy.random.uniform(low=0.0, high=1.0, size=(dimension,))
-
-# Create a solvers object and solve the problem using direct inverse w/ Cholesky
-# decomposition and then CG and gradient descent method.
-solvers = LinearSolvers(
-	direct_inverse_cholesky=True, 
-	iterative_solver_tolerance=1e-10)
-t0 = time.time()
-solution_direct_cholesky = solvers.solveDirectInverse(A, b)
-print('Direct inverse using Cholesky (s):', numpy.round(time.time() - t0, decimals=3))
-t0 = time.time()
-solution_sparse = solvers.solveDirectInverseSparse(A, b)
-print('Direct inverse using sparse solver (s):', numpy.round(time.time() - t0, decimals=3))
-t0 = time.time()
-solution_cg = solvers.solveConjugateGradient(A, b)
-print('Solution using CG (s):', numpy.round(time.time() - t0, decimals=3))
-t0 = time.time()
-solution_descent = solvers.solveGradientDescent(A, b)
-print('Solution using gradient descent (s):', numpy.round(time.time() - t0, decimals=3))
-
-ref_solution = numpy.linalg.solve(A, b)
-
-print('CG vs ref', numpy.linalg.norm(ref_solution - solution_cg))
-print('Gradient vs ref', numpy.linalg.norm(ref_solution - solution_descent))
-print('Direct cholesky vs ref', numpy.linalg.norm(ref_solution - solution_direct_cholesky))
-print('Sparse solver vs ref', numpy.linalg.norm(ref_solution - solution_sparse))
-
-		
+if __name__ == '__main__':
+	# Define matrix dimension and reate an identity matrix first.
+	dimension = 5000
+	A = numpy.eye(dimension)
+
+	# Make it tridiagonal but still diagonally dominent (to keep it positive def.).
+	for index in range(23):
+		A[index, index + 1] = 0.1 * numpy.random.uniform(low=0.0, high=1.0, size=(1,))
+		A[index + 1, index] = A[index, index + 1]
+
+	# Random vector as b.
+	b = numpy.random.uniform(low=0.0, high=1.0, size=(dimension,))
+
+	# Create a solvers object and solve the problem using direct inverse w/ Cholesky
+	# decomposition and then CG and gradient descent method.
+	solvers = LinearSolvers(
+		direct_inverse_cholesky=True, 
+		iterative_solver_tolerance=1e-10)
+	t0 = time.time()
+	solution_direct_cholesky = solvers.solveDirectInverse(A, b)
+	print('Direct inverse using Cholesky (s):', numpy.round(time.time() - t0, decimals=3))
+	t0 = time.time()
+	solution_sparse = solvers.solveDirectInverseSparse(A, b)
+	print('Direct inverse using sparse solver (s):', numpy.round(time.time() - t0, decimals=3))
+	t0 = time.time()
+	solution_cg = solvers.solveConjugateGradient(A, b)
+	print('Solution using CG (s):', numpy.round(time.time() - t0, decimals=3))
+	t0 = time.time()
+	solution_descent = solvers.solveGradientDescent(A, b)
+	print('Solution using gradient descent (s):', numpy.round(time.time() - t0, decimals=3))
+
+	ref_solution = numpy.linalg.solve(A, b)
+
+	print('CG vs ref', numpy.linalg.norm(ref_solution - solution_cg))
+	print('Gradient vs ref', numpy.linalg.norm(ref_solution - solution_descent))
+	print('Direct cholesky vs ref', numpy.linalg.norm(ref_solution - solution_direct_cholesky))
+	print('Sparse solver vs ref', numpy.linalg.norm(ref_solution - solution_sparse))
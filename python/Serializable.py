@@ -1,41 +1,33 @@
-""" Module implementing a type of object which can be saved to an HDF5 file """
+""" Module implementing a type of object which can be saved to a file, by default an HDF5 file """
 
 from abc import ABC, abstractmethod
-import ast
-import h5py
-import numpy
+from collections import namedtuple
 import re
 
+from SerializationBackends import serializationBackend
+
+
+# The pattern splitting a property name into words, compiled once.
+_word_regex_pattern = re.compile("[^A-Za-z]+")
+
+# A single entry of the serialization schema of a class: the name of the
+# property as stored in a file, and the (unbound) getter returning its value.
+SerializableProperty = namedtuple('SerializableProperty', ['name', 'getter'])
+
 
 def toCamelCase(chars):
 	"""
 	Utility method for converting the given characters to camel case.
 	"""
-	word_regex_pattern = re.compile("[^A-Za-z]+")
-	words = word_regex_pattern.split(chars)
+	words = _word_regex_pattern.split(chars)
 	return ''.join(w.lower() if i == 0 else w.title() for i, w in enumerate(words))
 
 
-def processHdf5Data(hdf5_dataset_value):
-	"""
-	Utility method for processing data in an hdf5 dataset. If the data
-	is a byte-string, the method will decode it. Else, the data will
-	be returned as it is.
-	"""
-	if isinstance(hdf5_dataset_value, bytes):
-		hdf5_dataset_value = hdf5_dataset_value.decode("utf-8")
-
-	# If the value is a string, it can also be a dict saved as a string.
-	# Thus, call literal eval of ast to make sure the final data type
-	# is correct.
-	if isinstance(hdf5_dataset_value, str):
-		hdf5_dataset_value = ast.literal_eval(hdf5_dataset_value)
-
-	return hdf5_dataset_value
-
-
 class Serializable(ABC):
 
+	# No instance dict, so that the subclasses can define their slots.
+	__slots__ = ()
+
 	@abstractmethod
 	def _serializableProperties(cls):
 		"""
@@ -50,46 +42,95 @@ class Serializable(ABC):
 			list of str
 		"""
 
-	def saveToFile(self, hdf5_filename):
+	@classmethod
+	def _serializationSchema(cls):
 		"""
-		A method for saving the serializable properties to a file.
+		The serialization schema of the class, i.e. the serializable properties
+		which have a getter, together with the getter itself. The schema is
+		computed on first use and cached on the class, so that the reflection
+		(name conversion and getter lookup) is not repeated on each save or read.
+
+		:returns:
+			The serializable properties of the class which have a getter.
+		:rtype:
+			tuple of :class:`SerializableProperty`
 		"""
-		# Fetch the names of the serializable properties.
-		properties_names = self._serializableProperties()
-
-		# Reduce the properties to those which have a getter.
-		existing_properties = [
-			name for name in properties_names
-			if getattr(self, toCamelCase(name), None) is not None
-		]
-
-		# Fetch the property values which are there.
-		properties_values = [getattr(self, toCamelCase(name))() for name in existing_properties]
-
-		# Save the data to an hdf5 file and close it.
-		h5_file = h5py.File(hdf5_filename, "w")
-		for name, value in zip(existing_properties, properties_values):
-			# Convert dicts to string, since hdf5 doesn't natively support them.
-			if isinstance(value, dict):
-				value = str(value)
-			h5_file.create_dataset(name, data=value)
-		h5_file.close()
+		# Look up in the class' own namespace, so that a subclass never reuses
+		# the schema of its base class.
+		schema = cls.__dict__.get('_serialization_schema')
+		if schema is None:
+			schema = tuple(
+				SerializableProperty(name, getattr(cls, toCamelCase(name)))
+				for name in cls._serializableProperties()
+				if getattr(cls, toCamelCase(name), None) is not None
+			)
+			cls._serialization_schema = schema
+
+		return schema
 
 	@classmethod
-	def instantiateFromFile(cls, hdf5_filename):
+	def _serializablePropertiesNames(cls):
+		"""
+		:returns:
+			The names of all serializable properties of the class, cached on
+			the class after the first call.
+		:rtype:
+			frozenset of str
 		"""
-		Create a new instance of this class by reading the data from an hdf5 file.
+		names = cls.__dict__.get('_serializable_properties_names')
+		if names is None:
+			names = frozenset(cls._serializableProperties())
+			cls._serializable_properties_names = names
+
+		return names
+
+	def saveToFile(self, filename, backend=None):
+		"""
+		A method for saving the serializable properties to a file. The file
+		format is selected according to the extension of the file name: HDF5
+		(``.hdf5``, ``.h5`` and unknown extensions), uncompressed numpy
+		(``.npz``) or msgpack (``.msgpack``, ``.mpk``).
+
+		:param filename:
+			The name of the file to write.
+		:type filename:
+			str
+
+		:param backend:
+			The backend with which to write the file, overriding the selection
+			by extension.
+			|DEFAULT| None
+		:type backend:
+			None | :class:`SerializationBackends.SerializationBackend`
 		"""
-		properties_names = cls._serializableProperties()
-		read_h5 = h5py.File(hdf5_filename, 'r')
+		# Fetch the property values using the cached schema.
+		properties = {prop.name: prop.getter(self) for prop in self._serializationSchema()}
 
-		# Check which names actually exist in the file and fetch the values.
-		existing_properties_dict = {
-			key: processHdf5Data(read_h5[key][()])
-			for key in read_h5.keys() if key in properties_names
-		}
+		if backend is None:
+			backend = serializationBackend(filename)
+		backend.write(filename, properties)
 
-		read_h5.close()
+	@classmethod
+	def instantiateFromFile(cls, filename, backend=None):
+		"""
+		Create a new instance of this class by reading the data from a file
+		written by :meth:`saveToFile`.
+
+		:param filename:
+			The name of the file to read.
+		:type filename:
+			str
+
+		:param backend:
+			The backend with which to read the file, overriding the selection
+			by extension.
+			|DEFAULT| None
+		:type backend:
+			None | :class:`SerializationBackends.SerializationBackend`
+		"""
+		if backend is None:
+			backend = serializationBackend(filename)
+		existing_properties_dict = backend.read(filename, cls._serializablePropertiesNames())
 
 		# Return a new instance.
 		return cls(**existing_properties_dict)
@@ -0,0 +1,379 @@
+""" Module implementing the file formats in which a Serializable object can be saved """
+
+from abc import ABC, abstractmethod
+import ast
+from collections.abc import Mapping
+import numpy
+import os
+import struct
+import zipfile
+
+
+def processHdf5Data(hdf5_dataset_value):
+	"""
+	Utility method for processing data in an hdf5 dataset. If the data
+	is a byte-string, the method will decode it. Else, the data will
+	be returned as it is.
+	"""
+	if isinstance(hdf5_dataset_value, bytes):
+		hdf5_dataset_value = hdf5_dataset_value.decode("utf-8")
+
+	# If the value is a string, it can also be a dict saved as a string.
+	# Thus, call literal eval of ast to make sure the final data type
+	# is correct.
+	if isinstance(hdf5_dataset_value, str):
+		hdf5_dataset_value = ast.literal_eval(hdf5_dataset_value)
+
+	return hdf5_dataset_value
+
+
+class SerializationBackend(ABC):
+	"""
+	Base class of a file format in which the serializable properties of an
+	object can be written and read back. A backend is selected according to
+	the extension of the file name, see :func:`serializationBackend`.
+	"""
+
+	# The file name extensions handled by the backend, in lower case.
+	extensions = ()
+
+	@abstractmethod
+	def write(self, filename, properties):
+		"""
+		Write the given properties to a file.
+
+		:param filename:
+			The name of the file to write.
+		:type filename:
+			str
+
+		:param properties:
+			The values of the properties to write, keyed by property name.
+		:type properties:
+			dict of type {str: object}
+		"""
+
+	@abstractmethod
+	def read(self, filename, names):
+		"""
+		Read the properties back from a file.
+
+		:param filename:
+			The name of the file to read.
+		:type filename:
+			str
+
+		:param names:
+			The names of the properties to read. Other data in the file is ignored.
+		:type names:
+			set of str
+
+		:returns:
+			The values of the properties found in the file, keyed by property name.
+		:rtype:
+			dict of type {str: object}
+		"""
+
+
+class Hdf5Backend(SerializationBackend):
+	"""
+	Backend writing each property as a dataset of an HDF5 file.
+	"""
+
+	extensions = ('.hdf5', '.h5')
+
+	def write(self, filename, properties):
+		"""
+		Write the given properties to an HDF5 file.
+		"""
+		# Imported on first use, since importing h5py is slow.
+		import h5py
+
+		h5_file = h5py.File(filename, "w")
+		for name, value in properties.items():
+			# Convert dicts to string, since hdf5 doesn't natively support them.
+			if isinstance(value, Mapping):
+				value = str(dict(value))
+			h5_file.create_dataset(name, data=value)
+		h5_file.close()
+
+	def read(self, filename, names):
+		"""
+		Read the properties from an HDF5 file.
+		"""
+		import h5py
+
+		read_h5 = h5py.File(filename, 'r')
+
+		# Check which names actually exist in the file and fetch the values.
+		properties = {
+			key: processHdf5Data(read_h5[key][()])
+			for key in read_h5.keys() if key in names
+		}
+
+		read_h5.close()
+
+		return properties
+
+
+class NpzBackend(SerializationBackend):
+	"""
+	Backend writing each property as an array of an uncompressed numpy ``.npz``
+	archive. Since the archive is not compressed, the arrays in it can be
+	memory-mapped when read back, see ``mmap_mode``.
+	"""
+
+	extensions = ('.npz',)
+
+	def __init__(self, mmap_mode=None):
+		"""
+		:param mmap_mode:
+			If given, the arrays are memory-mapped from the file with this mode
+			instead of being read into memory. See ``numpy.memmap``.
+			|DEFAULT| None
+		:type mmap_mode:
+			None | str
+		"""
+		self._mmap_mode = mmap_mode
+
+	def write(self, filename, properties):
+		"""
+		Write the given properties to an uncompressed npz file.
+		"""
+		arrays = {}
+		for name, value in properties.items():
+			# Properties which are not set are left out, and take their
+			# default value when read back.
+			if value is None:
+				continue
+
+			# Dicts and strings are stored as their literal representation.
+			if isinstance(value, Mapping):
+				value = repr(dict(value))
+			elif isinstance(value, str):
+				value = repr(value)
+			array = numpy.asarray(value)
+
+			# Object arrays could only be read back with pickle, which is not allowed.
+			if array.dtype.kind == 'O':
+				raise Exception('The property %s can\'t be written to an npz file.' % name)
+			arrays[name] = array
+
+		# Write through a file object, so that numpy does not append an
+		# extension to the given file name.
+		with open(filename, 'wb') as f:
+			numpy.savez(f, **arrays)
+
+	def read(self, filename, names):
+		"""
+		Read the properties from an npz file.
+		"""
+		arrays = loadNpz(filename, mmap_mode=self._mmap_mode)
+
+		properties = {}
+		for name, array in arrays.items():
+			if name not in names:
+				continue
+
+			# Literal representations are stored as 0-dimensional strings.
+			if array.ndim == 0 and array.dtype.kind == 'U':
+				properties[name] = ast.literal_eval(array.item())
+			else:
+				properties[name] = array
+
+		return properties
+
+
+class MsgpackBackend(SerializationBackend):
+	"""
+	Backend writing all properties into a single compact msgpack document.
+	Numpy arrays are stored as their raw bytes. Requires the ``msgpack``
+	package.
+	"""
+
+	extensions = ('.msgpack', '.mpk')
+
+	# The key marking an encoded numpy array in the document.
+	_ndarray_key = '__ndarray__'
+
+	def write(self, filename, properties):
+		"""
+		Write the given properties to a msgpack file.
+		"""
+		msgpack = _importMsgpack()
+		with open(filename, 'wb') as f:
+			f.write(msgpack.packb(properties, default=self._encode, use_bin_type=True))
+
+	def read(self, filename, names):
+		"""
+		Read the properties from a msgpack file.
+		"""
+		msgpack = _importMsgpack()
+		with open(filename, 'rb') as f:
+			document = msgpack.unpackb(
+				f.read(), object_hook=self._decode, raw=False, strict_map_key=False)
+
+		return {name: value for name, value in document.items() if name in names}
+
+	@classmethod
+	def _encode(cls, value):
+		"""
+		Encode the values msgpack doesn't natively support.
+		"""
+		if isinstance(value, numpy.ndarray):
+			array = numpy.ascontiguousarray(value)
+			return {cls._ndarray_key: [array.dtype.str, list(array.shape), array.tobytes()]}
+		if isinstance(value, numpy.generic):
+			return value.item()
+		if isinstance(value, Mapping):
+			return dict(value)
+
+		raise TypeError('Cannot serialize an object of type %s with msgpack.' % type(value).__name__)
+
+	@classmethod
+	def _decode(cls, document):
+		"""
+		Decode the numpy arrays encoded by :meth:`_encode`.
+		"""
+		if len(document) == 1 and cls._ndarray_key in document:
+			dtype, shape, data = document[cls._ndarray_key]
+			return numpy.frombuffer(data, dtype=dtype).reshape(shape).copy()
+
+		return document
+
+
+def _importMsgpack():
+	"""
+	Utility method for importing the optional msgpack package.
+	"""
+	try:
+		import msgpack
+	except ImportError:
+		raise Exception('The msgpack package is required for the msgpack file format.')
+
+	return msgpack
+
+
+def loadNpz(filename, mmap_mode=None):
+	"""
+	Utility method for reading all arrays of an npz file. If ``mmap_mode`` is
+	given, the arrays which are stored uncompressed are memory-mapped from the
+	file, which ``numpy.load`` does not support for npz files.
+
+	:param filename:
+		The name of the npz file.
+	:type filename:
+		str
+
+	:param mmap_mode:
+		The mode with which to memory-map the arrays, or None to read them
+		into memory.
+		|DEFAULT| None
+	:type mmap_mode:
+		None | str
+
+	:returns:
+		The arrays of the file, keyed by name.
+	:rtype:
+		dict of type {str: ``numpy.ndarray``}
+	"""
+	if mmap_mode is None:
+		with numpy.load(filename) as npz_file:
+			return {name: npz_file[name] for name in npz_file.files}
+
+	arrays = {}
+	with zipfile.ZipFile(filename) as zip_file, open(filename, 'rb') as f:
+		for info in zip_file.infolist():
+			name = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+			array = None
+			if info.compress_type == zipfile.ZIP_STORED:
+				array = _memoryMapNpyMember(filename, f, info, mmap_mode)
+
+			# Fall back on reading compressed and object arrays into memory.
+			if array is None:
+				with zip_file.open(info) as member:
+					array = numpy.lib.format.read_array(member, allow_pickle=False)
+
+			arrays[name] = array
+
+	return arrays
+
+
+def _memoryMapNpyMember(filename, f, info, mmap_mode):
+	"""
+	Utility method for memory-mapping an uncompressed npy member of a zip archive.
+	Returns None if the member cannot be memory-mapped.
+	"""
+	# Skip the local file header of the member: its fixed part is 30 bytes,
+	# followed by the name and the extra field whose lengths are stored at
+	# the end of the fixed part.
+	f.seek(info.header_offset + 26)
+	name_length, extra_length = struct.unpack('<HH', f.read(4))
+	f.seek(info.header_offset + 30 + name_length + extra_length)
+
+	# Read the npy header of the array.
+	version = numpy.lib.format.read_magic(f)
+	if version == (1, 0):
+		shape, fortran_order, dtype = numpy.lib.format.read_array_header_1_0(f)
+	elif version == (2, 0):
+		shape, fortran_order, dtype = numpy.lib.format.read_array_header_2_0(f)
+	else:
+		return None
+
+	if dtype.hasobject:
+		return None
+
+	# Empty arrays cannot be memory-mapped.
+	if numpy.prod(shape) == 0:
+		return numpy.empty(shape, dtype=dtype, order='F' if fortran_order else 'C')
+
+	return numpy.memmap(
+		filename, dtype=dtype, mode=mmap_mode, shape=shape,
+		order='F' if fortran_order else 'C', offset=f.tell())
+
+
+# The registered backends, keyed by file name extension. Files with an
+# unknown extension are written in the HDF5 format.
+_backends_by_extension = {}
+_default_backend = Hdf5Backend()
+
+
+def registerSerializationBackend(backend):
+	"""
+	Register a backend for the file name extensions it handles. A previously
+	registered backend for the same extensions is replaced.
+
+	:param backend:
+		The backend to register.
+	:type backend:
+		:class:`SerializationBackend`
+	"""
+	for extension in backend.extensions:
+		_backends_by_extension[extension.lower()] = backend
+
+
+def serializationBackend(filename):
+	"""
+	:returns:
+		The backend registered for the extension of the given file name, or
+		the HDF5 backend if none is registered.
+	:rtype:
+		:class:`SerializationBackend`
+	"""
+	extension = os.path.splitext(filename)[1].lower()
+	return _backends_by_extension.get(extension, _default_backend)
+
+
+def registeredSerializationBackends():
+	"""
+	:returns:
+		The registered backends, keyed by file name extension.
+	:rtype:
+		dict of type {str: :class:`SerializationBackend`}
+	"""
+	return dict(_backends_by_extension)
+
+
+registerSerializationBackend(_default_backend)
+registerSerializationBackend(NpzBackend())
+registerSerializationBackend(MsgpackBackend())
@@ -0,0 +1,108 @@
+"""
+Benchmark comparing the round-trip latency and file size of the file formats
+in which a Serializable object can be saved
+"""
+
+import numpy
+import os
+import tempfile
+import time
+
+from SerializationBackends import registeredSerializationBackends
+from Teachers import TeacherArya
+
+
+def syntheticTeacherArya(number_of_students, seed=None):
+	"""
+	Utility method for creating a teacher Arya with random grades and a random
+	getting-along matrix for the given number of students.
+
+	:param number_of_students:
+		The number of students of the teacher.
+	:type number_of_students:
+		int
+
+	:param seed:
+		The seed for the random number generator.
+		|DEFAULT| No seed, always fresh numbers.
+	:type seed:
+		None | int
+
+	:returns:
+		The teacher.
+	:rtype:
+		:class:`TeacherArya`
+	"""
+	random_number_generator = numpy.random.default_rng(seed)
+	names = ['student%d' % index for index in range(number_of_students)]
+
+	def randomGrades():
+		grades = random_number_generator.integers(1, 11, size=number_of_students)
+		return dict(zip(names, grades.tolist()))
+
+	return TeacherArya(
+		student_math_grades=randomGrades(),
+		student_art_grades=randomGrades(),
+		student_science_grades=randomGrades(),
+		students_getting_along_matrix=random_number_generator.random(
+			(number_of_students, number_of_students)))
+
+
+def benchmarkSerializationBackends(roster_sizes=(10, 100, 1000), repeats=5):
+	"""
+	Measure the save and read latency and the file size for each registered
+	file format and roster size. The best time of the repeats is reported.
+
+	:param roster_sizes:
+		The numbers of students for which to run the benchmark.
+	:type roster_sizes:
+		iterable of int
+
+	:param repeats:
+		The number of times each round trip is repeated.
+	:type repeats:
+		int
+
+	:returns:
+		One result per file format and roster size, as a tuple of the extension,
+		the number of students, the save time and read time in seconds, and the
+		file size in bytes.
+	:rtype:
+		list of tuple of (str, int, float, float, int)
+	"""
+	results = []
+	with tempfile.TemporaryDirectory() as directory:
+		for number_of_students in roster_sizes:
+			teacher = syntheticTeacherArya(number_of_students, seed=number_of_students)
+
+			# One round trip per file format, whatever its extensions.
+			extensions = {}
+			for extension, backend in sorted(registeredSerializationBackends().items()):
+				extensions.setdefault(type(backend).__name__, extension)
+
+			for extension in sorted(extensions.values()):
+				filename = os.path.join(directory, 'teacher' + extension)
+				save_times = []
+				read_times = []
+				for _ in range(repeats):
+					t0 = time.perf_counter()
+					teacher.saveToFile(filename)
+					save_times.append(time.perf_counter() - t0)
+
+					t0 = time.perf_counter()
+					TeacherArya.instantiateFromFile(filename)
+					read_times.append(time.perf_counter() - t0)
+
+				results.append((
+					extension, number_of_students, min(save_times), min(read_times),
+					os.path.getsize(filename)))
+
+	return results
+
+
+if __name__ == '__main__':
+	print('{:>10} {:>10} {:>12} {:>12} {:>12}'.format(
+		'Format', 'Students', 'Save (ms)', 'Read (ms)', 'Size (kB)'))
+	for extension, number_of_students, save_time, read_time, size in benchmarkSerializationBackends():
+		print('{:>10} {:>10} {:>12.3f} {:>12.3f} {:>12.1f}'.format(
+			extension, number_of_students, 1e3 * save_time, 1e3 * read_time, size / 1e3))
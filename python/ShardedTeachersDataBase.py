@@ -0,0 +1,376 @@
+""" Module implementing a database of teachers partitioned across worker processes """
+
+import multiprocessing
+import numpy
+import zlib
+
+from Teachers import TeacherArya
+from Teachers import TeacherJessica
+from TeachersDataBase import TeachersDataBase
+from TeachersDataBase import iterateTeacherRecords
+from TeachersDataBase import teacherFromRecord
+from TeachersDataBaseNpz import iterateTeachersNpz
+from TeachersDataBaseSnapshot import formatDataBaseInfo
+from TeachersStatistics import combineSuccessMoments
+
+
+def shardOfTeacher(teacher_id, number_of_shards):
+	"""
+	:returns:
+		The shard of the given teacher ID. The partition only depends on the
+		ID, and not on the process, unlike the built-in ``hash`` of strings.
+	:rtype:
+		int
+	"""
+	return zlib.crc32(teacher_id.encode('utf-8')) % number_of_shards
+
+
+def _serveShard(connection):
+	"""
+	Utility method run by the process of a shard: holds a database of the
+	teachers of the shard, and answers the requests sent on the connection
+	until it is asked to stop.
+	"""
+	database = TeachersDataBase(teachers=[], teacher_ids=[])
+
+	while True:
+		request, arguments = connection.recv()
+		if request == 'stop':
+			connection.send(('result', None))
+			return
+
+		try:
+			if request == 'insert':
+				# Teachers read from a file replace those with the same ID. The
+				# teachers of a JSON file are sent as their records, which are
+				# parsed here. A teacher which cannot be added is reported, and
+				# doesn't prevent the others from being added.
+				result = []
+				for teacher_id, teacher in arguments:
+					try:
+						if isinstance(teacher, dict):
+							teacher = teacherFromRecord(teacher)
+						if database.retrieveTeacher(teacher_id) is not None:
+							database.removeTeacher(teacher_id)
+						database.addTeacher(teacher_id, teacher)
+					except Exception as error:
+						result.append((teacher_id, str(error)))
+			elif request == 'add':
+				database.addTeacher(*arguments)
+				result = None
+			elif request == 'retrieve':
+				result = database.retrieveTeacher(arguments)
+			elif request == 'summary':
+				result = database.determineSuccessMoments(), database.totalNumberOfStudents()
+			else:
+				result = getattr(database, request)(*arguments)
+
+			connection.send(('result', result))
+		except Exception as error:
+			connection.send(('error', str(error)))
+
+
+class ShardedTeachersDataBase(object):
+
+	def __init__(self, number_of_shards=None, chunk_size=256):
+		"""
+		This class implements a database of teachers partitioned across worker
+		processes. Each teacher ID is assigned to a shard by a hash of the ID,
+		and each shard is a process holding a :class:`TeachersDataBase` of its
+		teachers, so that the memory of the teachers is spread over processes
+		and the shards work in parallel.
+
+		The aggregate statistics are computed by scatter-gather: the request is
+		sent to all shards before any answer is awaited, and the partial moments
+		of the shards are combined, see
+		:func:`TeachersStatistics.combineSuccessMoments`.
+
+		Teachers are pickled to and from the shards, so that they keep the
+		dtype and format of their getting-along matrix: a retrieved teacher is
+		a copy, whose changes do not change the database.
+
+		Use the database as a context manager, or call :meth:`close`.
+
+		:param number_of_shards:
+			The number of shards.
+			|DEFAULT| The number of processors.
+		:type number_of_shards:
+			None | int
+
+		:param chunk_size:
+			The number of teachers sent to a shard at a time while populating
+			the database from a file.
+			|DEFAULT| 256
+		:type chunk_size:
+			int
+		"""
+		self._chunk_size = chunk_size
+		self._connections = []
+		self._processes = []
+
+		for _ in range(number_of_shards or multiprocessing.cpu_count()):
+			connection, shard_connection = multiprocessing.Pipe()
+			process = multiprocessing.Process(target=_serveShard, args=(shard_connection,), daemon=True)
+			process.start()
+			shard_connection.close()
+			self._connections.append(connection)
+			self._processes.append(process)
+
+	def numberOfShards(self):
+		"""
+		:returns:
+			The number of shards.
+		:rtype:
+			int
+		"""
+		return len(self._connections)
+
+	def _shardConnection(self, teacher_id):
+		"""
+		Utility method returning the connection to the shard of a teacher ID.
+		"""
+		return self._connections[shardOfTeacher(teacher_id, len(self._connections))]
+
+	@staticmethod
+	def _receive(connection):
+		"""
+		Utility method receiving the answer of a shard, raising its error.
+		"""
+		status, result = connection.recv()
+		if status == 'error':
+			raise Exception(result)
+
+		return result
+
+	def _request(self, connection, request, arguments=()):
+		"""
+		Utility method sending a request to one shard and waiting for the answer.
+		"""
+		connection.send((request, arguments))
+		return self._receive(connection)
+
+	def _scatterGather(self, request, arguments=()):
+		"""
+		Utility method sending a request to all shards, and then gathering
+		their answers.
+		"""
+		for connection in self._connections:
+			connection.send((request, arguments))
+
+		# Receive all answers before raising an error, so that no answer is
+		# left in a connection.
+		answers = []
+		for connection in self._connections:
+			answers.append(connection.recv())
+		for status, result in answers:
+			if status == 'error':
+				raise Exception(result)
+
+		return [result for _, result in answers]
+
+	def addTeacher(self, teacher_id, teacher):
+		"""
+		A method for adding a teacher to the database.
+
+		:param teacher_id:
+			An ID that uniquely determines the teacher.
+		:type teacher_id:
+			str
+
+		:param teacher:
+			The teacher to add to the database.
+		:type teacher:
+			:class:`TeacherJessica` | :class:`TeacherArya`
+		"""
+		if not isinstance(teacher, (TeacherJessica, TeacherArya)):
+			raise Exception('Teacher must be an instance of either TeacherJessica or TeacherArya.')
+
+		self._request(self._shardConnection(teacher_id), 'add', (teacher_id, teacher))
+
+	def removeTeacher(self, teacher_id):
+		"""
+		A method for removing a teacher from the database.
+
+		:param teacher_id:
+			An ID that uniquely determines the teacher to remove.
+		:type teacher_id:
+			str
+		"""
+		self._request(self._shardConnection(teacher_id), 'removeTeacher', (teacher_id,))
+
+	def retrieveTeacher(self, teacher_id):
+		"""
+		:returns:
+			A copy of the teacher corresponding to the given ID if found in the
+			database, None otherwise.
+		:rtype:
+			None | :class:`TeacherJessica` | :class`TeacherArya`
+		"""
+		return self._request(self._shardConnection(teacher_id), 'retrieve', teacher_id)
+
+	def populateFromFile(self, json_filename):
+		"""
+		Method for populating the database from the given file, written by
+		:meth:`TeachersDataBase.saveToFile`, on top of its current teachers.
+		The file is read in this process and the teachers are sent to their
+		shards in chunks. A chunk is sent to each shard without waiting for
+		the shard to insert it, so that the shards insert their teachers in
+		parallel while the file is read; a shard has at most one chunk
+		waiting at a time. A teacher which cannot be added doesn't prevent the
+		others from being added: an exception reporting each of them is raised
+		once the whole file is read.
+
+		:param json_filename:
+			The JSON, JSON Lines or npz file from which the teachers data should
+			be read from.
+		:type json_filename:
+			str
+		"""
+		# The records of a JSON file are parsed by the shards, in parallel.
+		if json_filename.lower().endswith('.npz'):
+			teachers = iterateTeachersNpz(json_filename)
+		else:
+			teachers = iterateTeacherRecords(json_filename)
+
+		chunks = [[] for _ in self._connections]
+		waiting = [False] * len(self._connections)
+		errors = []
+		failures = []
+
+		def awaitChunk(shard):
+			# The errors are raised once all answers are received, so that no
+			# answer is left in a connection.
+			if waiting[shard]:
+				status, result = self._connections[shard].recv()
+				waiting[shard] = False
+				if status == 'error':
+					errors.append(result)
+				else:
+					failures.extend(result)
+
+		def sendChunk(shard):
+			awaitChunk(shard)
+			self._connections[shard].send(('insert', chunks[shard]))
+			waiting[shard] = True
+			chunks[shard] = []
+
+		try:
+			for teacher_id, teacher in teachers:
+				shard = shardOfTeacher(teacher_id, len(self._connections))
+				chunks[shard].append((teacher_id, teacher))
+				if len(chunks[shard]) >= self._chunk_size:
+					sendChunk(shard)
+
+			for shard, chunk in enumerate(chunks):
+				if chunk:
+					sendChunk(shard)
+		finally:
+			# Also when the file can't be read.
+			for shard in range(len(self._connections)):
+				awaitChunk(shard)
+
+		if errors:
+			raise Exception(errors[0])
+		if failures:
+			raise Exception('The teachers could not be added: %s' % '; '.join(
+				'%s: %s' % failure for failure in failures))
+
+	def numberOfEntries(self):
+		"""
+		:returns:
+			The number of teacher entries in the database.
+		:rtype:
+			int
+		"""
+		return sum(self._scatterGather('numberOfEntries'))
+
+	def _successMoments(self):
+		"""
+		Utility method returning the combined moments of the success of all shards.
+		"""
+		count, mean, sum_of_squares = combineSuccessMoments(self._scatterGather('determineSuccessMoments'))
+		if count == 0:
+			raise Exception('There are no teachers to calculate statistics of.')
+
+		return count, mean, sum_of_squares
+
+	def determineSuccessAverage(self):
+		"""
+		:returns:
+			The average success rate of the teachers in the database.
+		:rtype:
+			float
+		"""
+		return self._successMoments()[1]
+
+	def determineSuccessStandardDeviation(self):
+		"""
+		:returns:
+			The standard deviation of the success rate of the teachers.
+		:rtype:
+			float
+		"""
+		count, _, sum_of_squares = self._successMoments()
+		return float(numpy.sqrt(sum_of_squares / count))
+
+	def totalNumberOfStudents(self):
+		"""
+		:returns:
+			The total number of students across all teachers.
+		:rtype:
+			int
+		"""
+		return sum(self._scatterGather('totalNumberOfStudents'))
+
+	def numberOfTeachersPerType(self):
+		"""
+		:returns:
+			The number of teachers of each type, keyed by the class name.
+		:rtype:
+			dict of type {str: int}
+		"""
+		counts = {}
+		for shard_counts in self._scatterGather('numberOfTeachersPerType'):
+			for teacher_type, count in shard_counts.items():
+				counts[teacher_type] = counts.get(teacher_type, 0) + count
+
+		return counts
+
+	def reportInfo(self):
+		"""
+		A method for reporting all the information about the teachers in the
+		database, gathered from all shards with a single request each.
+		"""
+		summaries = self._scatterGather('summary')
+
+		count, mean, sum_of_squares = combineSuccessMoments(moments for moments, _ in summaries)
+		if count == 0:
+			raise Exception('There are no teachers to calculate statistics of.')
+
+		total_number_of_students = sum(number_of_students for _, number_of_students in summaries)
+		print(formatDataBaseInfo(
+			count,
+			numpy.round(total_number_of_students / count, decimals=2),
+			total_number_of_students,
+			mean,
+			float(numpy.sqrt(sum_of_squares / count))))
+
+	def close(self):
+		"""
+		Stop the processes of the shards.
+		"""
+		for connection in self._connections:
+			connection.send(('stop', ()))
+		for connection, process in zip(self._connections, self._processes):
+			connection.recv()
+			connection.close()
+			process.join()
+
+		self._connections = []
+		self._processes = []
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exception_info):
+		self.close()
@@ -1,14 +1,89 @@
 # This example class has been written by Arya Winther,
 # 2022.
 
-import matplotlib.pyplot as plt
+from collections.abc import Mapping
+from itertools import repeat
 import numpy
+import sys
 import textwrap
 
 from Serializable import Serializable
+from TeachersReports import drawGradesChart
+from TeachersReports import teacherReportTitle
+from TeachersReports import writeGradesReport
 
+
+# The teacher classes, keyed by class name, see registerTeacherType.
+_teacher_types = {}
+
+# The number of grades checked at a time by checkStudentGradesArray, small
+# enough for a block to stay in the cache.
+_grades_check_block_size = 1 << 18
+
+
+def registerTeacherType(teacher_class):
+	"""
+	Class decorator registering a teacher class under its name, so that it can
+	be looked up by name when teachers are read from a file.
+
+	:param teacher_class:
+		The teacher class.
+	:type teacher_class:
+		type
+
+	:returns:
+		The teacher class.
+	:rtype:
+		type
+	"""
+	_teacher_types[teacher_class.__name__] = teacher_class
+	return teacher_class
+
+
+def teacherType(teacher_type_name):
+	"""
+	:param teacher_type_name:
+		The name of a registered teacher class.
+	:type teacher_type_name:
+		str
+
+	:returns:
+		The teacher class registered under the given name.
+	:rtype:
+		type
+	"""
+	teacher_class = _teacher_types.get(teacher_type_name)
+	if teacher_class is None:
+		raise Exception('Unknown teacher type: %s.' % teacher_type_name)
+
+	return teacher_class
+
+
+@registerTeacherType
 class TeacherJessica(Serializable):
 
+	# The subjects taught by the teacher, in the order of the columns of the
+	# grades matrix.
+	_subjects = ('math', 'art')
+
+	# The number of decimals to which the average grades are rounded, None
+	# for no rounding.
+	_average_grade_decimals = None
+
+	# The teachers have no instance dict, so that a database of many teachers
+	# only holds their data.
+	__slots__ = (
+		'_student_names',
+		'_student_indices',
+		'_grades',
+		'_students_getting_along_matrix',
+		'_getting_along_sum_of_squares',
+		'_getting_along_updated_sum_of_squares',
+		'_derived_metrics',
+		'_observers',
+		'_last_change',
+	)
+
 	@classmethod
 	def _serializableProperties(cls):
 		"""
@@ -50,18 +125,45 @@ class TeacherJessica(Serializable):
 			A matrix which describes how well each student gets along with each
 			other and themselves. The getting-along metric is a float between
 			0 and 1: 1 is perfect and 0 not hating each other. The matrix can be given 
-			as a full symmetric matrix, or an upper-triangular one.
+			as a full symmetric matrix, or an upper-triangular one. An upper-triangular
+			matrix can also be given in packed form, see :func:`packUpperTriangular`,
+			and a mostly-zero matrix as a ``scipy.sparse`` matrix. Lower precision
+			float dtypes, such as ``numpy.float32``, are kept as they are.
 			|DEFAULT| An upper-triangular matrix with 1's on the diagonal and 0.5 
 					  (getting along OK-ish on the off-diagonals).
 		:type students_getting_along_matrix:
-			```numpy.ndarray``
+			```numpy.ndarray`` | ``scipy.sparse`` matrix
+		"""
+		student_names, grades = self._mathAndArtGrades(student_math_grades, student_art_grades)
+
+		checkStudentsGettingAlongMatrix(students_getting_along_matrix, len(student_names))
+		self._setState(student_names, grades, students_getting_along_matrix)
+
+	@classmethod
+	def _mathAndArtGrades(cls, student_math_grades, student_art_grades):
 		"""
-		# Check and set the math grades.
-		self._student_math_grades = setAndCheckStudentGrades(student_math_grades, 'math')
+		Utility method for checking the math and art grades given to the
+		constructor, and setting them in a new grades matrix with a column for
+		each subject of the class. The columns of the other subjects are left
+		to be set by the constructor.
+
+		:returns:
+			The names of the students, and the grades matrix.
+		:rtype:
+			tuple of (list of str, ``numpy.ndarray``)
+		"""
+		# Check the math grades, they define the names of the students.
+		student_math_grades = setAndCheckStudentGrades(student_math_grades, 'math')
+		student_names = list(student_math_grades.keys())
+
+		# The grades are stored in a (students x subjects) matrix, with one
+		# column per subject.
+		grades = numpy.empty((len(student_names), len(cls._subjects)), dtype=numpy.int8)
+		grades[:, 0] = list(student_math_grades.values())
 
 		# Check and set the art grades, if given.
 		if student_art_grades is None:
-			self._student_art_grades = {name: 8 for name in student_math_grades.keys()}
+			grades[:, 1] = 8
 		else:
 			# Do the basic checks on the art grades.
 			student_art_grades = setAndCheckStudentGrades(student_art_grades, 'art')
@@ -71,36 +173,477 @@ class TeacherJessica(Serializable):
 			if not names_are_valid:
 				raise Exception('Mismatch between the student names for math and art grades.')
 
-			# All good, set the art grades.
-			self._student_art_grades = student_art_grades
+			# All good, set the art grades in the order of the names.
+			grades[:, 1] = [student_art_grades[name] for name in student_names]
+
+		return student_names, grades
+
+	@classmethod
+	def fromArrays(
+			cls,
+			student_names,
+			student_grades_matrix,
+			students_getting_along_matrix=None,
+			trusted=False):
+		"""
+		Create a teacher directly from the columnar representation of the
+		grades, without going through one dictionary per subject.
+
+		:param student_names:
+			The names of the students.
+		:type student_names:
+			list of str
+
+		:param student_grades_matrix:
+			The grades of the students as a (students x subjects) matrix, with
+			the rows in the order of ``student_names`` and the columns in the
+			order of :meth:`subjects`.
+		:type student_grades_matrix:
+			``numpy.ndarray``
+
+		:param students_getting_along_matrix:
+			See the constructor.
+		:type students_getting_along_matrix:
+			```numpy.ndarray`` | ``scipy.sparse`` matrix
+
+		:param trusted:
+			Whether the data is known to be valid, e.g. because it was read
+			from a file written from a valid teacher. Trusted data is not
+			validated.
+			|DEFAULT| False
+		:type trusted:
+			bool
+
+		:returns:
+			The new teacher.
+		:rtype:
+			:class:`TeacherJessica` | :class:`TeacherArya`
+		"""
+		given_student_grades_matrix = student_grades_matrix
+		student_names = list(student_names)
+		if not trusted:
+			# Check the names.
+			if len(student_names) == 0:
+				raise Exception('The student grades must be given for at least one student.')
+			if not all(map(isinstance, student_names, repeat(str))):
+				raise Exception('The names of the students must be strings.')
+			if len(set(student_names)) != len(student_names):
+				raise Exception('The names of the students must be unique.')
+
+			# Check the shape, and the grades of each subject at once.
+			student_grades_matrix = numpy.asarray(student_grades_matrix)
+			if student_grades_matrix.shape != (len(student_names), len(cls._subjects)):
+				raise Exception(
+					'The grades matrix must have one row per student and one column per subject.')
+			checkStudentGradesArray(student_grades_matrix, ', '.join(cls._subjects))
+			checkStudentsGettingAlongMatrix(students_getting_along_matrix, len(student_names))
+
+		# Store the grades as a contiguous int8 matrix. The teacher owns its
+		# grades: a matrix which is already stored so is copied, so that
+		# changing the grades of the teacher doesn't change the given matrix.
+		grades = numpy.ascontiguousarray(student_grades_matrix, dtype=numpy.int8)
+		if numpy.may_share_memory(grades, given_student_grades_matrix):
+			grades = grades.copy()
+
+		teacher = cls.__new__(cls)
+		teacher._setState(student_names, grades, students_getting_along_matrix)
+
+		return teacher
+
+	def _setState(self, student_names, grades, students_getting_along_matrix):
+		"""
+		Utility method for setting the data of the teacher, once it has been
+		checked.
+		"""
+		# The names are interned, so that the teachers of a student, and the
+		# indexes of a database, share one string for the name.
+		self._student_names = [
+			sys.intern(name) if type(name) is str else name for name in student_names
+		]
+		self._student_indices = None
+		self._grades = grades
+		self._students_getting_along_matrix = students_getting_along_matrix
+
+		# The sum of the squares of the getting-along matrix, calculated when
+		# first needed and then kept up to date as entries change, and the sum
+		# of the squares of the entries changed since it was last calculated.
+		self._getting_along_sum_of_squares = None
+		self._getting_along_updated_sum_of_squares = 0.0
+
+		# The metrics derived from the data, cached until the data changes,
+		# and the callbacks notified of changes.
+		self._derived_metrics = {}
+		self._observers = ()
+		self._last_change = None
+
+	def _dataChanged(self, derived_metrics=None, change=None):
+		"""
+		Utility method to be called whenever the data of the teacher changes:
+		drops the cached metrics and notifies the observers.
+
+		:param derived_metrics:
+			The keys of the cached metrics which depend on the changed data.
+			|DEFAULT| All cached metrics.
+		:type derived_metrics:
+			None | tuple of str
+
+		:param change:
+			The change, see :meth:`lastChange`.
+			|DEFAULT| None
+		:type change:
+			None | dict
+		"""
+		self._last_change = change
+		if derived_metrics is None:
+			self._derived_metrics.clear()
+		else:
+			for key in derived_metrics:
+				self._derived_metrics.pop(key, None)
+
+		for observer, _ in self._observers:
+			observer(self)
+
+	def _dataChanging(self):
+		"""
+		Utility method to be called just before the data of the teacher is
+		changed, in place or not: notifies the observers which asked for it.
+		"""
+		for _, before_change in self._observers:
+			if before_change is not None:
+				before_change(self)
+
+	def addObserver(self, observer, before_change=None):
+		"""
+		Register a callback which is called with the teacher as argument
+		whenever the data of the teacher changes.
+
+		:param observer:
+			The callback.
+		:type observer:
+			callable
+
+		:param before_change:
+			A callback which is called with the teacher as argument just before
+			its data changes, e.g. to keep a copy of the teacher as it was.
+			|DEFAULT| None
+		:type before_change:
+			None | callable
+		"""
+		self._observers += ((observer, before_change),)
+
+	def lastChange(self):
+		"""
+		:returns:
+			The last change of the data of the teacher, which observers can
+			read while they are notified: the name of the method which made
+			it under "method", and its JSON-compatible keyword arguments under
+			"arguments", so that the change can be made again on a copy of the
+			teacher. None if the last change was not a small one, such as the
+			replacement of the getting-along matrix.
+		:rtype:
+			None | dict
+		"""
+		return self._last_change
+
+	def removeObserver(self, observer):
+		"""
+		Unregister a callback registered with :meth:`addObserver`.
+
+		:param observer:
+			The callback.
+		:type observer:
+			callable
+		"""
+		observers = list(self._observers)
+		observers.pop([registered for registered, _ in observers].index(observer))
+		self._observers = tuple(observers)
+
+	def __getstate__(self):
+		"""
+		The state of the teacher which is pickled and copied: its data, without
+		the cached metrics and the observers, which belong to the teacher
+		itself and may hold e.g. the database of the teacher.
+		"""
+		return {
+			name: getattr(self, name)
+			for cls in type(self).__mro__ for name in cls.__dict__.get('__slots__', ())
+			if name not in ('_derived_metrics', '_observers', '_last_change')
+		}
+
+	def __setstate__(self, state):
+		"""
+		Restore the state returned by :meth:`__getstate__`, without cached
+		metrics or observers.
+		"""
+		for name, value in state.items():
+			setattr(self, name, value)
+
+		self._derived_metrics = {}
+		self._observers = ()
+		self._last_change = None
+
+	def setStudentGrade(self, student_name, subject, grade):
+		"""
+		Change the grade of a student in a subject.
+
+		:param student_name:
+			The name of the student.
+		:type student_name:
+			str
+
+		:param subject:
+			The subject, one of :meth:`subjects`.
+		:type subject:
+			str
+
+		:param grade:
+			The new grade, an integer between 1 and 10.
+		:type grade:
+			int
+		"""
+		if subject not in self._subjects:
+			raise Exception('The subject must be one of %s.' % ', '.join(self._subjects))
+
+		if student_name not in self._studentIndices():
+			raise Exception('The student %s is not a student of the teacher.' % student_name)
+
+		setAndCheckStudentGrades({student_name: grade}, subject)
+
+		self._dataChanging()
+		self._grades[self._studentIndices()[student_name], self._subjects.index(subject)] = grade
+		self._dataChanged(change={
+			'method': 'setStudentGrade',
+			'arguments': {'student_name': student_name, 'subject': subject, 'grade': grade},
+		})
+
+	def setStudentsGettingAlongMatrix(self, students_getting_along_matrix):
+		"""
+		Replace the getting-along matrix of the students.
+
+		:param students_getting_along_matrix:
+			The new matrix, see the constructor.
+		:type students_getting_along_matrix:
+			```numpy.ndarray`` | ``scipy.sparse`` matrix
+		"""
+		checkStudentsGettingAlongMatrix(students_getting_along_matrix, len(self._student_names))
 
+		self._dataChanging()
 		self._students_getting_along_matrix = students_getting_along_matrix
+		self._getting_along_sum_of_squares = None
+		self._dataChanged()
+
+	def setStudentsGettingAlong(self, student_name, other_student_name, getting_along):
+		"""
+		Change how well a student gets along with another student, or with
+		themselves: one entry of the getting-along matrix, in the row of
+		``student_name`` and the column of ``other_student_name``. The matrix
+		is changed in place, and the sum of its squares is updated from the
+		old and the new entry, so that the success of the teacher is
+		recalculated in constant time.
+
+		Without a matrix, the default one is built first. A packed matrix is
+		upper-triangular: only the entries from the diagonal on can be set.
+		A sparse matrix is converted to the ``lil`` format first, unless it is
+		in the ``lil`` or ``dok`` format, which take new entries efficiently.
+
+		:param student_name:
+			The name of the student of the row.
+		:type student_name:
+			str
+
+		:param other_student_name:
+			The name of the student of the column.
+		:type other_student_name:
+			str
+
+		:param getting_along:
+			The new getting-along metric, between 0 and 1.
+		:type getting_along:
+			float
+		"""
+		getting_along = float(getting_along)
+		self._setGettingAlongEntries(
+			self._studentIndex(student_name), self._studentIndex(other_student_name), getting_along,
+			change={
+				'method': 'setStudentsGettingAlong',
+				'arguments': {
+					'student_name': student_name,
+					'other_student_name': other_student_name,
+					'getting_along': getting_along,
+				},
+			})
+
+	def setStudentGettingAlongRow(self, student_name, getting_along):
+		"""
+		Change how well a student gets along with all students: one row of the
+		getting-along matrix. The sum of the squares of the matrix is updated
+		from the old and the new row, in time linear in the number of
+		students. See :meth:`setStudentsGettingAlong`.
+
+		:param student_name:
+			The name of the student of the row.
+		:type student_name:
+			str
+
+		:param getting_along:
+			The new getting-along metrics, aligned with :meth:`studentNames`.
+			For a packed matrix, the entries before the diagonal must be 0.
+		:type getting_along:
+			list of float | ``numpy.ndarray``
+		"""
+		row = self._studentIndex(student_name)
+
+		getting_along = numpy.asarray(getting_along, dtype=float)
+		if getting_along.shape != (len(self._student_names),):
+			raise Exception('One getting-along metric must be given for each student.')
+
+		self._setGettingAlongEntries(row, slice(None), getting_along, change={
+			'method': 'setStudentGettingAlongRow',
+			'arguments': {'student_name': student_name, 'getting_along': getting_along.tolist()},
+		})
+
+	def _studentIndex(self, student_name):
+		"""
+		Utility method returning the row of a student, checking that the student
+		is a student of the teacher.
+		"""
+		index = self._studentIndices().get(student_name)
+		if index is None:
+			raise Exception('The student %s is not a student of the teacher.' % student_name)
+
+		return index
+
+	def _editableGettingAlongMatrix(self):
+		"""
+		Utility method returning the getting-along matrix in a form whose
+		entries can be set in place.
+		"""
+		matrix = self._students_getting_along_matrix
+		if matrix is None:
+			matrix = defaultGettingAlongMatrix(len(self._student_names))
+		elif isSparseMatrix(matrix):
+			if matrix.format not in ('lil', 'dok'):
+				matrix = matrix.tolil()
+		elif not matrix.flags.writeable:
+			matrix = matrix.copy()
+
+		self._students_getting_along_matrix = matrix
+		return matrix
+
+	def _setGettingAlongEntries(self, row, columns, values, change):
+		"""
+		Utility method for setting the entries of one row of the getting-along
+		matrix, in the given column or slice of columns, and updating the sum of
+		the squares of the matrix from the old and the new entries.
+		"""
+		sum_of_squares = self._gettingAlongSumOfSquares()
+		self._dataChanging()
+		matrix = self._editableGettingAlongMatrix()
+
+		if isSparseMatrix(matrix) or matrix.ndim == 2:
+			index = (row, columns)
+		else:
+			# The packed matrix holds the entries of the row from the diagonal on.
+			number_of_students = len(self._student_names)
+			start = packedRowStart(row, number_of_students)
+			if isinstance(columns, slice):
+				if numpy.any(values[:row]):
+					raise Exception('The entries of a packed matrix before the diagonal must be 0.')
+				index = slice(start, start + number_of_students - row)
+				values = values[row:]
+			else:
+				if columns < row:
+					raise Exception('The entries of a packed matrix before the diagonal must be 0.')
+				index = start + columns - row
+
+		# The old and the new entries are read from the matrix, so that the
+		# sum of squares is that of the values as stored in its dtype.
+		old_sum_of_squares = gettingAlongSumOfSquares(matrix[index])
+		matrix[index] = values
+		new_sum_of_squares = gettingAlongSumOfSquares(matrix[index])
+
+		# The rounding errors of the running sum grow with the changed entries:
+		# when the sum gets small compared to them, it is calculated again.
+		updated_sum_of_squares = (
+			self._getting_along_updated_sum_of_squares + old_sum_of_squares + new_sum_of_squares)
+		sum_of_squares = sum_of_squares - old_sum_of_squares + new_sum_of_squares
+		if sum_of_squares < 1e-6 * updated_sum_of_squares:
+			sum_of_squares = gettingAlongSumOfSquares(matrix)
+			updated_sum_of_squares = 0.0
+
+		self._getting_along_sum_of_squares = max(0.0, sum_of_squares)
+		self._getting_along_updated_sum_of_squares = updated_sum_of_squares
+		self._dataChanged(derived_metrics=('success',), change=change)
+
+	@classmethod
+	def subjects(cls):
+		"""
+		:returns:
+			The subjects taught by the teacher, in the order of the columns
+			of the grades matrix.
+		:rtype:
+			tuple of str
+		"""
+		return cls._subjects
+
+	def studentGradesMatrix(self):
+		"""
+		:returns:
+			The grades of the students as a (students x subjects) matrix. The
+			rows are in the order of :meth:`studentNames` and the columns in
+			the order of :meth:`subjects`. The matrix is a read-only view,
+			change the grades with :meth:`setStudentGrade`.
+		:rtype:
+			``numpy.ndarray`` of type ``numpy.int8``
+		"""
+		grades = self._grades.view()
+		grades.flags.writeable = False
+		return grades
+
+	def studentGrades(self, subject):
+		"""
+		:param subject:
+			The subject, one of :meth:`subjects`.
+		:type subject:
+			str
+
+		:returns:
+			The grades of each student in the given subject, as a read-only
+			dict-like view of the grades matrix.
+		:rtype:
+			:class:`StudentGradesView`
+		"""
+		if subject not in self._subjects:
+			raise Exception('The subject must be one of %s.' % ', '.join(self._subjects))
+
+		return StudentGradesView(self, self._subjects.index(subject))
 
 	def studentMathGrades(self):
 		"""
 		:returns:
 			The math grades for each student.
 		:rtype:
-			dict of type {str: int}
+			:class:`StudentGradesView` of type {str: int}
 		"""
-		return self._student_math_grades
+		return StudentGradesView(self, 0)
 
 	def studentArtGrades(self):
 		"""
 		:returns:
 			The art grades for each student.
 		:rtype:
-			dict of type {str: int}
+			:class:`StudentGradesView` of type {str: int}
 		"""
-		return self._student_art_grades
+		return StudentGradesView(self, 1)
 
 	def studentsGettingAlongMatrix(self):
 		"""
 		:returns:
 			The matrix containing the numbers describing how well
-			students get along with themselves and each other.
+			students get along with themselves and each other, in the form
+			in which it was given.
 		:rtype:
-			```numpy.ndarray``
+			```numpy.ndarray`` | ``scipy.sparse`` matrix
 		"""
 		return self._students_getting_along_matrix
 
@@ -111,46 +654,198 @@ class TeacherJessica(Serializable):
 		:rtype:
 			list of str
 		"""
-		return list(self.studentMathGrades().keys())
+		return list(self._student_names)
 
-	def determineAverageGrade(self, weights=None):
+	def numberOfStudents(self):
 		"""
-		Method for calculating the average grade for each student, taking a
-		weighted average between math and art, according to the given
-		```weights.``
+		:returns:
+			The number of students.
+		:rtype:
+			int
+		"""
+		return len(self._student_names)
 
+	def _studentIndices(self):
+		"""
 		:returns:
-			The average grade for each student in a dictionary.
+			The row of each student in the grades matrix. The mapping is only
+			built when it is first needed.
 		:rtype:
 			dict of type {str: int}
 		"""
+		if self._student_indices is None:
+			self._student_indices = {name: index for index, name in enumerate(self._student_names)}
+
+		return self._student_indices
+
+	def _averageGradesArray(self, weights):
+		"""
+		Utility method for calculating the weighted average grade of all
+		students at once, from the grades matrix.
+
+		:returns:
+			The average grades, aligned with :meth:`studentNames`.
+		:rtype:
+			``numpy.ndarray``
+		"""
 		if weights is None:
-			weights_array = numpy.array([0.5, 0.5])
+			average_grades = self._grades.mean(axis=1)
 		else:
-			weights_array = numpy.array(weights)
-
-		# Fetch the math and art grades.
-		math_grades_dict = self.studentMathGrades()
-		art_grades_dict = self.studentArtGrades()
-
-		# Calculate the average grade for each student and return it.
-		# First gather the math and art grades of each student in a list
-		# of tuples.
-		grades_math_art = [
-			(math_grade, art_grade) for math_grade, art_grade in zip(
-				math_grades_dict.values(), art_grades_dict.values())
-		]
+			weights_array = numpy.asarray(weights, dtype=float)
+			if weights_array.shape != (len(self._subjects),):
+				raise Exception(
+					'One weight must be given for each subject: %s.' % ', '.join(self._subjects))
 
-		# Then calculate the average grades using the given weights. Using
-		# numpy is unnecessary here performance-wise, but let's use it for 
-		# demonstrative purposes.
-		average_grades = {
-			student_name: numpy.average(numpy.array(grades), weights=weights)
-			for student_name, grades in zip(math_grades_dict.keys(), grades_math_art)
-		}
+			weights_sum = weights_array.sum()
+			if weights_sum == 0:
+				raise Exception('The weights must not sum to zero.')
+
+			# Weigh each column and sum over the subjects. This gives exactly
+			# the same numbers as ``numpy.average`` per student.
+			average_grades = numpy.multiply(self._grades, weights_array).sum(axis=1) / weights_sum
+
+		if self._average_grade_decimals is not None:
+			average_grades = numpy.round(average_grades, decimals=self._average_grade_decimals)
+
+		return average_grades
+
+	def determineAverageGrade(self, weights=None, as_array=False):
+		"""
+		Method for calculating the average grade for each student, taking a
+		weighted average between the subjects of the teacher, according to
+		the given ```weights.`` The averages of all students are computed
+		at once from the grades matrix.
+
+		:param weights:
+			The weight of each subject, in the order of :meth:`subjects`.
+			|DEFAULT| Equal weights.
+		:type weights:
+			None | list of float | ``numpy.ndarray``
+
+		:param as_array:
+			Whether to return the averages as an array aligned with
+			:meth:`studentNames` instead of a dictionary. This avoids building
+			a dictionary for large numbers of students.
+			|DEFAULT| False
+		:type as_array:
+			bool
+
+		:returns:
+			The average grade for each student in a dictionary, or a read-only
+			array.
+		:rtype:
+			dict of type {str: float} | ``numpy.ndarray``
+		"""
+		# The averages are cached until the grades change: those with equal
+		# weights, and those with the last custom weights only, so that trying
+		# many weights doesn't keep an array per weights.
+		if weights is None:
+			key, cached_weights = 'average_grades', None
+		else:
+			key, cached_weights = 'weighted_average_grades', tuple(numpy.ravel(weights).tolist())
+
+		cached = self._derived_metrics.get(key)
+		if cached is not None and cached[0] == cached_weights:
+			average_grades = cached[1]
+		else:
+			average_grades = self._averageGradesArray(weights)
+			average_grades.flags.writeable = False
+			self._derived_metrics[key] = (cached_weights, average_grades)
+
+		if as_array:
+			return average_grades
+
+		return dict(zip(self._student_names, average_grades.tolist()))
+
+	@classmethod
+	def averageGradeScenarios(cls, student_grades_matrix, weights_matrix, subjects=None):
+		"""
+		Calculate the weighted average grade of each student under many
+		weightings of the subjects at once, with a single matrix product,
+		from a grades matrix in the layout of the teacher class, see
+		:meth:`fromArrays`. Each weighting gives the same averages as
+		:meth:`determineAverageGrade` with these weights.
+
+		:param student_grades_matrix:
+			The grades of the students as a (students x subjects) matrix, with
+			the columns in the order of :meth:`subjects`.
+		:type student_grades_matrix:
+			``numpy.ndarray``
+
+		:param weights_matrix:
+			The weights of the subjects as a (weightings x subjects) matrix,
+			with one row per weighting.
+		:type weights_matrix:
+			list of list of float | ``numpy.ndarray``
+
+		:param subjects:
+			The subjects of the columns of ``weights_matrix``. Subjects which
+			are not taught by the teacher are left out, and the weights of the
+			other subjects are normalized by their sum. Subjects of the teacher
+			which are not given have no weight.
+			|DEFAULT| :meth:`subjects`
+		:type subjects:
+			None | list of str
+
+		:returns:
+			The average grades as a (students x weightings) matrix.
+		:rtype:
+			``numpy.ndarray``
+		"""
+		subjects = cls._subjects if subjects is None else tuple(subjects)
+		weights_matrix = numpy.asarray(weights_matrix, dtype=float)
+		if weights_matrix.ndim != 2 or weights_matrix.shape[1] != len(subjects):
+			raise Exception(
+				'The weights matrix must have one column for each subject: %s.' % ', '.join(subjects))
+
+		# Keep the weights of the subjects of the teacher, in the order of the
+		# columns of the grades matrix.
+		if subjects != cls._subjects:
+			teacher_weights_matrix = numpy.zeros((len(weights_matrix), len(cls._subjects)))
+			for column, subject in enumerate(cls._subjects):
+				if subject in subjects:
+					teacher_weights_matrix[:, column] = weights_matrix[:, subjects.index(subject)]
+			weights_matrix = teacher_weights_matrix
+
+		weights_sums = weights_matrix.sum(axis=1)
+		if numpy.any(weights_sums == 0):
+			raise Exception(
+				'The weights of each weighting must not sum to zero over the subjects: %s.'
+				% ', '.join(cls._subjects))
+
+		average_grades = numpy.matmul(student_grades_matrix, weights_matrix.T) / weights_sums
+
+		if cls._average_grade_decimals is not None:
+			average_grades = numpy.round(average_grades, decimals=cls._average_grade_decimals)
 
 		return average_grades
 
+	def determineAverageGradeScenarios(self, weights_matrix, subjects=None):
+		"""
+		Method for calculating the average grade of each student under many
+		weightings of the subjects at once, e.g. to compare candidate grading
+		policies, see :meth:`averageGradeScenarios`.
+
+		:param weights_matrix:
+			The weights of the subjects as a (weightings x subjects) matrix,
+			with one row per weighting.
+		:type weights_matrix:
+			list of list of float | ``numpy.ndarray``
+
+		:param subjects:
+			The subjects of the columns of ``weights_matrix``.
+			|DEFAULT| :meth:`subjects`
+		:type subjects:
+			None | list of str
+
+		:returns:
+			The average grades as a (students x weightings) matrix, with the
+			rows aligned with :meth:`studentNames`.
+		:rtype:
+			``numpy.ndarray``
+		"""
+		return self.averageGradeScenarios(self._grades, weights_matrix, subjects=subjects)
+
 	def calculateTeacherSuccess(self):
 		"""
 		Method for calculating how successful the teacher has been with her
@@ -164,25 +859,54 @@ class TeacherJessica(Serializable):
 		:rtype:
 			float
 		"""
+		# The success is cached until the data changes.
+		students_getting_along_norm = self._derived_metrics.get('success')
+		if students_getting_along_norm is not None:
+			return students_getting_along_norm
+
 		# Determine the initial success for taking the Fro-norm of the
 		# students getting along matrix.
-		students_getting_along_norm = numpy.linalg.norm(
-			self.studentsGettingAlongMatrix())
+		students_getting_along_norm = numpy.sqrt(self._gettingAlongSumOfSquares())
 
 		# Normalize it according to the number of students, multiply by 100
 		# to convert to percentages, and round to include 2 decimals only.
-		students_getting_along_norm /= len(self.studentNames())
+		students_getting_along_norm /= len(self._student_names)
 		students_getting_along_norm = numpy.round(100 * students_getting_along_norm, decimals=2)
 
+		self._derived_metrics['success'] = students_getting_along_norm
+
 		return students_getting_along_norm
 
+	def _gettingAlongSumOfSquares(self):
+		"""
+		Utility method returning the sum of the squares of the getting-along
+		matrix, calculated without densifying a packed or sparse matrix the
+		first time, and then kept up to date by :meth:`_setGettingAlongEntries`.
+		Without a matrix, the default one is used.
+		"""
+		if self._getting_along_sum_of_squares is None:
+			students_getting_along_matrix = self._students_getting_along_matrix
+			if students_getting_along_matrix is None:
+				sum_of_squares = defaultGettingAlongSumOfSquares(len(self._student_names))
+			else:
+				sum_of_squares = gettingAlongSumOfSquares(students_getting_along_matrix)
+			self._getting_along_sum_of_squares = sum_of_squares
+			self._getting_along_updated_sum_of_squares = 0.0
+
+		return self._getting_along_sum_of_squares
+
 	def generateHtmlVisualization(
 			self, 
 			html_filename,
-			show_grades_image=False):
+			show_grades_image=False,
+			inline_image=False,
+			renderer='matplotlib'):
 		"""
-		Method for generating a visualization of the student grades as an
-		image in an html file.
+		Method for generating a visualization of the grades of the students in
+		all subjects as an image in an html file. The image is written next to
+		the html file, under its name with the suffix ``_grades``, unless it is
+		embedded in the html file. To generate the visualizations of many
+		teachers, see :func:`TeachersReports.generateGradesReports`.
 
 		:param html_filename:
 			The name of the generated html file name.
@@ -196,54 +920,33 @@ class TeacherJessica(Serializable):
 			|DEFAULT| False
 		:type show_grades_images:
 			bool
+
+		:param inline_image:
+			Whether the image is embedded in the html file.
+			|DEFAULT| False
+		:type inline_image:
+			bool
+
+		:param renderer:
+			How the image is drawn: 'matplotlib', or 'svg' for an SVG image
+			written directly, without matplotlib, which is much faster.
+			|DEFAULT| 'matplotlib'
+		:type renderer:
+			str
 		"""
-		# Fetch names and grades.
 		student_names = self.studentNames()
-		math_grades = list(self.studentMathGrades().values())
-		art_grades = list(self.studentArtGrades().values())
-		  
-		# Set up the x axis and create a bar plot with both grades
-		# shown for each student.
-		x_axis = numpy.arange(len(student_names))
-		plt.bar(x_axis - 0.2, math_grades, 0.4, label = 'Math')
-		plt.bar(x_axis + 0.2, art_grades, 0.4, label = 'Art')
-		  
-		# Set up the ticks, labels and a legend.
-		plt.xticks(x_axis, student_names, fontsize=14)
-		plt.yticks(fontsize=14)
-		plt.xlabel("Student", fontsize=18)
-		plt.ylabel("Grade", fontsize=18)
-		plt.legend(fontsize=14, loc='upper center')
-
-		# Set limit to 1 to 10 + a little extra.
-		plt.ylim(1.0, 10.1)
-
-		# Save it and fetch the figure dimensions in pixels.
-		plt.savefig('grades.png', dpi=200)
-		fig = plt.gcf()
-		fig_width, fig_height = fig.get_size_inches() * fig.dpi
-
-		# If requested, show the image.
+
+		# If requested, show the image, on a figure of its own.
 		if show_grades_image:
+			import matplotlib.pyplot as plt
+			figure = plt.figure()
+			drawGradesChart(figure, student_names, self.subjects(), self._grades)
 			plt.show()
+			plt.close(figure)
 
-		# Define a html template and add the correct figure dimensions.
-		html_image = textwrap.dedent("""\
-			<html>
-			<head>
-			<title>Grades of Jessica's students</title>
-			</head>
-			<body>
-			<h2>Visualization of grades</h2>
-			  
-			<img src="grades.png" alt="Grades" width="{}" height="{}">
-			  
-			</body>
-			</html>""").format(fig_width, fig_height)
-
-		# Write the image to the given html file.
-		with open(html_filename, 'w') as f:
-			f.write(html_image)
+		writeGradesReport(
+			html_filename, teacherReportTitle(self), student_names, self.subjects(), self._grades,
+			inline_image=inline_image, renderer=renderer)
 
 	@staticmethod
 	def wiseQuotes():
@@ -274,8 +977,16 @@ class TeacherJessica(Serializable):
 		return wise_quotes_final
 
 
+@registerTeacherType
 class TeacherArya(TeacherJessica):
 
+	_subjects = ('math', 'art', 'science')
+
+	# Teacher Arya rounds the average grades to two decimals.
+	_average_grade_decimals = 2
+
+	__slots__ = ()
+
 	@classmethod
 	def _serializableProperties(cls):
 		"""
@@ -323,83 +1034,39 @@ class TeacherArya(TeacherJessica):
 			A matrix which describes how well each student gets along with each
 			other and themselves. The getting-along metric is a float between
 			0 and 1: 1 is perfect and 0 not hating each other. The matrix can be given 
-			as a full symmetric matrix, or an upper-triangular one.
+			as a full symmetric matrix, or an upper-triangular one. An upper-triangular
+			matrix can also be given in packed form, see :func:`packUpperTriangular`,
+			and a mostly-zero matrix as a ``scipy.sparse`` matrix. Lower precision
+			float dtypes, such as ``numpy.float32``, are kept as they are.
 			|DEFAULT| An upper-triangular matrix with 1's on the diagonal and 0.5 
 					  (getting along OK-ish on the off-diagonals).
 		:type students_getting_along_matrix:
-			```numpy.ndarray``
+			```numpy.ndarray`` | ``scipy.sparse`` matrix
 		"""
-		# Initialize the base class.
-		super().__init__(
-			student_math_grades=student_math_grades,
-			student_art_grades=student_art_grades,
-			students_getting_along_matrix=students_getting_along_matrix)
+		# Check the grades of the base class, and the getting-along matrix.
+		student_names, grades = self._mathAndArtGrades(student_math_grades, student_art_grades)
+		checkStudentsGettingAlongMatrix(students_getting_along_matrix, len(student_names))
 
 		# Set and check the science grades.
-		student_science_grades = setAndCheckStudentGrades(student_science_grades, 'art')
+		student_science_grades = setAndCheckStudentGrades(student_science_grades, 'science')
 
 		# Check that all names match the ones in the math grades.
 		names_are_valid = (student_math_grades.keys() == student_science_grades.keys())
 		if not names_are_valid:
 			raise Exception('Mismatch between the student names for math and science grades.')
 
-		# All good, set the grades.
-		self._student_science_grades = student_science_grades
+		# All good, set the science grades as the last column of the grades.
+		grades[:, 2] = [student_science_grades[name] for name in student_names]
+		self._setState(student_names, grades, students_getting_along_matrix)
 
 	def studentScienceGrades(self):
 		""" 
 		:returns:
 			The science grades of the students.
 		:rtype:
-			dict of type {str: int}
+			:class:`StudentGradesView` of type {str: int}
 		"""
-		return self._student_science_grades
-
-	def determineAverageGrade(self, weights=None):
-		"""
-		Method for calculating the average grade for each student, taking a
-		weighted average between math, art and science, according to the given
-		```weights.``
-
-		:returns:
-			The average grade for each student in a dictionary.
-		:rtype:
-			dict of type {str: int}
-		"""
-		if weights is None:
-			weights_array = numpy.array([1.0 / 3] * 3)
-		else:
-			weights_array = numpy.array(weights)
-
-		# Fetch the grades.
-		math_grades_dict = self.studentMathGrades()
-		art_grades_dict = self.studentArtGrades()
-		science_grades_dict = self.studentScienceGrades()
-
-		# Calculate the average grade for each student and return it.
-		# First gather the math and art grades of each student in a list
-		# of tuples.
-		grades_math_art_science = [
-			(math_grade, art_grade, science_grade) for math_grade, art_grade, science_grade in zip(
-				math_grades_dict.values(), art_grades_dict.values(), science_grades_dict.values())
-		]
-
-		# Then calculate the average grades using the given weights. 
-		average_grades = {
-			student_name: numpy.round(numpy.average(numpy.array(grades), weights=weights), decimals=2)
-			for student_name, grades in zip(self.studentNames(), grades_math_art_science)
-		}
-
-		return average_grades
-
-	def generateHtmlVisualization(
-			self, 
-			html_filename,
-			show_grades_image=False):
-		"""
-		Html visualization is not implemented yet for teacher Arya.
-		"""
-		raise Exception('Html visualization of grades is not implemented for TeacherArya.')
+		return StudentGradesView(self, 2)
 
 
 def setAndCheckStudentGrades(student_grades, field):
@@ -409,9 +1076,10 @@ def setAndCheckStudentGrades(student_grades, field):
 	the method returns them.
 
 	:param student_grades:
-		The grade for each student in a dictionary.
+		The grade for each student in a dictionary, or any mapping such as
+		the grades returned by :meth:`TeacherJessica.studentGrades`.
 	:type student_grades:
-		dict of type {str: int}
+		dict of type {str: int} | ``Mapping``
 
 	:param field:
 		The field or discipline.
@@ -421,19 +1089,20 @@ def setAndCheckStudentGrades(student_grades, field):
 	:returns:
 		The checked student grades.
 	:rtype:
-		dict of type {str: int}
+		dict of type {str: int} | ``Mapping``
 	"""
-	if not isinstance(student_grades, dict) or len(student_grades) == 0:
+	if not isinstance(student_grades, Mapping) or len(student_grades) == 0:
 		raise Exception('The student grades must be given as non-empty dictionary.')
 
-	# Check names.
-	names_valid = all(isinstance(key, str) for key in student_grades.keys())
+	# Check names. Mapping isinstance over the keys keeps the loop in C.
+	names_valid = all(map(isinstance, student_grades.keys(), repeat(str)))
 	if not names_valid:
 		raise Exception('The names of the students must be strings.')
 
-	# Check grades.
+	# Check grades: first their type, then their range in one go.
+	grades = student_grades.values()
 	grades_valid = (
-		all(isinstance(value, int) and (value >= 1 and value <= 10) for value in student_grades.values())
+		all(map(isinstance, grades, repeat(int))) and min(grades) >= 1 and max(grades) <= 10
 	)
 	if not grades_valid:
 		raise Exception('The %s grades of the students must be integers between 1 and 10.' % field)
@@ -441,3 +1110,292 @@ def setAndCheckStudentGrades(student_grades, field):
 	# All good, return.
 	return student_grades
 
+
+def checkStudentGradesArray(student_grades, field):
+	"""
+	Utility method for checking that the given array of student grades is
+	valid, i.e. that it holds integers between 1 and 10. This is the
+	vectorized counterpart of :func:`setAndCheckStudentGrades`: the whole
+	array is checked with a dtype check and a range check, in a single pass
+	over the array.
+
+	:param student_grades:
+		The grades to check.
+	:type student_grades:
+		``numpy.ndarray``
+
+	:param field:
+		The field or discipline, or fields.
+	:type field:
+		str
+
+	:returns:
+		The checked student grades.
+	:rtype:
+		``numpy.ndarray``
+	"""
+	if student_grades.size == 0:
+		raise Exception('The student grades must be given for at least one student.')
+
+	# The range is checked on blocks of rows which stay in the cache, so that
+	# the array is read once for both bounds, up to the first invalid block.
+	# A small array is a single block.
+	grades_valid = student_grades.dtype.kind in 'iu'
+	if grades_valid and student_grades.size <= _grades_check_block_size:
+		grades_valid = student_grades.min() >= 1 and student_grades.max() <= 10
+	elif grades_valid:
+		block_length = max(1, _grades_check_block_size * len(student_grades) // student_grades.size)
+		for start in range(0, len(student_grades), block_length):
+			block = student_grades[start:start + block_length]
+			if block.min() < 1 or block.max() > 10:
+				grades_valid = False
+				break
+	if not grades_valid:
+		raise Exception('The %s grades of the students must be integers between 1 and 10.' % field)
+
+	return student_grades
+
+
+def concatenateArrays(arrays, dtype):
+	"""
+	Utility method for concatenating 1-dimensional arrays, possibly none,
+	into an array of the given dtype.
+
+	:returns:
+		The concatenated array.
+	:rtype:
+		``numpy.ndarray``
+	"""
+	if not arrays:
+		return numpy.zeros(0, dtype=dtype)
+
+	return numpy.concatenate(arrays).astype(dtype, copy=False)
+
+
+def isSparseMatrix(matrix):
+	"""
+	Utility method for checking whether the given matrix is a ``scipy.sparse``
+	matrix. If scipy has not been imported, the matrix can't be one, so
+	scipy is never imported by the check.
+	"""
+	sparse = sys.modules.get('scipy.sparse')
+	return sparse is not None and sparse.issparse(matrix)
+
+
+def packedSize(number_of_students):
+	"""
+	:returns:
+		The number of entries of a packed upper-triangular matrix with the given
+		number of rows.
+	:rtype:
+		int
+	"""
+	return number_of_students * (number_of_students + 1) // 2
+
+
+def packedRowStart(row, number_of_students):
+	"""
+	:returns:
+		The position in a packed upper-triangular matrix of the diagonal entry
+		of the given row, where the entries of the row start.
+	:rtype:
+		int
+	"""
+	return row * (2 * number_of_students - row + 1) // 2
+
+
+def packUpperTriangular(matrix, dtype=None):
+	"""
+	Utility method for packing the upper triangle of a square matrix, diagonal
+	included, row by row into a 1-dimensional array. The packed array takes
+	half the memory of the matrix and describes the same upper-triangular matrix.
+	Note that the packed form of a full symmetric matrix describes its upper
+	triangle only.
+
+	:param matrix:
+		The square matrix to pack.
+	:type matrix:
+		``numpy.ndarray``
+
+	:param dtype:
+		The dtype of the packed array, e.g. ``numpy.float32`` to halve the
+		memory once more.
+		|DEFAULT| The dtype of the matrix.
+	:type dtype:
+		None | ``numpy.dtype``
+
+	:returns:
+		The packed upper triangle.
+	:rtype:
+		``numpy.ndarray``
+	"""
+	number_of_students = matrix.shape[0]
+	packed = numpy.empty(packedSize(number_of_students), dtype=dtype or matrix.dtype)
+
+	# Copy row by row, which avoids the index arrays of numpy.triu_indices
+	# which would take more memory than the matrix itself.
+	start = 0
+	for row in range(number_of_students):
+		end = start + number_of_students - row
+		packed[start:end] = matrix[row, row:]
+		start = end
+
+	return packed
+
+
+def unpackUpperTriangular(packed, number_of_students):
+	"""
+	Utility method for unpacking an array packed by :func:`packUpperTriangular`
+	into a dense upper-triangular matrix.
+
+	:returns:
+		The upper-triangular matrix.
+	:rtype:
+		``numpy.ndarray``
+	"""
+	matrix = numpy.zeros((number_of_students, number_of_students), dtype=packed.dtype)
+
+	start = 0
+	for row in range(number_of_students):
+		end = start + number_of_students - row
+		matrix[row, row:] = packed[start:end]
+		start = end
+
+	return matrix
+
+
+def checkStudentsGettingAlongMatrix(students_getting_along_matrix, number_of_students):
+	"""
+	Utility method for checking that the given getting-along matrix has a shape
+	matching the number of students: square, or packed upper-triangular.
+	"""
+	if students_getting_along_matrix is None:
+		return
+
+	shape = numpy.shape(students_getting_along_matrix)
+	shape_valid = (
+		shape == (number_of_students, number_of_students) or
+		(shape == (packedSize(number_of_students),) and not isSparseMatrix(students_getting_along_matrix))
+	)
+	if not shape_valid:
+		raise Exception(
+			'The getting-along matrix must be a square matrix with one row per student, '
+			'or a packed upper-triangular one.')
+
+
+def gettingAlongSumOfSquares(students_getting_along_matrix):
+	"""
+	Utility method for calculating the sum of the squares of the entries of a
+	getting-along matrix, i.e. the squared Frobenius norm. Dense, packed and
+	sparse matrices are all handled in their own storage, and the squares
+	are accumulated in double precision whatever the dtype of the matrix.
+
+	:param students_getting_along_matrix:
+		The getting-along matrix.
+	:type students_getting_along_matrix:
+		``numpy.ndarray`` | ``scipy.sparse`` matrix
+
+	:returns:
+		The sum of the squares of the entries.
+	:rtype:
+		float
+	"""
+	if isSparseMatrix(students_getting_along_matrix):
+		# Converting to CSR sums any duplicate entries, then only the stored
+		# values are needed.
+		values = students_getting_along_matrix.tocsr().data
+	else:
+		values = numpy.ravel(students_getting_along_matrix, order='K')
+
+	if values.dtype == numpy.float64:
+		# Same as numpy.linalg.norm does.
+		return float(values.dot(values))
+
+	return float(numpy.einsum('i,i->', values, values, dtype=numpy.float64))
+
+
+def defaultGettingAlongMatrix(number_of_students):
+	"""
+	Utility method for building the default getting-along matrix, an
+	upper-triangular matrix with 1's on the diagonal and 0.5 on the
+	off-diagonals.
+
+	:returns:
+		The default getting-along matrix.
+	:rtype:
+		``numpy.ndarray``
+	"""
+	matrix = numpy.triu(numpy.full((number_of_students, number_of_students), 0.5))
+	numpy.fill_diagonal(matrix, 1.0)
+	return matrix
+
+
+def defaultGettingAlongSumOfSquares(number_of_students):
+	"""
+	Utility method for calculating the sum of the squares of the entries of the
+	default getting-along matrix, an upper-triangular matrix with 1's on the
+	diagonal and 0.5 on the off-diagonals, without building the matrix.
+
+	:returns:
+		The sum of the squares of the entries.
+	:rtype:
+		float
+	"""
+	number_of_off_diagonals = number_of_students * (number_of_students - 1) // 2
+	return float(number_of_students + 0.25 * number_of_off_diagonals)
+
+
+class StudentGradesView(Mapping):
+
+	def __init__(self, teacher, column):
+		"""
+		A read-only dict-like view of the grades of the students of a teacher
+		in one subject. The view is backed by the grades matrix of the teacher,
+		and compares equal to a dict with the same grades.
+
+		:param teacher:
+			The teacher whose grades are viewed.
+		:type teacher:
+			:class:`TeacherJessica`
+
+		:param column:
+			The column of the subject in the grades matrix of the teacher.
+		:type column:
+			int
+		"""
+		self._teacher = teacher
+		self._column = column
+
+	def __getitem__(self, student_name):
+		row = self._teacher._studentIndices()[student_name]
+		return int(self._teacher._grades[row, self._column])
+
+	def __iter__(self):
+		return iter(self._teacher._student_names)
+
+	def __len__(self):
+		return len(self._teacher._student_names)
+
+	def __contains__(self, student_name):
+		return student_name in self._teacher._studentIndices()
+
+	def __repr__(self):
+		return repr(self.toDict())
+
+	def values(self):
+		"""
+		:returns:
+			The grades, in the order of the student names.
+		:rtype:
+			list of int
+		"""
+		return self._teacher._grades[:, self._column].tolist()
+
+	def toDict(self):
+		"""
+		:returns:
+			A copy of the grades as a dict.
+		:rtype:
+			dict of type {str: int}
+		"""
+		return dict(zip(self._teacher._student_names, self.values()))
@@ -0,0 +1,346 @@
+"""
+Module implementing analytics over the grades of all students of many
+teachers, held in one columnar table with a row per (student, teacher,
+subject) grade.
+"""
+
+import numpy
+
+from Teachers import concatenateArrays
+
+
+class GradesTable(object):
+
+	def __init__(self, teacher_ids, teachers):
+		"""
+		This class implements a columnar table of the grades of the students of
+		many teachers: one row per grade, with the student, the teacher, the
+		subject and the grade in four numpy arrays. The students, teachers and
+		subjects are stored as integer codes into lists of their names, so that
+		group-by, top-k and percentile queries are vectorized over all rows.
+
+		A student is identified by name: the grades of a student with several
+		teachers are grouped together.
+
+		:param teacher_ids:
+			The ID of each teacher.
+		:type teacher_ids:
+			list of str
+
+		:param teachers:
+			The teachers.
+		:type teachers:
+			list of :class:`TeacherJessica` | :class:`TeacherArya`
+		"""
+		self._teacher_ids = list(teacher_ids)
+		self._subjects = []
+		self._student_names = []
+		student_codes_by_name = {}
+
+		student_codes = []
+		teacher_codes = []
+		subject_codes = []
+		grades = []
+		for teacher_code, teacher in enumerate(teachers):
+			subjects = teacher.subjects()
+			for subject in subjects:
+				if subject not in self._subjects:
+					self._subjects.append(subject)
+
+			# The grades matrix is raveled row by row: the subjects of the
+			# first student, then those of the second, and so on.
+			codes = []
+			for name in teacher.studentNames():
+				code = student_codes_by_name.get(name)
+				if code is None:
+					code = len(self._student_names)
+					self._student_names.append(name)
+					student_codes_by_name[name] = code
+				codes.append(code)
+
+			student_codes.append(numpy.repeat(numpy.array(codes, dtype=numpy.int32), len(subjects)))
+			teacher_codes.append(numpy.full(len(codes) * len(subjects), teacher_code, dtype=numpy.int32))
+			subject_codes.append(numpy.tile(
+				numpy.array([self._subjects.index(subject) for subject in subjects], dtype=numpy.int8),
+				len(codes)))
+			grades.append(teacher.studentGradesMatrix().ravel())
+
+		self._student_codes = concatenateArrays(student_codes, numpy.int32)
+		self._teacher_codes = concatenateArrays(teacher_codes, numpy.int32)
+		self._subject_codes = concatenateArrays(subject_codes, numpy.int8)
+		self._grades = concatenateArrays(grades, numpy.int8)
+
+	@classmethod
+	def fromDataBase(cls, database):
+		"""
+		Build the table of the teachers of a database, from a snapshot of it.
+
+		:param database:
+			The database.
+		:type database:
+			:class:`TeachersDataBase`
+
+		:returns:
+			The table.
+		:rtype:
+			:class:`GradesTable`
+		"""
+		teachers_and_ids = database.snapshot().teachersAndIds()
+		return cls(
+			[teacher_id for teacher_id, _ in teachers_and_ids], [teacher for _, teacher in teachers_and_ids])
+
+	def numberOfRows(self):
+		"""
+		:returns:
+			The number of grades in the table.
+		:rtype:
+			int
+		"""
+		return len(self._grades)
+
+	def subjects(self):
+		"""
+		:returns:
+			The subjects of the table.
+		:rtype:
+			list of str
+		"""
+		return list(self._subjects)
+
+	def columns(self):
+		"""
+		:returns:
+			The columns of the table: the code of the student, of the teacher
+			and of the subject, and the grade of each row. The codes index
+			:meth:`studentNames`, the teacher IDs and :meth:`subjects`.
+		:rtype:
+			dict of type {str: ``numpy.ndarray``}
+		"""
+		return {
+			'student': self._student_codes,
+			'teacher': self._teacher_codes,
+			'subject': self._subject_codes,
+			'grade': self._grades,
+		}
+
+	def studentNames(self):
+		"""
+		:returns:
+			The names of the students, indexed by their code.
+		:rtype:
+			list of str
+		"""
+		return list(self._student_names)
+
+	def _rows(self, subject=None, teacher_id=None):
+		"""
+		Utility method returning the mask of the rows of a subject and a
+		teacher, or None for all rows.
+		"""
+		mask = None
+		if subject is not None:
+			if subject not in self._subjects:
+				raise Exception('Unknown subject %s.' % subject)
+			mask = self._subject_codes == self._subjects.index(subject)
+
+		if teacher_id is not None:
+			if teacher_id not in self._teacher_ids:
+				raise Exception('Unknown teacher ID %s.' % teacher_id)
+			teacher_mask = self._teacher_codes == self._teacher_ids.index(teacher_id)
+			mask = teacher_mask if mask is None else mask & teacher_mask
+
+		return mask
+
+	def _keys(self, key):
+		"""
+		Utility method returning the codes and the names of a group-by key.
+		"""
+		if key == 'student':
+			return self._student_codes, self._student_names
+		if key == 'teacher':
+			return self._teacher_codes, self._teacher_ids
+		if key == 'subject':
+			return self._subject_codes, self._subjects
+
+		raise Exception('Unknown group-by key %s.' % key)
+
+	def groupBy(self, key, statistic='mean', subject=None, teacher_id=None):
+		"""
+		Aggregate the grades of each student, teacher or subject.
+
+		:param key:
+			What to group the grades by: 'student', 'teacher' or 'subject'.
+		:type key:
+			str
+
+		:param statistic:
+			The aggregate of each group: 'count', 'sum', 'mean', 'min' or 'max'.
+			|DEFAULT| 'mean'
+		:type statistic:
+			str
+
+		:param subject:
+			Only aggregate the grades of this subject.
+			|DEFAULT| All subjects.
+		:type subject:
+			None | str
+
+		:param teacher_id:
+			Only aggregate the grades given by this teacher.
+			|DEFAULT| All teachers.
+		:type teacher_id:
+			None | str
+
+		:returns:
+			The aggregate of each group which has grades.
+		:rtype:
+			dict of type {str: float}
+		"""
+		codes, names = self._keys(key)
+		grades = self._grades
+		mask = self._rows(subject=subject, teacher_id=teacher_id)
+		if mask is not None:
+			codes, grades = codes[mask], grades[mask]
+
+		counts = numpy.bincount(codes, minlength=len(names))
+		if statistic == 'count':
+			values = counts
+		elif statistic in ('sum', 'mean'):
+			values = numpy.bincount(codes, weights=grades, minlength=len(names))
+			if statistic == 'mean':
+				values = values / numpy.maximum(counts, 1)
+		elif statistic in ('min', 'max'):
+			ufunc = numpy.minimum if statistic == 'min' else numpy.maximum
+			values = numpy.full(len(names), 11 if statistic == 'min' else 0, dtype=numpy.int64)
+			ufunc.at(values, codes, grades)
+		else:
+			raise Exception('Unknown statistic %s.' % statistic)
+
+		present = numpy.flatnonzero(counts)
+		return dict(zip([names[index] for index in present], values[present].tolist()))
+
+	def gradeDistributions(self):
+		"""
+		:returns:
+			The number of grades 1 to 10 given in each subject.
+		:rtype:
+			dict of type {str: ``numpy.ndarray``}
+		"""
+		# One bincount over (subject, grade) pairs.
+		counts = numpy.bincount(
+			self._subject_codes.astype(numpy.int64) * 11 + self._grades, minlength=11 * len(self._subjects))
+		counts = counts.reshape(len(self._subjects), 11)[:, 1:]
+
+		return dict(zip(self._subjects, counts))
+
+	def studentAverages(self, subject=None):
+		"""
+		:param subject:
+			Only average the grades of this subject.
+			|DEFAULT| All subjects.
+		:type subject:
+			None | str
+
+		:returns:
+			The codes of the students with grades, and their average grade
+			across all their teachers.
+		:rtype:
+			tuple of (``numpy.ndarray``, ``numpy.ndarray``)
+		"""
+		codes, grades = self._student_codes, self._grades
+		mask = self._rows(subject=subject)
+		if mask is not None:
+			codes, grades = codes[mask], grades[mask]
+
+		counts = numpy.bincount(codes, minlength=len(self._student_names))
+		sums = numpy.bincount(codes, weights=grades, minlength=len(self._student_names))
+		present = numpy.flatnonzero(counts)
+
+		return present, sums[present] / counts[present]
+
+	def topStudents(self, k, subject=None):
+		"""
+		:param k:
+			The number of students.
+		:type k:
+			int
+
+		:param subject:
+			Rank the students by their average grade in this subject.
+			|DEFAULT| All subjects.
+		:type subject:
+			None | str
+
+		:returns:
+			The names and average grades of the k students with the highest
+			average grade across all their teachers, best first.
+		:rtype:
+			list of tuple of (str, float)
+		"""
+		codes, averages = self.studentAverages(subject=subject)
+		k = min(k, len(averages))
+		if k == 0:
+			return []
+
+		# Select the top k in linear time, then only sort those.
+		top = numpy.argpartition(-averages, k - 1)[:k]
+		top = top[numpy.argsort(-averages[top], kind='stable')]
+
+		return [(self._student_names[code], average) for code, average in zip(
+			codes[top].tolist(), averages[top].tolist())]
+
+	def gradePercentiles(self, percentiles, subject=None, teacher_id=None):
+		"""
+		:param percentiles:
+			The percentiles to calculate, between 0 and 100.
+		:type percentiles:
+			float | list of float
+
+		:param subject:
+			Only include the grades of this subject.
+			|DEFAULT| All subjects.
+		:type subject:
+			None | str
+
+		:param teacher_id:
+			Only include the grades given by this teacher.
+			|DEFAULT| All teachers.
+		:type teacher_id:
+			None | str
+
+		:returns:
+			The percentiles of the grades.
+		:rtype:
+			float | ``numpy.ndarray``
+		"""
+		mask = self._rows(subject=subject, teacher_id=teacher_id)
+		grades = self._grades if mask is None else self._grades[mask]
+		if len(grades) == 0:
+			raise Exception('There are no grades to calculate percentiles of.')
+
+		return numpy.percentile(grades, percentiles)
+
+	def studentAveragePercentiles(self, percentiles, subject=None):
+		"""
+		:param percentiles:
+			The percentiles to calculate, between 0 and 100.
+		:type percentiles:
+			float | list of float
+
+		:param subject:
+			Only average the grades of this subject.
+			|DEFAULT| All subjects.
+		:type subject:
+			None | str
+
+		:returns:
+			The percentiles of the average grades of the students, across all
+			their teachers.
+		:rtype:
+			float | ``numpy.ndarray``
+		"""
+		_, averages = self.studentAverages(subject=subject)
+		if len(averages) == 0:
+			raise Exception('There are no grades to calculate percentiles of.')
+
+		return numpy.percentile(averages, percentiles)
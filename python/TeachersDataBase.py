@@ -3,14 +3,38 @@
 
 """ Module implementing a database of teachers in a school """
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 import json
 import numpy
-import textwrap
+import os
+import threading
+import weakref
 
 from Teachers import TeacherArya
 from Teachers import TeacherJessica
+from Teachers import isSparseMatrix
+from Teachers import teacherType
+from TeachersDataBaseLog import MutationLog
+from TeachersDataBaseLog import iterateMutationLog
+from TeachersDataBaseNpz import iterateTeachersNpz
+from TeachersDataBaseNpz import writeTeachersNpz
+from TeachersDataBaseSnapshot import TeachersDataBaseSnapshot
+from TeachersIndexes import TeacherIndexes
+from TeachersStatistics import TeacherStatisticsTable
 
 
+# The methods of the teachers whose changes are logged as they are, see
+# TeacherJessica.lastChange.
+_logged_changes = frozenset([
+	'setStudentGrade',
+	'setStudentsGettingAlong',
+	'setStudentGettingAlongRow',
+])
+
 class TeachersDataBase(object):
 
 	def __init__(self, teachers, teacher_ids):
@@ -19,7 +43,8 @@ class TeachersDataBase(object):
 		It takes a list of teachers as input, and is able to determine 
 		and report different types of information about the teachers.
 		Teachers and also be added and removed from the database. Each
-		teacher must be given a unique ID.
+		teacher must be given a unique ID: an exception is raised if any
+		teacher cannot be added, see :meth:`addTeachers`.
 
 		:param teachers:
 			A list of teachers to be added into the database. 
@@ -33,9 +58,255 @@ class TeachersDataBase(object):
 		"""
 		# Set up a dictionary which contains teacher IDs as keys and the teacher
 		# objects as values.
-		self._teachers_and_ids = {
-			teacher_id: teacher for teacher_id, teacher in zip(teacher_ids, teachers)
-		}
+		self._teachers_and_ids = {}
+
+		# The changes of the database are serialized by a lock, while the reads
+		# of a single teacher are lock-free. The snapshot of the database is
+		# built on demand and dropped by each change. The snapshots share the
+		# teachers with the database until the teachers change, so the
+		# snapshots which are still in use are kept track of.
+		self._lock = threading.RLock()
+		self._snapshot = None
+		self._snapshots = weakref.WeakSet()
+
+		# Set up the table of statistics of the teachers and the secondary
+		# indexes, which are kept up to date as teachers are added, removed
+		# or changed.
+		self._statistics = TeacherStatisticsTable()
+		self._indexes = TeacherIndexes()
+		self._teacher_observers = {}
+
+		# The log to which the mutations are appended, see openDurable.
+		self._mutation_log = None
+		self._snapshot_filename = None
+		self._compaction_threshold = None
+
+		failures = self.addTeachers(teacher_ids, teachers)
+		if failures:
+			raise Exception('The teachers could not be added: %s' % '; '.join(
+				'%s: %s' % failure for failure in failures))
+
+	@classmethod
+	def openDurable(cls, snapshot_filename, log_filename, compaction_threshold=1000, fsync=False):
+		"""
+		Open a database whose mutations are durable without rewriting the whole
+		database. The database is read from the last snapshot, and the mutations
+		of the log are replayed on top of it. From then on, each addition,
+		removal or change of a teacher is appended to the log, and once the log
+		holds ``compaction_threshold`` mutations the database is written to a
+		new snapshot and the log is emptied.
+
+		:param snapshot_filename:
+			The JSON, JSON Lines or npz file of the snapshot, in a format of
+			:meth:`saveToFile`. A missing file is an empty database.
+		:type snapshot_filename:
+			str
+
+		:param log_filename:
+			The log file, see :class:`TeachersDataBaseLog.MutationLog`. A
+			missing file is an empty log.
+		:type log_filename:
+			str
+
+		:param compaction_threshold:
+			The number of mutations in the log which triggers a compaction, or
+			None to only compact when :meth:`compact` is called.
+			|DEFAULT| 1000
+		:type compaction_threshold:
+			None | int
+
+		:param fsync:
+			Whether each mutation is forced to disk before returning.
+			|DEFAULT| False
+		:type fsync:
+			bool
+
+		:returns:
+			The database.
+		:rtype:
+			:class:`TeachersDataBase`
+		"""
+		database = cls(teachers=[], teacher_ids=[])
+		if os.path.exists(snapshot_filename):
+			database.populateFromFile(snapshot_filename)
+
+		# An update is stored like an addition, with the whole teacher, and a
+		# change is made again on the teacher.
+		for operation, teacher_id, record in iterateMutationLog(log_filename):
+			if operation == 'remove':
+				if teacher_id in database._teachers_and_ids:
+					database.removeTeacher(teacher_id)
+			elif operation == 'change':
+				if record['method'] not in _logged_changes:
+					raise Exception('Unknown change %s in the mutation log.' % record['method'])
+				teacher = database._teachers_and_ids[teacher_id]
+				getattr(teacher, record['method'])(**record['arguments'])
+			else:
+				database._insertOrReplaceTeacher(teacher_id, teacherFromRecord(record))
+
+		database._mutation_log = MutationLog(log_filename, fsync=fsync)
+		database._snapshot_filename = snapshot_filename
+		database._compaction_threshold = compaction_threshold
+		database._compactIfNeeded()
+
+		return database
+
+	def _logMutations(self, operation, teacher_ids, teachers=None):
+		"""
+		Utility method for appending the same mutation of several teachers to
+		the log at once, if the database has one.
+		"""
+		if self._mutation_log is None or not teacher_ids:
+			return
+
+		records = [None] * len(teacher_ids) if teachers is None else [
+			teacherToRecord(teacher) for teacher in teachers
+		]
+		self._mutation_log.appendMany([
+			(operation, teacher_id, record) for teacher_id, record in zip(teacher_ids, records)
+		])
+		self._compactIfNeeded()
+
+	def _logMutation(self, operation, teacher_id, teacher=None):
+		"""
+		Utility method for appending a mutation to the log, if the database
+		has one, and compacting the log once it is long enough.
+		"""
+		if self._mutation_log is None:
+			return
+
+		self._mutation_log.append(
+			operation, teacher_id, None if teacher is None else teacherToRecord(teacher))
+		self._compactIfNeeded()
+
+	def _compactIfNeeded(self):
+		"""
+		Utility method for compacting the log once it reaches the threshold.
+		"""
+		if (self._compaction_threshold is not None
+				and self._mutation_log.numberOfEntries() >= self._compaction_threshold):
+			self.compact()
+
+	def compact(self):
+		"""
+		Write the database to a new snapshot and empty the mutation log. The
+		snapshot is written to a temporary file which then replaces the old
+		one, so that a failure while writing leaves the old snapshot and the
+		log intact.
+		"""
+		if self._mutation_log is None:
+			raise Exception('The database has no mutation log, see openDurable.')
+
+		# No mutation may be logged between the snapshot and the truncation.
+		with self._lock:
+			root, extension = os.path.splitext(self._snapshot_filename)
+			temporary_filename = root + '.tmp' + extension
+			self.saveToFile(temporary_filename)
+			os.replace(temporary_filename, self._snapshot_filename)
+
+			self._mutation_log.truncate()
+
+	def closeMutationLog(self):
+		"""
+		Close the mutation log of the database. Later mutations are no longer
+		logged.
+		"""
+		if self._mutation_log is not None:
+			self._mutation_log.close()
+			self._mutation_log = None
+
+	def _trackTeacher(self, teacher_id, teacher):
+		"""
+		Utility method for adding a teacher to the derived structures of the
+		database, and observing its changes.
+		"""
+		success = teacher.calculateTeacherSuccess()
+		self._statistics.insert(
+			teacher_id, success, teacher.numberOfStudents(), type(teacher).__name__)
+		self._indexes.insert(teacher_id, teacher, success)
+
+		observer = partial(self._teacherChanged, teacher_id)
+		teacher.addObserver(observer, before_change=partial(self._teacherChanging, teacher_id))
+		self._teacher_observers[teacher_id] = observer
+		self._snapshot = None
+
+	def _trackTeachers(self, teacher_ids, teachers, success_rates):
+		"""
+		Utility method for adding several teachers to the derived structures
+		of the database at once, and observing their changes.
+		"""
+		self._statistics.insertMany(
+			teacher_ids,
+			success_rates,
+			[teacher.numberOfStudents() for teacher in teachers],
+			[type(teacher).__name__ for teacher in teachers])
+		self._indexes.insertMany(teacher_ids, teachers, success_rates)
+
+		for teacher_id, teacher in zip(teacher_ids, teachers):
+			observer = partial(self._teacherChanged, teacher_id)
+			teacher.addObserver(observer, before_change=partial(self._teacherChanging, teacher_id))
+			self._teacher_observers[teacher_id] = observer
+		self._snapshot = None
+
+	def _untrackTeacher(self, teacher_id, teacher):
+		"""
+		Utility method for removing a teacher from the derived structures of
+		the database, and no longer observing its changes.
+		"""
+		self._statistics.remove(teacher_id)
+		self._indexes.remove(teacher_id, teacher)
+		teacher.removeObserver(self._teacher_observers.pop(teacher_id))
+		self._keepInSnapshots(teacher_id, teacher)
+		self._snapshot = None
+
+	def _keepInSnapshots(self, teacher_id, teacher):
+		"""
+		Utility method called just before a teacher changes or leaves the
+		database: the snapshots which share the teacher keep a copy of it.
+		"""
+		for snapshot in list(self._snapshots):
+			snapshot._keepTeacher(teacher_id, teacher)
+
+	def _teacherChanging(self, teacher_id, teacher):
+		"""
+		Utility method called just before the data of a teacher in the database
+		changes.
+		"""
+		with self._lock:
+			self._keepInSnapshots(teacher_id, teacher)
+
+	def _teacherChanged(self, teacher_id, teacher):
+		"""
+		Utility method called when the data of a teacher in the database changes.
+		"""
+		with self._lock:
+			success = teacher.calculateTeacherSuccess()
+			self._statistics.update(teacher_id, success, teacher.numberOfStudents())
+			self._indexes.updateSuccess(teacher_id, success)
+			self._snapshot = None
+
+			# A small change is logged as it is, other changes with the whole teacher.
+			change = teacher.lastChange()
+			if change is None:
+				self._logMutation('update', teacher_id, teacher)
+			elif self._mutation_log is not None:
+				self._mutation_log.append('change', teacher_id, change)
+				self._compactIfNeeded()
+
+	def _clear(self):
+		"""
+		Utility method for removing all teachers from the database.
+		"""
+		with self._lock:
+			for teacher_id, teacher in self._teachers_and_ids.items():
+				teacher.removeObserver(self._teacher_observers[teacher_id])
+				self._keepInSnapshots(teacher_id, teacher)
+
+			self._teachers_and_ids = {}
+			self._statistics.clear()
+			self._indexes.clear()
+			self._teacher_observers = {}
+			self._snapshot = None
 
 	def retrieveTeacher(self, teacher_id):
 		"""
@@ -45,7 +316,8 @@ class TeachersDataBase(object):
 		:rtype:
 			None | :class:`TeacherJessica` | :class`TeacherArya`
 		"""
-		return self._teachers_and_ids[teacher_id] if teacher_id in self._teachers_and_ids.keys() else None
+		# A single lookup, which is atomic and doesn't need the lock.
+		return self._teachers_and_ids.get(teacher_id)
 
 	def addTeacher(self, teacher_id, teacher):
 		"""
@@ -61,14 +333,17 @@ class TeachersDataBase(object):
 		:type teacher:
 			:class:`TeacherJessica` | :class:`TeacherArya`
 		"""
-		if teacher_id in self._teachers_and_ids.keys():
-			raise Exception('The given teacher ID is already in use.')
+		with self._lock:
+			if teacher_id in self._teachers_and_ids.keys():
+				raise Exception('The given teacher ID is already in use.')
 
-		if not isinstance(teacher, (TeacherJessica, TeacherArya)):
-			raise Exception('Teacher must be an instance of either TeacherJessica or TeacherArya.')
+			if not isinstance(teacher, (TeacherJessica, TeacherArya)):
+				raise Exception('Teacher must be an instance of either TeacherJessica or TeacherArya.')
 
-		# All good, add to the database.
-		self._teachers_and_ids[teacher_id] = teacher
+			# All good, add to the database.
+			self._teachers_and_ids[teacher_id] = teacher
+			self._trackTeacher(teacher_id, teacher)
+			self._logMutation('add', teacher_id, teacher)
 
 	def removeTeacher(self, teacher_id):
 		"""
@@ -79,10 +354,165 @@ class TeachersDataBase(object):
 		:type teacher_id:
 			str
 		"""
-		if teacher_id not in self._teachers_and_ids.keys():
-			raise Exception('The given teacher ID is not in the database.')
+		with self._lock:
+			if teacher_id not in self._teachers_and_ids.keys():
+				raise Exception('The given teacher ID is not in the database.')
+
+			self._untrackTeacher(teacher_id, self._teachers_and_ids.pop(teacher_id))
+			self._logMutation('remove', teacher_id)
+
+	def addTeachers(self, teacher_ids, teachers):
+		"""
+		A method for adding several teachers to the database at once. The
+		teachers are validated first, and the valid ones are then added with a
+		single update of the statistics and indexes of the database. A teacher
+		which cannot be added is reported, and doesn't prevent the others from
+		being added.
+
+		:param teacher_ids:
+			The IDs that uniquely determine the teachers.
+		:type teacher_ids:
+			list of str
+
+		:param teachers:
+			The teachers to add to the database.
+		:type teachers:
+			list of :class:`TeacherJessica` | :class:`TeacherArya`
+
+		:returns:
+			The ID of each teacher which was not added, with the reason, in the
+			order of the given teachers.
+		:rtype:
+			list of tuple of (str, str)
+		"""
+		teacher_ids = list(teacher_ids)
+		teachers = list(teachers)
+		if len(teacher_ids) != len(teachers):
+			raise Exception('The number of teacher IDs must match the number of teachers.')
+
+		with self._lock:
+			failures = []
+			added_ids = []
+			added_teachers = []
+			success_rates = []
+			for teacher_id, teacher in zip(teacher_ids, teachers):
+				if teacher_id in self._teachers_and_ids:
+					failures.append((teacher_id, 'The given teacher ID is already in use.'))
+				elif not isinstance(teacher, (TeacherJessica, TeacherArya)):
+					failures.append(
+						(teacher_id, 'Teacher must be an instance of either TeacherJessica or TeacherArya.'))
+				else:
+					try:
+						success_rates.append(teacher.calculateTeacherSuccess())
+					except Exception as error:
+						failures.append((teacher_id, str(error)))
+						continue
+
+					# Reserve the ID, so that a duplicate in the batch is reported.
+					self._teachers_and_ids[teacher_id] = teacher
+					added_ids.append(teacher_id)
+					added_teachers.append(teacher)
+
+			if added_ids:
+				self._trackTeachers(added_ids, added_teachers, success_rates)
+				self._logMutations('add', added_ids, added_teachers)
+
+			return failures
+
+	def removeTeachers(self, teacher_ids):
+		"""
+		A method for removing several teachers from the database at once, with
+		a single update of the statistics and indexes of the database. An ID
+		which is not in the database is reported, and doesn't prevent the
+		other teachers from being removed.
+
+		:param teacher_ids:
+			The IDs that uniquely determine the teachers to remove.
+		:type teacher_ids:
+			list of str
+
+		:returns:
+			Each ID which was not removed, with the reason, in the given order.
+		:rtype:
+			list of tuple of (str, str)
+		"""
+		with self._lock:
+			failures = []
+			removed_ids = []
+			removed_teachers = []
+			for teacher_id in teacher_ids:
+				teacher = self._teachers_and_ids.pop(teacher_id, None)
+				if teacher is None:
+					failures.append((teacher_id, 'The given teacher ID is not in the database.'))
+					continue
+
+				removed_ids.append(teacher_id)
+				removed_teachers.append(teacher)
+
+			if removed_ids:
+				for teacher_id, teacher in zip(removed_ids, removed_teachers):
+					self._statistics.remove(teacher_id)
+					teacher.removeObserver(self._teacher_observers.pop(teacher_id))
+					self._keepInSnapshots(teacher_id, teacher)
+				self._indexes.removeMany(removed_ids, removed_teachers)
+				self._snapshot = None
+				self._logMutations('remove', removed_ids)
 
-		del self._teachers_and_ids[teacher_id]
+			return failures
+
+	def teachersWithStudent(self, student_name):
+		"""
+		:param student_name:
+			The name of a student.
+		:type student_name:
+			str
+
+		:returns:
+			The IDs of the teachers who have the given student.
+		:rtype:
+			set of str
+		"""
+		with self._lock:
+			return self._indexes.teachersWithStudent(student_name)
+
+	def teachersOfType(self, teacher_type):
+		"""
+		:param teacher_type:
+			The type of teacher, as a class or a class name. Teachers of a
+			subclass of the type are not included.
+		:type teacher_type:
+			type | str
+
+		:returns:
+			The IDs of the teachers of the given type.
+		:rtype:
+			set of str
+		"""
+		with self._lock:
+			return self._indexes.teachersOfType(teacher_type)
+
+	def teachersWithSuccessBetween(self, minimum=None, maximum=None):
+		"""
+		:param minimum:
+			The lowest success rate included, in percentages.
+			|DEFAULT| No lower bound.
+		:type minimum:
+			None | float
+
+		:param maximum:
+			The success rate above the range, excluded, in percentages.
+			|DEFAULT| No upper bound.
+		:type maximum:
+			None | float
+
+		:returns:
+			The IDs of the teachers whose success rate is in the range, in order
+			of increasing success.
+		:rtype:
+			list of str
+		"""
+		with self._lock:
+			return self._indexes.teachersWithSuccessBetween(minimum=minimum, maximum=maximum)
 
 	def numberOfEntries(self):
 		"""
@@ -100,12 +530,8 @@ class TeachersDataBase(object):
 		:rtype:
 			float
 		"""
-		teachers = list(self._teachers_and_ids.values())
-		teacher_successes = [teacher.calculateTeacherSuccess() for teacher in teachers]
-		average_success_rate = sum(
-			[teacher.calculateTeacherSuccess() for teacher in teachers]) / len(teachers)
-
-		return average_success_rate
+		with self._lock:
+			return self._statistics.successMean()
 
 	def determineSuccessStandardDeviation(self):
 		"""
@@ -114,10 +540,52 @@ class TeachersDataBase(object):
 		:rtype:
 			float
 		"""
-		teachers = list(self._teachers_and_ids.values())
-		success_rates = numpy.array([teacher.calculateTeacherSuccess() for teacher in teachers])
-		
-		return numpy.std(success_rates)
+		with self._lock:
+			return self._statistics.successStandardDeviation()
+
+	def determineSuccessMoments(self):
+		"""
+		:returns:
+			The number of teachers, the mean success rate and the sum of the
+			squared differences of the success rates from the mean, which can be
+			combined with those of other databases, see
+			:func:`TeachersStatistics.combineSuccessMoments`.
+		:rtype:
+			tuple of (int, float, float)
+		"""
+		with self._lock:
+			return self._statistics.successMoments()
+
+	def determineSuccessPercentiles(self, percentiles):
+		"""
+		:param percentiles:
+			The percentiles to calculate, between 0 and 100.
+		:type percentiles:
+			float | list of float
+
+		:returns:
+			The percentiles of the success rate of the teachers.
+		:rtype:
+			float | ``numpy.ndarray``
+		"""
+		with self._lock:
+			return self._statistics.successPercentiles(percentiles)
+
+	def determineSuccessHistogram(self, bins=10):
+		"""
+		:param bins:
+			The number of bins between 0 and 100 %, or the bin edges.
+			|DEFAULT| 10
+		:type bins:
+			int | list of float
+
+		:returns:
+			The number of teachers in each bin of success rate, and the bin edges.
+		:rtype:
+			tuple of (``numpy.ndarray``, ``numpy.ndarray``)
+		"""
+		with self._lock:
+			return self._statistics.successHistogram(bins=bins)
 
 	def totalNumberOfStudents(self):
 		"""
@@ -126,43 +594,109 @@ class TeachersDataBase(object):
 		:rtype:
 			int
 		"""
-		students_per_teacher = [len(teacher.studentNames()) for teacher in self._teachers_and_ids.values()]
-		return int(sum(students_per_teacher))
+		return self._statistics.totalNumberOfStudents()
 
-	def reportInfo(self):
-		""" 
-		A method for reporting all the information about the teachers in the database.
+	def numberOfTeachersPerType(self):
+		"""
+		:returns:
+			The number of teachers of each type, keyed by the class name.
+		:rtype:
+			dict of type {str: int}
+		"""
+		with self._lock:
+			return self._statistics.numberOfTeachersPerType()
+
+	def determineAverageGradeScenarios(self, weights_matrix, subjects=None):
+		"""
+		Method for calculating the average grade of the students of all teachers
+		under many weightings of the subjects at once, see
+		:meth:`TeacherJessica.averageGradeScenarios`. The grades of the teachers
+		of each type are stacked, so that there is one matrix product per
+		teacher type.
+
+		:param weights_matrix:
+			The weights of the subjects as a (weightings x subjects) matrix,
+			with one row per weighting.
+		:type weights_matrix:
+			list of list of float | ``numpy.ndarray``
+
+		:param subjects:
+			The subjects of the columns of ``weights_matrix``. The weights are
+			normalized over the subjects of each teacher.
+			|DEFAULT| The subjects of all teachers, in the order in which they
+			first appear.
+		:type subjects:
+			None | list of str
+
+		:returns:
+			The average grades as a (students x weightings) matrix for each
+			teacher, keyed by the teacher ID, with the rows aligned with the
+			names of the students of the teacher.
+		:rtype:
+			dict of type {str: ``numpy.ndarray``}
 		"""
+		teachers_and_ids = self.snapshot().teachersAndIds()
+
+		teachers_per_type = {}
+		for teacher_id, teacher in teachers_and_ids:
+			teachers_per_type.setdefault(type(teacher), []).append((teacher_id, teacher))
+
+		if subjects is None:
+			subjects = []
+			for teacher_class in teachers_per_type:
+				subjects.extend(
+					subject for subject in teacher_class.subjects() if subject not in subjects)
+
+		average_grades = {}
+		for teacher_class, teachers in teachers_per_type.items():
+			grades_matrices = [teacher.studentGradesMatrix() for _, teacher in teachers]
+			type_average_grades = teacher_class.averageGradeScenarios(
+				numpy.concatenate(grades_matrices), weights_matrix, subjects=subjects)
 
-		# Determine the number of teachers and total number of students.
-		number_of_teachers = len(self._teachers_and_ids)
-		total_number_of_students = self.totalNumberOfStudents()
-		average_students_per_teacher = numpy.round(
-			total_number_of_students / number_of_teachers, decimals=2)
+			# Split the rows back into the students of each teacher.
+			ends = numpy.cumsum([len(grades_matrix) for grades_matrix in grades_matrices])
+			for (teacher_id, _), teacher_average_grades in zip(
+					teachers, numpy.split(type_average_grades, ends[:-1])):
+				average_grades[teacher_id] = teacher_average_grades
 
-		# Determine the average success and std deviation.
-		average_success_rate = self.determineSuccessAverage()
-		success_std_deviation = self.determineSuccessStandardDeviation()
+		# In the order of the database.
+		return {teacher_id: average_grades[teacher_id] for teacher_id, _ in teachers_and_ids}
 
-		# Create a database info template and fill it.
-		info = textwrap.dedent("""\
-			Summary of the teachers database.
+	def snapshot(self):
+		"""
+		A method for taking a read-only snapshot of the database, which is not
+		changed by the later changes of the database. The teachers are shared
+		with the database until they change or leave the database, and the
+		snapshot then holds a copy of the teacher as it was. The snapshot is
+		kept until the next change, so that taking it again without changes in
+		between is free, and it can be read from any number of threads without
+		locking.
+		Long-running reports should be made from a snapshot, so that they see a
+		consistent database while other threads change it.
 
-			Number of teachers in the database: {}
-			Average number of students per teacher: {}
-			Number of students in total: {}
+		:returns:
+			The snapshot.
+		:rtype:
+			:class:`TeachersDataBaseSnapshot.TeachersDataBaseSnapshot`
+		"""
+		snapshot = self._snapshot
+		if snapshot is None:
+			with self._lock:
+				snapshot = self._snapshot
+				if snapshot is None:
+					snapshot = TeachersDataBaseSnapshot(
+						dict(self._teachers_and_ids), self._statistics.copy())
+					self._snapshot = snapshot
+					self._snapshots.add(snapshot)
 
-			Average success rate of the teachers: {} %
-			Standard deviation of success rate: {} 
-			"""
-		).format(
-			number_of_teachers, 
-			average_students_per_teacher,
-			total_number_of_students, 
-			average_success_rate,
-			success_std_deviation)
+		return snapshot
 
-		print(info)
+	def reportInfo(self):
+		""" 
+		A method for reporting all the information about the teachers in the
+		database, from a snapshot of the database.
+		"""
+		self.snapshot().reportInfo()
 
 	def saveToFile(self, json_filename):
 		"""
@@ -176,6 +710,7 @@ class TeachersDataBase(object):
 				"math_grades": [7, 8],
 				"art_grades": [9, 10],
 				"science_grades": [6, 7],
+				"students_getting_along_matrix": [[0.9, 0.6], [0.6, 0.7]],
 			},
 
 			teacherid2: {
@@ -184,79 +719,439 @@ class TeachersDataBase(object):
 				"math_grades": [7, 8],
 				"art_grades": [9, 10],
 				"science_grades": [],
+				"students_getting_along_matrix": [[0.9, 0.6], [0.6, 0.7]],
 			},
 		}
+
+		If the file name has the extension ``.jsonl``, the file is instead
+		written in the JSON Lines format: one line per teacher, holding the
+		dict of the teacher with its ID under the key "teacher_id".
+
+		The file is written one teacher at a time and without indentation,
+		so that the memory used doesn't grow with the size of the database.
+
+		If the file name has the extension ``.npz``, the file is instead
+		written in a binary, columnar format which is much faster to write
+		and read, see :mod:`TeachersDataBaseNpz`.
+
+		:param json_filename:
+			The JSON, JSON Lines or npz file to which the teachers data is written.
+		:type json_filename:
+			str
 		"""
-		# Initialize the dict to be stored in the JSON file.
-		json_dict = {}
-
-		# Loop through the teacher Ids.
-		for teacher_id, teacher in self._teachers_and_ids.items():
-			# Initialize the dict for this teacher.
-			teacher_info_dict = {}
-
-			# Fetch all the parameters.
-			teacher_name = type(teacher).__name__
-			student_names = teacher.studentNames()
-			math_grades = teacher.studentMathGrades()
-			art_grades = teacher.studentArtGrades()
-			getting_along_matrix = teacher._studentsGettingAlongMatrix().tolist()
-
-			# Fetch science grades if Arya, else empty list.
-			science_grades = (
-				teacher.studentScienceGrades() if isinstance(teacher, TeacherArya) else [])
-
-			# Populate the dict.
-			teacher_info_dict['teacher_type'] = teacher_name
-			teacher_info_dict['names'] = student_names
-			teacher_info_dict['math_grades'] = math_grades
-			teacher_info_dict['art_grades'] = art_grades
-			teacher_info_dict['science_grades'] = science_grades
-			teacher_info_dict['students_getting_along_matrix'] = getting_along_matrix
-
-			# Add to the json dict.
-			json_dict[teacher_id] = teacher_info_dict
-
-		# Write to the file.
+		# Write a snapshot, so that other threads can change the database meanwhile.
+		teachers_and_ids = self.snapshot().teachersAndIds()
+
+		if json_filename.lower().endswith('.npz'):
+			writeTeachersNpz(
+				json_filename,
+				[teacher_id for teacher_id, _ in teachers_and_ids],
+				[teacher for _, teacher in teachers_and_ids])
+			return
+
+		json_lines = json_filename.lower().endswith('.jsonl')
+
 		with open(json_filename, 'w') as f:
-			json.dump(json_dict, f, indent=4)
+			if not json_lines:
+				f.write('{')
+
+			for index, (teacher_id, teacher) in enumerate(teachers_and_ids):
+				record = teacherToRecord(teacher)
+
+				if json_lines:
+					record['teacher_id'] = teacher_id
+					f.write(json.dumps(record))
+					f.write('\n')
+				else:
+					f.write(',\n' if index > 0 else '\n')
+					f.write(json.dumps(teacher_id))
+					f.write(': ')
+					f.write(json.dumps(record))
+
+			if not json_lines:
+				f.write('\n}\n')
 
 	def populateFromFile(self, json_filename):
 		"""
-		Method for populating the teachers database from the given JSON file.
+		Method for populating the teachers database from the given JSON file,
+		written by :meth:`saveToFile`.
+
+		:param json_filename:
+			The JSON, JSON Lines or npz file from which the teachers data should
+			be read from.
+		:type json_filename:
+			str
+		"""
+		for _ in self.populateIncrementallyFromFile(json_filename):
+			pass
+
+	def populateIncrementallyFromFile(self, json_filename):
+		"""
+		Generator populating the teachers database from the given JSON file,
+		written by :meth:`saveToFile`, one teacher at a time. The file is
+		parsed incrementally, so that only the data of one teacher is held
+		in memory on top of the database, and the database can be queried
+		while the remaining teachers are loaded. The arrays of an npz file
+		are memory-mapped.
 
 		:param json_filename:
-			The JSON file from which the teachers data should be read from.
+			The JSON, JSON Lines or npz file from which the teachers data should
+			be read from.
 		:type json_filename:
 			str
+
+		:returns:
+			A generator yielding the ID of each teacher, once the teacher has
+			been added to the database.
+		:rtype:
+			generator of str
 		"""
+		self._checkNoMutationLog()
+
 		# Empty the current data.
-		self._teachers_and_ids = {}
+		self._clear()
+
+		if json_filename.lower().endswith('.npz'):
+			teachers = iterateTeachersNpz(json_filename)
+		else:
+			teachers = (
+				(teacher_id, teacherFromRecord(record))
+				for teacher_id, record in iterateTeacherRecords(json_filename))
+
+		for teacher_id, teacher_instance in teachers:
+			self._insertOrReplaceTeacher(teacher_id, teacher_instance)
+			yield teacher_id
+
+	def populateFromFileInParallel(
+			self,
+			json_filename,
+			number_of_workers=None,
+			use_threads=False,
+			chunk_size=256):
+		"""
+		Method for populating the teachers database from the given file, written
+		by :meth:`saveToFile`, constructing the teachers in a pool of workers.
+		The teacher records are sent to the workers in chunks, and the teachers
+		are added to the database in the order of the file.
+
+		With a JSON Lines file, the workers also parse the records, so that the
+		load scales with the number of cores. With a JSON file, the records are
+		parsed in this process and only constructed by the workers. An npz
+		file is memory-mapped, which is faster than any parallel load, so it
+		is loaded as by :meth:`populateFromFile`.
+
+		:param json_filename:
+			The JSON, JSON Lines or npz file from which the teachers data should
+			be read from.
+		:type json_filename:
+			str
+
+		:param number_of_workers:
+			The number of workers.
+			|DEFAULT| The number of processors.
+		:type number_of_workers:
+			None | int
+
+		:param use_threads:
+			Whether the workers are threads instead of processes. Threads avoid
+			sending the teachers between processes, but only run in parallel
+			in the parts of numpy which release the GIL.
+			|DEFAULT| False
+		:type use_threads:
+			bool
+
+		:param chunk_size:
+			The number of teachers sent to a worker at a time.
+			|DEFAULT| 256
+		:type chunk_size:
+			int
+		"""
+		if json_filename.lower().endswith('.npz'):
+			self.populateFromFile(json_filename)
+			return
+
+		self._checkNoMutationLog()
+
+		# Empty the current data.
+		self._clear()
+
+		if json_filename.lower().endswith('.jsonl'):
+			chunks = _chunked(_nonEmptyLines(json_filename), chunk_size)
+			construct = _teachersFromJsonLines
+		else:
+			chunks = _chunked(iterateTeacherRecords(json_filename), chunk_size)
+			construct = _teachersFromRecords
+
+		number_of_workers = number_of_workers or os.cpu_count() or 1
+		executor_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+		with executor_class(max_workers=number_of_workers) as executor:
+			# Keep a bounded number of chunks in flight, so that the file is
+			# not read faster than the teachers are constructed.
+			pending = deque()
+			for chunk in chunks:
+				pending.append(executor.submit(construct, chunk))
+				if len(pending) >= 2 * number_of_workers:
+					self._insertOrReplaceTeachers(pending.popleft().result())
+
+			while pending:
+				self._insertOrReplaceTeachers(pending.popleft().result())
+
+	def _checkNoMutationLog(self):
+		"""
+		Utility method raising an exception if the database has a mutation log,
+		which the replaced contents of the database would not be part of.
+		"""
+		if self._mutation_log is not None:
+			raise Exception('A database with a mutation log cannot be populated from a file.')
+
+	def _insertOrReplaceTeacher(self, teacher_id, teacher):
+		"""
+		Utility method for adding a teacher read from a file to the database.
+		A teacher ID appearing twice is replaced, like a JSON object keeps the
+		last value of a duplicated key.
+		"""
+		with self._lock:
+			if teacher_id in self._teachers_and_ids:
+				self.removeTeacher(teacher_id)
+
+			self._teachers_and_ids[teacher_id] = teacher
+			self._trackTeacher(teacher_id, teacher)
+
+	def _insertOrReplaceTeachers(self, teachers_and_ids):
+		"""
+		Utility method for adding a list of (ID, teacher) pairs read from a file.
+		"""
+		for teacher_id, teacher in teachers_and_ids:
+			self._insertOrReplaceTeacher(teacher_id, teacher)
+
+
+def teacherToRecord(teacher):
+	"""
+	Utility method for converting a teacher into a dict of JSON-compatible
+	data, in the format described in :meth:`TeachersDataBase.saveToFile`. A
+	packed getting-along matrix is written as a flat list, and a sparse one
+	is written as a dense matrix.
+
+	:param teacher:
+		The teacher.
+	:type teacher:
+		:class:`TeacherJessica` | :class:`TeacherArya`
+
+	:returns:
+		The data of the teacher.
+	:rtype:
+		dict
+	"""
+	record = {
+		'teacher_type': type(teacher).__name__,
+		'names': teacher.studentNames(),
+	}
+
+	# One list of grades per subject, and an empty list of science grades
+	# for the teachers who don't teach science.
+	grades = teacher.studentGradesMatrix()
+	for column, subject in enumerate(teacher.subjects()):
+		record[subject + '_grades'] = grades[:, column].tolist()
+	record.setdefault('science_grades', [])
+
+	getting_along_matrix = teacher.studentsGettingAlongMatrix()
+	if isSparseMatrix(getting_along_matrix):
+		getting_along_matrix = getting_along_matrix.toarray()
+	record['students_getting_along_matrix'] = (
+		None if getting_along_matrix is None else numpy.asarray(getting_along_matrix).tolist())
+
+	return record
+
+
+def teacherFromRecord(record):
+	"""
+	Utility method for creating a teacher from a dict in the format written
+	by :func:`teacherToRecord`. Grades given as dicts of the student names,
+	as in earlier versions of the format, are also accepted.
+
+	:param record:
+		The data of the teacher.
+	:type record:
+		dict
+
+	:returns:
+		The teacher.
+	:rtype:
+		:class:`TeacherJessica` | :class:`TeacherArya`
+	"""
+	teacher_class = teacherType(record['teacher_type'])
+
+	getting_along_matrix = record.get('students_getting_along_matrix')
+	if getting_along_matrix is not None:
+		getting_along_matrix = numpy.array(getting_along_matrix)
+
+	subjects = teacher_class.subjects()
+	if isinstance(record['math_grades'], dict):
+		teacher_args = {
+			'student_%s_grades' % subject: record[subject + '_grades'] for subject in subjects
+		}
+		return teacher_class(students_getting_along_matrix=getting_along_matrix, **teacher_args)
+
+	# The grades are validated at once by the columnar constructor.
+	grades = numpy.array([record[subject + '_grades'] for subject in subjects]).T
+	return teacher_class.fromArrays(
+		record['names'], grades, students_getting_along_matrix=getting_along_matrix)
+
+
+def _teachersFromRecords(records):
+	"""
+	Utility method run by the workers of the parallel load: constructs the
+	teachers from a list of (ID, record) pairs.
+	"""
+	return [(teacher_id, teacherFromRecord(record)) for teacher_id, record in records]
+
+
+def _teachersFromJsonLines(lines):
+	"""
+	Utility method run by the workers of the parallel load: parses a list of
+	JSON Lines and constructs the teachers.
+	"""
+	teachers = []
+	for line in lines:
+		record = json.loads(line)
+		teachers.append((record.pop('teacher_id'), teacherFromRecord(record)))
+
+	return teachers
+
+
+def _nonEmptyLines(filename):
+	"""
+	Generator yielding the non-empty lines of a text file.
+	"""
+	with open(filename, 'r') as f:
+		for line in f:
+			if line.strip():
+				yield line
+
+
+def _chunked(iterable, chunk_size):
+	"""
+	Generator yielding the items of the given iterable in lists of at most
+	``chunk_size`` items.
+	"""
+	iterator = iter(iterable)
+	while True:
+		chunk = list(islice(iterator, chunk_size))
+		if not chunk:
+			return
+		yield chunk
+
+
+def iterateTeacherRecords(json_filename):
+	"""
+	Generator reading the teachers data from a file written by
+	:meth:`TeachersDataBase.saveToFile` incrementally.
+
+	:param json_filename:
+		The JSON or JSON Lines file.
+	:type json_filename:
+		str
+
+	:returns:
+		A generator yielding the ID and the data of each teacher.
+	:rtype:
+		generator of tuple of (str, dict)
+	"""
+	with open(json_filename, 'r') as f:
+		if json_filename.lower().endswith('.jsonl'):
+			for line in f:
+				if line.strip():
+					record = json.loads(line)
+					yield record.pop('teacher_id'), record
+		else:
+			yield from iterateJsonObjectItems(f)
+
+
+def iterateJsonObjectItems(text_file, chunk_size=1 << 16):
+	"""
+	Generator parsing the JSON object in the given file incrementally, one
+	member at a time. Only the current member is held in memory, on top of
+	one chunk of the file.
+
+	:param text_file:
+		The file, opened in text mode.
+	:type text_file:
+		file object
+
+	:param chunk_size:
+		The number of characters read from the file at a time.
+		|DEFAULT| 65536
+	:type chunk_size:
+		int
+
+	:returns:
+		A generator yielding the key and the value of each member of the object.
+	:rtype:
+		generator of tuple of (str, object)
+	"""
+	decoder = json.JSONDecoder()
+	buffer = ''
+	position = 0
+	end_of_file = False
+
+	def readMore():
+		# Drop the parsed part of the buffer and read at least as much as is
+		# left in it, so that a value larger than a chunk is re-parsed only
+		# a logarithmic number of times.
+		nonlocal buffer, position, end_of_file
+		chunk = text_file.read(max(chunk_size, len(buffer) - position))
+		buffer = buffer[position:] + chunk
+		position = 0
+		end_of_file = (chunk == '')
+
+	def nextCharacter():
+		# Skip the whitespace and return the next character, '' at the end.
+		nonlocal position
+		while True:
+			while position < len(buffer) and buffer[position] in ' \t\n\r':
+				position += 1
+			if position < len(buffer) or end_of_file:
+				return buffer[position:position + 1]
+			readMore()
+
+	def expect(character):
+		nonlocal position
+		if nextCharacter() != character:
+			raise ValueError(
+				'Invalid JSON object in %s: expected %r.' % (getattr(text_file, 'name', 'file'), character))
+		position += 1
+
+	def decodeValue():
+		# Decode the next value, reading more of the file until the value
+		# is complete.
+		nonlocal position
+		nextCharacter()
+		while True:
+			try:
+				value, end = decoder.raw_decode(buffer, position)
+			except ValueError:
+				if end_of_file:
+					raise
+				readMore()
+				continue
+
+			# A number at the end of the buffer may continue in the file.
+			if end == len(buffer) and not end_of_file:
+				readMore()
+				continue
+
+			position = end
+			return value
+
+	expect('{')
+	if nextCharacter() == '}':
+		return
+
+	while True:
+		key = decodeValue()
+		expect(':')
+		yield key, decodeValue()
 
-		# Read and json-load the data from the given file.
-		with open(json_filename, 'r') as f:
-			read_data = json.load(f)
-
-		# Loop through the read dict and set up the database on this object.
-		for teacher_id, data in read_data.items():
-			# Fetch the data for this teacher.
-			math_grades = data['math_grades']
-			art_grades = data['art_grades']
-			science_grades = data['science_grades']
-			getting_along_matrix = numpy.array(data['students_getting_along_matrix'])
-
-			# Fetch class type and setup input args.
-			class_type = data['teacher_type']
-			teacher_args = {
-				'student_math_grades': math_grades,
-				'student_art_grades': art_grades,
-				'students_getting_along_matrix': getting_along_matrix
-			}
-
-			# If Arya, add also the science grades.
-			if class_type == 'TeacherArya':
-				teacher_args['student_science_grades'] = science_grades
-
-			# Instantiate using eval and add to the dict.
-			teacher_instance = eval(class_type)(**teacher_args)
-			self._teachers_and_ids[teacher_id] = teacher_instance
+		if nextCharacter() == '}':
+			return
+		expect(',')
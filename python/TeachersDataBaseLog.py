@@ -0,0 +1,178 @@
+""" Module implementing an append-only log of the mutations of a database of teachers """
+
+import json
+import os
+
+
+class MutationLog(object):
+
+	def __init__(self, log_filename, fsync=False):
+		"""
+		This class implements an append-only log of the mutations of a database
+		of teachers, in the JSON Lines format. Each mutation is one line: a dict
+		with the "operation" ('add', 'update', 'change' or 'remove'), the
+		"teacher_id", for additions and updates the data of the teacher under
+		"teacher", in the format of :func:`TeachersDataBase.teacherToRecord`,
+		and for changes the change of the teacher under "change", see
+		:meth:`TeacherJessica.lastChange`.
+
+		:param log_filename:
+			The log file. Mutations are appended to an existing log.
+		:type log_filename:
+			str
+
+		:param fsync:
+			Whether each mutation is forced to disk before returning, instead of
+			only being handed to the operating system.
+			|DEFAULT| False
+		:type fsync:
+			bool
+		"""
+		self._log_filename = log_filename
+		self._fsync = fsync
+		self._number_of_entries = sum(1 for _ in iterateMutationLog(log_filename))
+
+		# Drop a last line left incomplete by a process which stopped while
+		# writing it, so that new mutations start on a line of their own.
+		_truncateIncompleteLine(log_filename)
+		self._file = open(log_filename, 'a')
+
+	def logFilename(self):
+		"""
+		:returns:
+			The log file.
+		:rtype:
+			str
+		"""
+		return self._log_filename
+
+	def numberOfEntries(self):
+		"""
+		:returns:
+			The number of mutations in the log.
+		:rtype:
+			int
+		"""
+		return self._number_of_entries
+
+	def append(self, operation, teacher_id, record=None):
+		"""
+		Append a mutation to the log.
+
+		:param operation:
+			The operation: 'add', 'update', 'change' or 'remove'.
+		:type operation:
+			str
+
+		:param teacher_id:
+			The ID of the teacher.
+		:type teacher_id:
+			str
+
+		:param record:
+			The data of the teacher, for additions and updates, or the change
+			of the teacher, for changes.
+			|DEFAULT| None
+		:type record:
+			None | dict
+		"""
+		self.appendMany([(operation, teacher_id, record)])
+
+	def appendMany(self, mutations):
+		"""
+		Append several mutations to the log, flushing the log once.
+
+		:param mutations:
+			The operation, the teacher ID and the data or the change of the
+			teacher (None for removals) of each mutation, see :meth:`append`.
+		:type mutations:
+			list of tuple of (str, str, None | dict)
+		"""
+		for operation, teacher_id, record in mutations:
+			entry = {'operation': operation, 'teacher_id': teacher_id}
+			if record is not None:
+				entry['change' if operation == 'change' else 'teacher'] = record
+
+			self._file.write(json.dumps(entry) + '\n')
+
+		self._file.flush()
+		if self._fsync:
+			os.fsync(self._file.fileno())
+
+		self._number_of_entries += len(mutations)
+
+	def truncate(self):
+		"""
+		Remove all mutations from the log, once they are part of a snapshot.
+		"""
+		self._file.close()
+		self._file = open(self._log_filename, 'w')
+		if self._fsync:
+			os.fsync(self._file.fileno())
+
+		self._number_of_entries = 0
+
+	def close(self):
+		"""
+		Close the log file.
+		"""
+		self._file.close()
+
+
+def _truncateIncompleteLine(log_filename):
+	"""
+	Utility method for removing the characters after the last newline of a file.
+	"""
+	if not os.path.exists(log_filename):
+		return
+
+	with open(log_filename, 'rb+') as f:
+		f.seek(0, os.SEEK_END)
+		size = f.tell()
+
+		# Look for the last newline from the end, one block at a time.
+		end = size
+		while end > 0:
+			start = max(0, end - 4096)
+			f.seek(start)
+			position = f.read(end - start).rfind(b'\n')
+			if position >= 0:
+				end = start + position + 1
+				break
+			end = start
+
+		if end < size:
+			f.truncate(end)
+
+
+def iterateMutationLog(log_filename):
+	"""
+	Generator reading the mutations of a log written by :class:`MutationLog`.
+	A last line which is incomplete, because the process stopped while writing
+	it, is ignored.
+
+	:param log_filename:
+		The log file. A missing file is an empty log.
+	:type log_filename:
+		str
+
+	:returns:
+		A generator yielding the operation, the teacher ID and the data or the
+		change of the teacher (None for removals) of each mutation.
+	:rtype:
+		generator of tuple of (str, str, None | dict)
+	"""
+	if not os.path.exists(log_filename):
+		return
+
+	with open(log_filename, 'r') as f:
+		for line in f:
+			try:
+				entry = json.loads(line)
+			except ValueError:
+				# Only the last line can be incomplete.
+				if f.read().strip():
+					raise
+				return
+
+			yield entry['operation'], entry['teacher_id'], entry.get('teacher', entry.get('change'))
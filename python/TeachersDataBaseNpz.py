@@ -0,0 +1,257 @@
+"""
+Module implementing a binary, columnar file format for a database of teachers.
+
+The database is written as an uncompressed numpy ``.npz`` archive holding the
+following arrays, where T is the number of teachers and S the total number
+of students:
+
+	teacher_ids             (T,)      str      The ID of each teacher.
+	teacher_types           (T,)      str      The class name of each teacher.
+	subjects                (K,)      str      The subjects of the grades columns.
+	student_offsets         (T + 1,)  int64    The students of teacher i are
+	                                           rows student_offsets[i] to
+	                                           student_offsets[i + 1].
+	student_names           (S,)      str      The name of each student.
+	grades                  (S, K)    int8     The grades of each student, 0 for
+	                                           a subject the teacher doesn't teach.
+	matrix_kinds            (T,)      int8     The storage of the getting-along
+	                                           matrix, see the MATRIX_* constants.
+	matrix_dtypes           (T,)      str      The dtype of the matrix.
+	matrix_shapes           (T, 2)    int64    The shape of the matrix.
+	matrix_starts           (T,)      int64    The slice of the matrix in the
+	matrix_sizes            (T,)      int64    matrix data of its dtype.
+	matrix_data_<dtype>     (M,)      <dtype>  The raveled dense and packed
+	                                           matrices, and the stored values
+	                                           of the sparse ones, of each
+	                                           dtype, e.g. matrix_data_float32.
+	sparse_indices_offsets  (T + 1,)  int64    The slices of sparse_indices.
+	sparse_indices          (N,)      int64    The CSR column indices.
+	sparse_indptr_offsets   (T + 1,)  int64    The slices of sparse_indptr.
+	sparse_indptr           (P,)      int64    The CSR row pointers.
+
+Since the archive is not compressed, all arrays are memory-mapped on load, and
+the getting-along matrices of the teachers are views of them, without parsing
+or copying. The grades of each teacher are copied from the grades array, since
+a teacher owns its grades.
+"""
+
+import numpy
+
+from SerializationBackends import loadNpz
+from Teachers import concatenateArrays
+from Teachers import isSparseMatrix
+from Teachers import teacherType
+
+
+# The storage of a getting-along matrix.
+MATRIX_NONE = 0
+MATRIX_DENSE = 1
+MATRIX_PACKED = 2
+MATRIX_SPARSE = 3
+
+
+def _offsets(lengths):
+	"""
+	Utility method for converting lengths into the offsets of the slices.
+	"""
+	offsets = numpy.zeros(len(lengths) + 1, dtype=numpy.int64)
+	numpy.cumsum(lengths, out=offsets[1:])
+	return offsets
+
+
+def writeTeachersNpz(npz_filename, teacher_ids, teachers):
+	"""
+	Write the given teachers to a binary database file.
+
+	:param npz_filename:
+		The name of the file to write.
+	:type npz_filename:
+		str
+
+	:param teacher_ids:
+		The ID of each teacher.
+	:type teacher_ids:
+		list of str
+
+	:param teachers:
+		The teachers.
+	:type teachers:
+		list of :class:`TeacherJessica` | :class:`TeacherArya`
+	"""
+	# The grades columns cover the subjects of all teachers.
+	subjects = []
+	for teacher in teachers:
+		subjects.extend(subject for subject in teacher.subjects() if subject not in subjects)
+
+	student_names = []
+	number_of_students = []
+	grades = []
+	matrix_kinds = []
+	matrix_dtypes = []
+	matrix_shapes = []
+	matrix_starts = []
+	matrix_sizes = []
+	# The data of the matrices, and its size, per dtype name.
+	matrix_data = {}
+	matrix_data_sizes = {}
+	sparse_indices = []
+	sparse_indptr = []
+
+	for teacher in teachers:
+		names = teacher.studentNames()
+		student_names.extend(names)
+		number_of_students.append(len(names))
+
+		teacher_grades = numpy.zeros((len(names), len(subjects)), dtype=numpy.int8)
+		for column, subject in enumerate(teacher.subjects()):
+			teacher_grades[:, subjects.index(subject)] = teacher.studentGradesMatrix()[:, column]
+		grades.append(teacher_grades)
+
+		matrix = teacher.studentsGettingAlongMatrix()
+		if matrix is None:
+			matrix_kinds.append(MATRIX_NONE)
+			matrix_dtypes.append('')
+			matrix_shapes.append((0, 0))
+			data = None
+		elif isSparseMatrix(matrix):
+			matrix = matrix.tocsr()
+			matrix_kinds.append(MATRIX_SPARSE)
+			matrix_shapes.append(matrix.shape)
+			data = matrix.data
+			sparse_indices.append(matrix.indices)
+			sparse_indptr.append(matrix.indptr)
+		else:
+			matrix = numpy.asarray(matrix)
+			matrix_kinds.append(MATRIX_PACKED if matrix.ndim == 1 else MATRIX_DENSE)
+			matrix_shapes.append(matrix.shape if matrix.ndim == 2 else (matrix.shape[0], 0))
+			data = matrix.ravel()
+
+		# The data is kept in its dtype, in the native byte order, so that
+		# low precision matrices take no more room and are not converted on
+		# load.
+		if data is None:
+			matrix_starts.append(0)
+			matrix_sizes.append(0)
+		else:
+			dtype = data.dtype.newbyteorder('=')
+			matrix_dtypes.append(dtype.str)
+			matrix_starts.append(matrix_data_sizes.get(dtype.name, 0))
+			matrix_sizes.append(len(data))
+			matrix_data.setdefault(dtype.name, []).append(data.astype(dtype, copy=False))
+			matrix_data_sizes[dtype.name] = matrix_starts[-1] + len(data)
+
+		if not isSparseMatrix(matrix):
+			sparse_indices.append(numpy.zeros(0, dtype=numpy.int64))
+			sparse_indptr.append(numpy.zeros(0, dtype=numpy.int64))
+
+	arrays = {
+		'teacher_ids': numpy.array(teacher_ids, dtype=str),
+		'teacher_types': numpy.array([type(teacher).__name__ for teacher in teachers], dtype=str),
+		'subjects': numpy.array(subjects, dtype=str),
+		'student_offsets': _offsets(number_of_students),
+		'student_names': numpy.array(student_names, dtype=str),
+		'grades': (
+			numpy.concatenate(grades) if grades else numpy.zeros((0, len(subjects)), dtype=numpy.int8)),
+		'matrix_kinds': numpy.array(matrix_kinds, dtype=numpy.int8),
+		'matrix_dtypes': numpy.array(matrix_dtypes, dtype=str),
+		'matrix_shapes': numpy.array(matrix_shapes, dtype=numpy.int64).reshape(-1, 2),
+		'matrix_starts': numpy.array(matrix_starts, dtype=numpy.int64),
+		'matrix_sizes': numpy.array(matrix_sizes, dtype=numpy.int64),
+		'sparse_indices_offsets': _offsets([len(indices) for indices in sparse_indices]),
+		'sparse_indices': concatenateArrays(sparse_indices, numpy.int64),
+		'sparse_indptr_offsets': _offsets([len(indptr) for indptr in sparse_indptr]),
+		'sparse_indptr': concatenateArrays(sparse_indptr, numpy.int64),
+	}
+	for dtype_name, data in matrix_data.items():
+		arrays['matrix_data_' + dtype_name] = concatenateArrays(data, dtype_name)
+
+	# Write through a file object, so that numpy does not append an
+	# extension to the given file name.
+	with open(npz_filename, 'wb') as f:
+		numpy.savez(f, **arrays)
+
+
+def iterateTeachersNpz(npz_filename, mmap_mode='c'):
+	"""
+	Generator reading the teachers from a binary database file written by
+	:func:`writeTeachersNpz`. The getting-along matrices of the teachers are
+	views of the arrays of the file, and the teachers are not validated since
+	the file was written from valid teachers.
+
+	:param npz_filename:
+		The name of the file to read.
+	:type npz_filename:
+		str
+
+	:param mmap_mode:
+		The mode with which the arrays of the file are memory-mapped, or None
+		to read them into memory. With the default copy-on-write mode, the
+		teachers can be changed without changing the file.
+		|DEFAULT| 'c'
+	:type mmap_mode:
+		None | str
+
+	:returns:
+		A generator yielding the ID of each teacher and the teacher.
+	:rtype:
+		generator of tuple of (str, :class:`TeacherJessica` | :class:`TeacherArya`)
+	"""
+	arrays = loadNpz(npz_filename, mmap_mode=mmap_mode)
+
+	subjects = arrays['subjects'].tolist()
+	student_offsets = arrays['student_offsets']
+	student_names = arrays['student_names']
+	grades = arrays['grades']
+	matrix_kinds = arrays['matrix_kinds']
+	matrix_dtypes = arrays['matrix_dtypes']
+	matrix_shapes = arrays['matrix_shapes']
+	matrix_starts = arrays['matrix_starts']
+	matrix_sizes = arrays['matrix_sizes']
+	sparse_indices_offsets = arrays['sparse_indices_offsets']
+	sparse_indices = arrays['sparse_indices']
+	sparse_indptr_offsets = arrays['sparse_indptr_offsets']
+	sparse_indptr = arrays['sparse_indptr']
+
+	# The grades columns of each teacher type.
+	columns_by_type = {}
+
+	for index, (teacher_id, teacher_type) in enumerate(
+			zip(arrays['teacher_ids'].tolist(), arrays['teacher_types'].tolist())):
+		teacher_class = teacherType(teacher_type)
+		if teacher_type not in columns_by_type:
+			columns = [subjects.index(subject) for subject in teacher_class.subjects()]
+			# A range of columns is a view, other columns are copied.
+			if columns == list(range(columns[0], columns[0] + len(columns))):
+				columns = slice(columns[0], columns[0] + len(columns))
+			columns_by_type[teacher_type] = columns
+
+		start, end = student_offsets[index], student_offsets[index + 1]
+		teacher_grades = grades[start:end, columns_by_type[teacher_type]]
+
+		# Rebuild the getting-along matrix in its original storage.
+		kind = matrix_kinds[index]
+		if kind != MATRIX_NONE:
+			dtype = numpy.dtype(matrix_dtypes[index])
+			matrix_data = arrays['matrix_data_' + dtype.name]
+			matrix_start = matrix_starts[index]
+			data = matrix_data[matrix_start:matrix_start + matrix_sizes[index]].astype(dtype, copy=False)
+		matrix_rows, matrix_columns = matrix_shapes[index]
+		if kind == MATRIX_NONE:
+			matrix = None
+		elif kind == MATRIX_DENSE:
+			matrix = data.reshape(matrix_rows, matrix_columns)
+		elif kind == MATRIX_PACKED:
+			matrix = data
+		else:
+			from scipy.sparse import csr_matrix
+			matrix = csr_matrix((
+				data,
+				sparse_indices[sparse_indices_offsets[index]:sparse_indices_offsets[index + 1]],
+				sparse_indptr[sparse_indptr_offsets[index]:sparse_indptr_offsets[index + 1]]),
+				shape=(matrix_rows, matrix_columns))
+
+		teacher = teacher_class.fromArrays(
+			student_names[start:end].tolist(), teacher_grades,
+			students_getting_along_matrix=matrix, trusted=True)
+
+		yield teacher_id, teacher
@@ -0,0 +1,197 @@
+""" Module implementing a read-only snapshot of a database of teachers """
+
+import copy
+import numpy
+import textwrap
+
+
+class TeachersDataBaseSnapshot(object):
+
+	def __init__(self, teachers_and_ids, statistics):
+		"""
+		This class implements a read-only snapshot of a database of teachers,
+		see :meth:`TeachersDataBase.snapshot`. The snapshot is never changed,
+		so that it can be read from any number of threads without locking, and
+		all the information it reports is consistent with each other.
+
+		The teachers are shared with the database until they change or leave
+		the database: the snapshot then holds a copy of the teacher as it was
+		when the snapshot was taken, see :meth:`_keepTeacher`, so that the
+		teachers always match the statistics of the snapshot.
+
+		:param teachers_and_ids:
+			The teachers, keyed by their ID. The dict is owned by the snapshot.
+		:type teachers_and_ids:
+			dict of type {str: :class:`TeacherJessica` | :class:`TeacherArya`}
+
+		:param statistics:
+			The statistics of the teachers. The table is owned by the snapshot.
+		:type statistics:
+			:class:`TeachersStatistics.TeacherStatisticsTable`
+		"""
+		self._teachers_and_ids = teachers_and_ids
+		self._statistics = statistics
+
+	def _keepTeacher(self, teacher_id, teacher):
+		"""
+		Utility method called by the database just before a teacher changes or
+		leaves the database: if the snapshot shares the teacher, it holds a
+		copy of the teacher as it is from then on.
+		"""
+		if self._teachers_and_ids.get(teacher_id) is teacher:
+			self._teachers_and_ids[teacher_id] = copy.deepcopy(teacher)
+
+	def retrieveTeacher(self, teacher_id):
+		"""
+		:returns:
+			The teacher corresponding to the given ID if found in the snapshot,
+			None otherwise.
+		:rtype:
+			None | :class:`TeacherJessica` | :class`TeacherArya`
+		"""
+		return self._teachers_and_ids.get(teacher_id)
+
+	def teacherIds(self):
+		"""
+		:returns:
+			The IDs of the teachers, in the order of the database.
+		:rtype:
+			list of str
+		"""
+		return list(self._teachers_and_ids.keys())
+
+	def teachersAndIds(self):
+		"""
+		:returns:
+			The (ID, teacher) pairs, in the order of the database.
+		:rtype:
+			list of tuple of (str, :class:`TeacherJessica` | :class:`TeacherArya`)
+		"""
+		return list(self._teachers_and_ids.items())
+
+	def numberOfEntries(self):
+		"""
+		:returns:
+			The number of teacher entries in the snapshot.
+		:rtype:
+			int
+		"""
+		return len(self._teachers_and_ids)
+
+	def determineSuccessAverage(self):
+		"""
+		:returns:
+			The average success rate of the teachers in the snapshot.
+		:rtype:
+			float
+		"""
+		return self._statistics.successMean()
+
+	def determineSuccessStandardDeviation(self):
+		"""
+		:returns:
+			The standard deviation of the success rate of the teachers.
+		:rtype:
+			float
+		"""
+		return self._statistics.successStandardDeviation()
+
+	def determineSuccessPercentiles(self, percentiles):
+		"""
+		:param percentiles:
+			The percentiles to calculate, between 0 and 100.
+		:type percentiles:
+			float | list of float
+
+		:returns:
+			The percentiles of the success rate of the teachers.
+		:rtype:
+			float | ``numpy.ndarray``
+		"""
+		return self._statistics.successPercentiles(percentiles)
+
+	def determineSuccessHistogram(self, bins=10):
+		"""
+		:param bins:
+			The number of bins between 0 and 100 %, or the bin edges.
+			|DEFAULT| 10
+		:type bins:
+			int | list of float
+
+		:returns:
+			The number of teachers in each bin of success rate, and the bin edges.
+		:rtype:
+			tuple of (``numpy.ndarray``, ``numpy.ndarray``)
+		"""
+		return self._statistics.successHistogram(bins=bins)
+
+	def totalNumberOfStudents(self):
+		"""
+		:returns:
+			The total number of students across all teachers.
+		:rtype:
+			int
+		"""
+		return self._statistics.totalNumberOfStudents()
+
+	def numberOfTeachersPerType(self):
+		"""
+		:returns:
+			The number of teachers of each type, keyed by the class name.
+		:rtype:
+			dict of type {str: int}
+		"""
+		return self._statistics.numberOfTeachersPerType()
+
+	def reportInfo(self):
+		"""
+		A method for reporting all the information about the teachers in the snapshot.
+		"""
+
+		# Determine the number of teachers and total number of students.
+		number_of_teachers = len(self._teachers_and_ids)
+		total_number_of_students = self.totalNumberOfStudents()
+		average_students_per_teacher = numpy.round(
+			total_number_of_students / number_of_teachers, decimals=2)
+
+		# Determine the average success and std deviation.
+		average_success_rate = self.determineSuccessAverage()
+		success_std_deviation = self.determineSuccessStandardDeviation()
+
+		print(formatDataBaseInfo(
+			number_of_teachers,
+			average_students_per_teacher,
+			total_number_of_students,
+			average_success_rate,
+			success_std_deviation))
+
+
+def formatDataBaseInfo(
+		number_of_teachers,
+		average_students_per_teacher,
+		total_number_of_students,
+		average_success_rate,
+		success_std_deviation):
+	"""
+	Utility method for formatting the summary of a database of teachers,
+	printed by the ``reportInfo`` methods.
+	"""
+	# Create a database info template and fill it.
+	info = textwrap.dedent("""\
+		Summary of the teachers database.
+
+		Number of teachers in the database: {}
+		Average number of students per teacher: {}
+		Number of students in total: {}
+
+		Average success rate of the teachers: {} %
+		Standard deviation of success rate: {} 
+		"""
+	).format(
+		number_of_teachers,
+		average_students_per_teacher,
+		total_number_of_students,
+		average_success_rate,
+		success_std_deviation)
+
+	return info
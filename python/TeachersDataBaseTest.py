@@ -0,0 +1,667 @@
+""" A module containing unit tests for the class defined in TeachersDataBase module """
+
+import asyncio
+import contextlib
+import copy
+import io
+import json
+import os
+import pickle
+import threading
+import unittest
+import numpy
+
+from ShardedTeachersDataBase import ShardedTeachersDataBase
+from Teachers import TeacherArya
+from Teachers import TeacherJessica
+from Teachers import packUpperTriangular
+from TeachersAnalytics import GradesTable
+from TeachersDataBase import TeachersDataBase
+from TeachersDataBase import iterateJsonObjectItems
+from TeachersService import LocalTeachersService
+from TeachersService import TeachersServiceClient
+
+
+def createTeachers(number_of_teachers, seed=0):
+    """ Utility method for creating teachers with random grades and getting-along matrices """
+    random_number_generator = numpy.random.default_rng(seed)
+    teachers = []
+    for index in range(number_of_teachers):
+        number_of_students = int(random_number_generator.integers(2, 6))
+        names = ['student%d_%d' % (index, student) for student in range(number_of_students)]
+        grades = random_number_generator.integers(1, 11, size=(number_of_students, 3))
+        getting_along_matrix = random_number_generator.random((number_of_students, number_of_students))
+
+        if index % 2 == 0:
+            teachers.append(TeacherJessica.fromArrays(
+                names, grades[:, :2], students_getting_along_matrix=getting_along_matrix))
+        else:
+            teachers.append(TeacherArya.fromArrays(
+                names, grades, students_getting_along_matrix=getting_along_matrix))
+
+    return teachers
+
+
+class TeachersDataBaseTest(unittest.TestCase):
+    """ Test class for the class TeachersDataBase """
+
+    def testStatistics(self):
+        """ Test the aggregate statistics while adding and removing teachers """
+        teachers = createTeachers(20)
+        teacher_ids = ['teacher%d' % index for index in range(20)]
+        database = TeachersDataBase(teachers=teachers[:10], teacher_ids=teacher_ids[:10])
+        for teacher_id, teacher in zip(teacher_ids[10:], teachers[10:]):
+            database.addTeacher(teacher_id=teacher_id, teacher=teacher)
+        database.removeTeacher('teacher3')
+        database.removeTeacher('teacher19')
+
+        # Compare against the statistics computed from the remaining teachers.
+        remaining = [
+            teacher for teacher_id, teacher in zip(teacher_ids, teachers)
+            if teacher_id not in ('teacher3', 'teacher19')
+        ]
+        success_rates = [teacher.calculateTeacherSuccess() for teacher in remaining]
+        self.assertAlmostEqual(numpy.mean(success_rates), database.determineSuccessAverage())
+        self.assertAlmostEqual(numpy.std(success_rates), database.determineSuccessStandardDeviation())
+        self.assertAlmostEqual(
+            numpy.percentile(success_rates, 90), database.determineSuccessPercentiles(90))
+        self.assertEqual(
+            numpy.histogram(success_rates, bins=5, range=(0, 100))[0].tolist(),
+            database.determineSuccessHistogram(bins=5)[0].tolist())
+        self.assertEqual(
+            sum(teacher.numberOfStudents() for teacher in remaining),
+            database.totalNumberOfStudents())
+        self.assertEqual(
+            {'TeacherJessica': 10, 'TeacherArya': 8}, database.numberOfTeachersPerType())
+
+    def testStatisticsFollowTeacherChanges(self):
+        """ Test that the statistics follow the changes of the teachers """
+        teachers = createTeachers(3)
+        database = TeachersDataBase(teachers=teachers, teacher_ids=['a', 'b', 'c'])
+
+        # Make the students of the first teacher get along perfectly.
+        number_of_students = teachers[0].numberOfStudents()
+        teachers[0].setStudentsGettingAlongMatrix(numpy.ones((number_of_students, number_of_students)))
+        success_rates = [teacher.calculateTeacherSuccess() for teacher in teachers]
+        self.assertEqual(100.0, success_rates[0])
+        self.assertAlmostEqual(numpy.mean(success_rates), database.determineSuccessAverage())
+
+        # A removed teacher is no longer followed.
+        database.removeTeacher('a')
+        teachers[0].setStudentsGettingAlongMatrix(numpy.zeros((number_of_students, number_of_students)))
+        self.assertAlmostEqual(numpy.mean(success_rates[1:]), database.determineSuccessAverage())
+
+    def testCopyTeacherOfDataBase(self):
+        """ Test pickling and copying a teacher held by a database, without the database """
+        teachers = createTeachers(2)
+        database = TeachersDataBase(teachers=teachers, teacher_ids=['a', 'b'])
+        teachers[1].calculateTeacherSuccess()
+
+        for teacher in [pickle.loads(pickle.dumps(teachers[1])), copy.deepcopy(teachers[1])]:
+            self.assertIs(TeacherArya, type(teacher))
+            self.assertEqual(teachers[1].studentNames(), teacher.studentNames())
+            numpy.testing.assert_array_equal(teachers[1].studentGradesMatrix(), teacher.studentGradesMatrix())
+            self.assertEqual(teachers[1].calculateTeacherSuccess(), teacher.calculateTeacherSuccess())
+
+            # The copy is not followed by the database.
+            average = database.determineSuccessAverage()
+            teacher.setStudentGrade(teacher.studentNames()[0], 'science', 1)
+            self.assertEqual(average, database.determineSuccessAverage())
+            self.assertIsNone(database.retrieveTeacher('b').lastChange())
+
+    def testBatchOperations(self):
+        """ Test adding and removing teachers in batches, with failures reported per teacher """
+        teachers = createTeachers(12)
+        teacher_ids = ['teacher%d' % index for index in range(12)]
+        database = TeachersDataBase(teachers=teachers[:2], teacher_ids=teacher_ids[:2])
+
+        failures = database.addTeachers(
+            teacher_ids[1:10] + ['teacher5', 'wrong'], teachers[1:10] + [teachers[10], 'not a teacher'])
+        self.assertEqual(['teacher1', 'teacher5', 'wrong'], [teacher_id for teacher_id, _ in failures])
+        self.assertIn('already in use', failures[0][1])
+        self.assertIs(teachers[5], database.retrieveTeacher('teacher5'))
+
+        failures = database.removeTeachers(['teacher3', 'nobody', 'teacher8', 'teacher3'])
+        self.assertEqual(['nobody', 'teacher3'], [teacher_id for teacher_id, _ in failures])
+
+        # The batches give the same database as single operations.
+        remaining = [index for index in range(10) if index not in (3, 8)]
+        expected_database = TeachersDataBase(
+            teachers=[teachers[index] for index in remaining],
+            teacher_ids=[teacher_ids[index] for index in remaining])
+        self.assertAlmostEqual(expected_database.determineSuccessAverage(), database.determineSuccessAverage())
+        self.assertEqual(expected_database.totalNumberOfStudents(), database.totalNumberOfStudents())
+        self.assertEqual(expected_database.numberOfTeachersPerType(), database.numberOfTeachersPerType())
+        self.assertEqual(
+            expected_database.teachersWithSuccessBetween(), database.teachersWithSuccessBetween())
+        self.assertEqual(set(), database.teachersWithStudent(teachers[3].studentNames()[0]))
+
+        # The constructor rejects duplicated IDs.
+        with self.assertRaisesRegex(Exception, 'already in use'):
+            TeachersDataBase(teachers=teachers[:2], teacher_ids=['a', 'a'])
+
+    def testQueries(self):
+        """ Test the queries served by the secondary indexes """
+        teachers = createTeachers(10)
+        teacher_ids = ['teacher%d' % index for index in range(10)]
+        database = TeachersDataBase(teachers=teachers, teacher_ids=teacher_ids)
+
+        # Give a student of the first teacher also to a new teacher.
+        shared_student = teachers[0].studentNames()[0]
+        database.addTeacher('new', TeacherJessica(student_math_grades={shared_student: 7}))
+        self.assertEqual({'teacher0', 'new'}, database.teachersWithStudent(shared_student))
+        self.assertEqual(set(), database.teachersWithStudent('nobody'))
+
+        # Query by type, by class or by name.
+        self.assertEqual(
+            {'teacher%d' % index for index in range(1, 10, 2)}, database.teachersOfType(TeacherArya))
+        self.assertEqual(database.teachersOfType(TeacherJessica), database.teachersOfType('TeacherJessica'))
+
+        # Query by success, in order of success.
+        def expectedIds(minimum, maximum):
+            pairs = sorted(
+                (teacher.calculateTeacherSuccess(), teacher_id)
+                for teacher_id, teacher in zip(teacher_ids, teachers)
+                if minimum <= teacher.calculateTeacherSuccess() < maximum)
+            return [teacher_id for _, teacher_id in pairs]
+
+        self.assertEqual(expectedIds(0, 50), database.teachersWithSuccessBetween(maximum=50))
+        self.assertEqual(expectedIds(40, 60), database.teachersWithSuccessBetween(40, 60))
+
+        # The indexes follow removals and changes.
+        database.removeTeacher('new')
+        self.assertEqual({'teacher0'}, database.teachersWithStudent(shared_student))
+        number_of_students = teachers[1].numberOfStudents()
+        teachers[1].setStudentsGettingAlongMatrix(numpy.ones((number_of_students, number_of_students)))
+        self.assertEqual(['teacher1'], database.teachersWithSuccessBetween(minimum=100))
+
+    def assertSameTeachers(self, database, read_database):
+        """ Utility method for checking that two databases hold the same teachers """
+        self.assertEqual(database.numberOfEntries(), read_database.numberOfEntries())
+        for teacher_id, teacher in database._teachers_and_ids.items():
+            read_teacher = read_database.retrieveTeacher(teacher_id)
+            self.assertIs(type(teacher), type(read_teacher))
+            self.assertEqual(teacher.studentNames(), read_teacher.studentNames())
+            self.assertTrue(numpy.array_equal(
+                teacher.studentGradesMatrix(), read_teacher.studentGradesMatrix()))
+            self.assertTrue(numpy.array_equal(
+                teacher.studentsGettingAlongMatrix(), read_teacher.studentsGettingAlongMatrix()))
+
+        self.assertEqual(database.determineSuccessAverage(), read_database.determineSuccessAverage())
+
+    def testSaveAndLoad(self):
+        """ Test that the database round-trips through JSON, JSON Lines and npz files """
+        teachers = createTeachers(6)
+        teachers.append(TeacherArya(
+            student_math_grades={'Kim': 7, 'Nadine': 8},
+            student_science_grades={'Kim': 5, 'Nadine': 9},
+            students_getting_along_matrix=packUpperTriangular(numpy.array([[0.9, 0.6], [0.0, 0.7]]))))
+        database = TeachersDataBase(
+            teachers=teachers, teacher_ids=['teacher%d' % index for index in range(7)])
+
+        for filename in ['test_database.json', 'test_database.jsonl', 'test_database.npz']:
+            database.saveToFile(filename)
+
+            read_database = TeachersDataBase(teachers=[], teacher_ids=[])
+            read_database.populateFromFile(filename)
+            self.assertSameTeachers(database, read_database)
+
+            # Check that the database can be queried while it is loading.
+            loading = read_database.populateIncrementallyFromFile(filename)
+            self.assertEqual('teacher0', next(loading))
+            self.assertEqual(1, read_database.numberOfEntries())
+            self.assertIsNotNone(read_database.retrieveTeacher('teacher0'))
+            self.assertEqual(7, 1 + len(list(loading)))
+
+            os.remove(filename)
+
+        # The JSON file can still be read in one go.
+        database.saveToFile('test_database.json')
+        with open('test_database.json') as f:
+            self.assertEqual(7, len(json.load(f)))
+        os.remove('test_database.json')
+
+    def testParallelLoad(self):
+        """ Test that the parallel load gives the same database as the serial one """
+        teachers = createTeachers(30)
+        database = TeachersDataBase(
+            teachers=teachers, teacher_ids=['teacher%d' % index for index in range(30)])
+
+        for filename in ['test_database.json', 'test_database.jsonl']:
+            database.saveToFile(filename)
+            for use_threads in [False, True]:
+                read_database = TeachersDataBase(teachers=[], teacher_ids=[])
+                read_database.populateFromFileInParallel(
+                    filename, number_of_workers=2, use_threads=use_threads, chunk_size=4)
+                self.assertSameTeachers(database, read_database)
+                self.assertEqual(
+                    ['teacher%d' % index for index in range(30)],
+                    list(read_database._teachers_and_ids.keys()))
+
+            os.remove(filename)
+
+    def testBinaryFormat(self):
+        """ Test the npz format with all storages of the getting-along matrix """
+        from scipy.sparse import csr_matrix
+
+        matrix = numpy.array([[0.9, 0.0], [0.0, 0.7]])
+        math_grades = {'Kim': 7, 'Nadine': 8}
+        science_grades = {'Kim': 5, 'Nadine': 9}
+        teachers = [
+            TeacherJessica(student_math_grades=math_grades),
+            TeacherJessica(student_math_grades=math_grades, students_getting_along_matrix=csr_matrix(matrix)),
+            TeacherArya(
+                student_math_grades=math_grades, student_science_grades=science_grades,
+                students_getting_along_matrix=matrix.astype(numpy.float32)),
+            TeacherArya(
+                student_math_grades=math_grades, student_science_grades=science_grades,
+                students_getting_along_matrix=packUpperTriangular(matrix)),
+        ]
+        database = TeachersDataBase(teachers=teachers, teacher_ids=['a', 'b', 'c', 'd'])
+
+        filename = 'test_database.npz'
+        database.saveToFile(filename)
+        read_database = TeachersDataBase(teachers=[], teacher_ids=[])
+        read_database.populateFromFile(filename)
+
+        self.assertIsNone(read_database.retrieveTeacher('a').studentsGettingAlongMatrix())
+        self.assertTrue(numpy.array_equal(
+            matrix, read_database.retrieveTeacher('b').studentsGettingAlongMatrix().toarray()))
+        self.assertEqual(numpy.float32, read_database.retrieveTeacher('c').studentsGettingAlongMatrix().dtype)
+
+        # The low precision matrices are stored in their dtype, and mapped
+        # from the file without being converted.
+        self.assertIsInstance(read_database.retrieveTeacher('c').studentsGettingAlongMatrix(), numpy.memmap)
+        with numpy.load(filename) as arrays:
+            self.assertEqual(numpy.float32, arrays['matrix_data_float32'].dtype)
+            self.assertEqual(4, len(arrays['matrix_data_float32']))
+        self.assertEqual(science_grades, read_database.retrieveTeacher('d').studentScienceGrades())
+        self.assertEqual(database.determineSuccessAverage(), read_database.determineSuccessAverage())
+
+        # The memory-mapped grades can be changed without changing the file.
+        read_database.retrieveTeacher('d').setStudentGrade('Kim', 'math', 1)
+        del read_database
+        read_database = TeachersDataBase(teachers=[], teacher_ids=[])
+        read_database.populateFromFile(filename)
+        self.assertEqual(7, read_database.retrieveTeacher('d').studentMathGrades()['Kim'])
+
+        del read_database
+        os.remove(filename)
+
+    def testMutationLog(self):
+        """ Test the recovery of a durable database from its snapshot and mutation log """
+        teachers = createTeachers(6)
+        snapshot_filename = 'test_snapshot.npz'
+        log_filename = 'test_mutations.jsonl'
+
+        database = TeachersDataBase.openDurable(snapshot_filename, log_filename, compaction_threshold=None)
+        for index in range(4):
+            database.addTeacher('teacher%d' % index, teachers[index])
+        database.removeTeacher('teacher1')
+        number_of_students = teachers[2].numberOfStudents()
+        teachers[2].setStudentsGettingAlongMatrix(numpy.ones((number_of_students, number_of_students)))
+
+        # Small changes are logged as they are, without the whole teacher.
+        names = teachers[3].studentNames()
+        teachers[3].setStudentGrade(names[0], 'science', 1)
+        teachers[3].setStudentsGettingAlong(names[0], names[1], 0.5)
+        teachers[3].setStudentGettingAlongRow(names[1], numpy.zeros(len(names)))
+        database.closeMutationLog()
+        with open(log_filename) as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(
+            ['add'] * 4 + ['remove', 'update'] + ['change'] * 3, [entry['operation'] for entry in entries])
+        self.assertEqual('setStudentGrade', entries[-3]['change']['method'])
+        self.assertNotIn('teacher', entries[-3])
+
+        # Nothing but the log has been written.
+        self.assertFalse(os.path.exists(snapshot_filename))
+        recovered = TeachersDataBase.openDurable(snapshot_filename, log_filename, compaction_threshold=None)
+        self.assertSameTeachers(database, recovered)
+        self.assertEqual(100.0, recovered.retrieveTeacher('teacher2').calculateTeacherSuccess())
+
+        # The compaction writes a snapshot and empties the log.
+        recovered.compact()
+        recovered.addTeacher('teacher4', teachers[4])
+        self.assertEqual(1, recovered._mutation_log.numberOfEntries())
+        recovered.closeMutationLog()
+
+        # A last mutation which was only partly written is dropped.
+        with open(log_filename, 'a') as f:
+            f.write('{"operation": "remove", "teacher_id": "tea')
+        database = TeachersDataBase.openDurable(snapshot_filename, log_filename, compaction_threshold=2)
+        self.assertSameTeachers(recovered, database)
+        database.removeTeacher('teacher0')
+        self.assertEqual(0, database._mutation_log.numberOfEntries())
+        database.closeMutationLog()
+
+        recovered = TeachersDataBase.openDurable(snapshot_filename, log_filename)
+        self.assertEqual({'teacher2', 'teacher3', 'teacher4'}, set(recovered._teachers_and_ids.keys()))
+        recovered.closeMutationLog()
+
+        os.remove(snapshot_filename)
+        os.remove(log_filename)
+
+    def testSnapshot(self):
+        """ Test that a snapshot is not changed by the later changes of the database """
+        teachers = createTeachers(4)
+        database = TeachersDataBase(teachers=teachers[:3], teacher_ids=['a', 'b', 'c'])
+        snapshot = database.snapshot()
+        self.assertIs(snapshot, database.snapshot())
+
+        average = database.determineSuccessAverage()
+        database.addTeacher('d', teachers[3])
+        database.removeTeacher('a')
+        self.assertEqual(['a', 'b', 'c'], snapshot.teacherIds())
+        self.assertIsNone(snapshot.retrieveTeacher('d'))
+        self.assertEqual(average, snapshot.determineSuccessAverage())
+        self.assertEqual(
+            sum(teacher.numberOfStudents() for teacher in teachers[:3]), snapshot.totalNumberOfStudents())
+
+        # The teachers are shared until they change or leave the database, the
+        # snapshot then holds them as they were.
+        self.assertIs(teachers[1], snapshot.retrieveTeacher('b'))
+        grades = teachers[1].studentGradesMatrix().copy()
+        success_rates = [teacher.calculateTeacherSuccess() for teacher in teachers[:3]]
+        student_name = teachers[1].studentNames()[0]
+        teachers[1].setStudentGrade(student_name, 'math', 11 - int(grades[0, 0]))
+        teachers[1].setStudentsGettingAlong(student_name, student_name, 0.0)
+        teachers[0].setStudentsGettingAlong(teachers[0].studentNames()[0], teachers[0].studentNames()[0], 0.0)
+        teachers[2].setStudentsGettingAlongMatrix(None)
+
+        self.assertIsNot(teachers[1], snapshot.retrieveTeacher('b'))
+        numpy.testing.assert_array_equal(grades, snapshot.retrieveTeacher('b').studentGradesMatrix())
+        self.assertEqual(
+            success_rates,
+            [snapshot.retrieveTeacher(teacher_id).calculateTeacherSuccess() for teacher_id in 'abc'])
+        self.assertAlmostEqual(numpy.mean(success_rates), snapshot.determineSuccessAverage())
+
+        # The next snapshot follows the changes.
+        self.assertIsNot(snapshot, database.snapshot())
+        self.assertEqual(['b', 'c', 'd'], database.snapshot().teacherIds())
+
+    def testConcurrentAccess(self):
+        """ Test reading the database from threads while another thread changes it """
+        teachers = createTeachers(40)
+        teacher_ids = ['teacher%d' % index for index in range(40)]
+        database = TeachersDataBase(teachers=teachers[:20], teacher_ids=teacher_ids[:20])
+        number_of_students = {
+            teacher_id: teacher.numberOfStudents() for teacher_id, teacher in zip(teacher_ids, teachers)
+        }
+        done = threading.Event()
+        errors = []
+
+        def write():
+            try:
+                for _ in range(20):
+                    for teacher_id, teacher in zip(teacher_ids[20:], teachers[20:]):
+                        database.addTeacher(teacher_id, teacher)
+                    for teacher_id in teacher_ids[20:]:
+                        database.removeTeacher(teacher_id)
+            finally:
+                done.set()
+
+        def read():
+            try:
+                while not done.is_set():
+                    self.assertIs(teachers[0], database.retrieveTeacher('teacher0'))
+                    snapshot = database.snapshot()
+                    teacher_ids_in_snapshot = snapshot.teacherIds()
+                    self.assertEqual(
+                        sum(number_of_students[teacher_id] for teacher_id in teacher_ids_in_snapshot),
+                        snapshot.totalNumberOfStudents())
+                    self.assertEqual(
+                        len(teacher_ids_in_snapshot), sum(snapshot.numberOfTeachersPerType().values()))
+                    database.determineSuccessStandardDeviation()
+                    database.teachersWithSuccessBetween(25, 75)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        threads.append(threading.Thread(target=write))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual(teacher_ids[:20], database.snapshot().teacherIds())
+
+    def testService(self):
+        """ Test serving a database to an asyncio client """
+        teachers = createTeachers(6)
+        teacher_ids = ['teacher%d' % index for index in range(6)]
+        database = TeachersDataBase(teachers=teachers[:5], teacher_ids=teacher_ids[:5])
+
+        async def useService(host, port):
+            async with TeachersServiceClient(host, port, pool_size=2) as client:
+                # Many concurrent requests are pipelined on the two connections.
+                retrieved = await asyncio.gather(*[
+                    client.retrieveTeacher(teacher_id) for teacher_id in teacher_ids[:5] * 10
+                ])
+                self.assertEqual(2, len(client._connections))
+                for teacher, retrieved_teacher in zip(teachers[:5] * 10, retrieved):
+                    self.assertEqual(teacher.studentNames(), retrieved_teacher.studentNames())
+                    self.assertEqual(teacher.calculateTeacherSuccess(), retrieved_teacher.calculateTeacherSuccess())
+                self.assertIsNone(await client.retrieveTeacher('nobody'))
+
+                await client.addTeacher('teacher5', teachers[5])
+                await client.removeTeacher('teacher0')
+                self.assertEqual(5, await client.numberOfEntries())
+                self.assertEqual(database.determineSuccessAverage(), await client.determineSuccessAverage())
+                self.assertEqual(database.totalNumberOfStudents(), await client.totalNumberOfStudents())
+                self.assertEqual(
+                    sorted(database.teachersOfType('TeacherArya')),
+                    await client.call('teachersOfType', teacher_type='TeacherArya'))
+                self.assertEqual(
+                    database.determineSuccessHistogram(bins=4)[0].tolist(),
+                    (await client.call('determineSuccessHistogram', bins=4))[0])
+
+                # The errors of the database are raised by the client.
+                with self.assertRaisesRegex(Exception, 'not in the database'):
+                    await client.removeTeacher('teacher0')
+                with self.assertRaisesRegex(Exception, 'Unknown method'):
+                    await client.call('saveToFile', json_filename='test_database.json')
+
+        with LocalTeachersService(database) as service:
+            asyncio.run(useService(*service.address()))
+
+        self.assertEqual(teacher_ids[1:], list(database._teachers_and_ids.keys()))
+
+        # Once the service is stopped, the requests fail instead of waiting forever.
+        async def useStoppedService(service):
+            async with TeachersServiceClient(*service.address()) as client:
+                self.assertEqual(5, await client.numberOfEntries())
+                service.stop()
+                for _ in range(2):
+                    with self.assertRaises(ConnectionError):
+                        await asyncio.wait_for(client.numberOfEntries(), 3)
+
+        asyncio.run(useStoppedService(LocalTeachersService(database)))
+
+    def testShardedDataBase(self):
+        """ Test that a sharded database gives the statistics of a single one """
+        teachers = createTeachers(25)
+        teacher_ids = ['teacher%d' % index for index in range(25)]
+        database = TeachersDataBase(teachers=teachers[:20], teacher_ids=teacher_ids[:20])
+        database.saveToFile('test_database.jsonl')
+
+        with ShardedTeachersDataBase(number_of_shards=3, chunk_size=4) as sharded_database:
+            sharded_database.populateFromFile('test_database.jsonl')
+            for teacher_id, teacher in zip(teacher_ids[20:], teachers[20:]):
+                database.addTeacher(teacher_id, teacher)
+                sharded_database.addTeacher(teacher_id, teacher)
+            database.removeTeacher('teacher7')
+            sharded_database.removeTeacher('teacher7')
+
+            self.assertEqual(24, sharded_database.numberOfEntries())
+            self.assertAlmostEqual(database.determineSuccessAverage(), sharded_database.determineSuccessAverage())
+            self.assertAlmostEqual(
+                database.determineSuccessStandardDeviation(),
+                sharded_database.determineSuccessStandardDeviation())
+            self.assertEqual(database.totalNumberOfStudents(), sharded_database.totalNumberOfStudents())
+            self.assertEqual(database.numberOfTeachersPerType(), sharded_database.numberOfTeachersPerType())
+            self.assertEqual(
+                teachers[21].studentNames(), sharded_database.retrieveTeacher('teacher21').studentNames())
+            self.assertIsNone(sharded_database.retrieveTeacher('teacher7'))
+
+            with self.assertRaisesRegex(Exception, 'not in the database'):
+                sharded_database.removeTeacher('teacher7')
+
+            report = io.StringIO()
+            with contextlib.redirect_stdout(report):
+                sharded_database.reportInfo()
+            self.assertIn('Number of teachers in the database: 24', report.getvalue())
+
+        os.remove('test_database.jsonl')
+
+    def testShardedDataBaseStorage(self):
+        """ Test that the shards keep the storage of the matrices, and report each teacher not added """
+        from scipy.sparse import csr_matrix
+
+        matrix = numpy.array([[0.9, 0.0], [0.0, 0.7]])
+        math_grades = {'Kim': 7, 'Nadine': 8}
+        matrices = {
+            'sparse': csr_matrix(matrix),
+            'float32': matrix.astype(numpy.float32),
+            'float16': matrix.astype(numpy.float16),
+            'packed': packUpperTriangular(matrix),
+        }
+        teacher_ids = list(matrices.keys())
+        teachers = [
+            TeacherJessica(student_math_grades=math_grades, students_getting_along_matrix=matrices[teacher_id])
+            for teacher_id in teacher_ids
+        ]
+        TeachersDataBase(teachers=teachers, teacher_ids=teacher_ids).saveToFile('test_database.npz')
+
+        with ShardedTeachersDataBase(number_of_shards=2) as sharded_database:
+            sharded_database.populateFromFile('test_database.npz')
+            for teacher_id, teacher in zip(teacher_ids, teachers):
+                sharded_database.addTeacher('added_' + teacher_id, teacher)
+
+            for teacher_id in teacher_ids:
+                for retrieved_id in [teacher_id, 'added_' + teacher_id]:
+                    retrieved_matrix = sharded_database.retrieveTeacher(retrieved_id).studentsGettingAlongMatrix()
+                    self.assertIsInstance(retrieved_matrix, type(matrices[teacher_id]))
+                    self.assertEqual(matrices[teacher_id].shape, retrieved_matrix.shape)
+                    self.assertEqual(matrices[teacher_id].dtype, retrieved_matrix.dtype)
+
+        # The teachers of a chunk after a teacher which can't be added are added.
+        with open('test_database.jsonl', 'w') as jsonl_file:
+            for index in range(6):
+                grade = 11 if index in (1, 4) else 7
+                jsonl_file.write(json.dumps({
+                    'teacher_id': 'teacher%d' % index, 'teacher_type': 'TeacherJessica', 'names': ['Kim'],
+                    'math_grades': [grade], 'art_grades': [8], 'science_grades': [],
+                    'students_getting_along_matrix': None,
+                }) + '\n')
+
+        with ShardedTeachersDataBase(number_of_shards=1) as sharded_database:
+            with self.assertRaisesRegex(Exception, 'teacher1: .*; teacher4: '):
+                sharded_database.populateFromFile('test_database.jsonl')
+            self.assertEqual(4, sharded_database.numberOfEntries())
+
+        os.remove('test_database.npz')
+        os.remove('test_database.jsonl')
+
+    def testDetermineAverageGradeScenarios(self):
+        """ Test the averages under many weightings across the teachers of a database """
+        teachers = createTeachers(8)
+        teacher_ids = ['teacher%d' % index for index in range(8)]
+        database = TeachersDataBase(teachers=teachers, teacher_ids=teacher_ids)
+        weights_matrix = numpy.random.default_rng(6).random((5, 3)) + 0.1
+
+        # The columns are the subjects of all teachers, and the weights are
+        # normalized over the subjects of each teacher.
+        averages = database.determineAverageGradeScenarios(weights_matrix)
+        self.assertEqual(teacher_ids, list(averages.keys()))
+        for teacher_id, teacher in zip(teacher_ids, teachers):
+            self.assertTrue(numpy.array_equal(
+                teacher.determineAverageGradeScenarios(
+                    weights_matrix[:, :len(teacher.subjects())]),
+                averages[teacher_id]))
+
+        self.assertEqual({}, TeachersDataBase(
+            teachers=[], teacher_ids=[]).determineAverageGradeScenarios(weights_matrix))
+
+    def testGradesTable(self):
+        """ Test the analytics over the grades of all teachers against plain Python """
+        teachers = createTeachers(8)
+        # Give a student a second teacher.
+        shared_student = teachers[1].studentNames()[0]
+        teachers.append(TeacherJessica(
+            student_math_grades={shared_student: 2}, student_art_grades={shared_student: 3}))
+        teacher_ids = ['teacher%d' % index for index in range(9)]
+        table = GradesTable.fromDataBase(TeachersDataBase(teachers=teachers, teacher_ids=teacher_ids))
+
+        rows = [
+            (name, teacher_id, subject, grade)
+            for teacher_id, teacher in zip(teacher_ids, teachers)
+            for subject in teacher.subjects()
+            for name, grade in teacher.studentGrades(subject).items()
+        ]
+        self.assertEqual(len(rows), table.numberOfRows())
+        self.assertEqual(['math', 'art', 'science'], table.subjects())
+
+        def grouped(index, subject=None):
+            groups = {}
+            for row in rows:
+                if subject is None or row[2] == subject:
+                    groups.setdefault(row[index], []).append(row[3])
+            return groups
+
+        for key, index in [('student', 0), ('teacher', 1), ('subject', 2)]:
+            groups = grouped(index)
+            self.assertEqual(
+                {name: len(grades) for name, grades in groups.items()}, table.groupBy(key, 'count'))
+            self.assertEqual({name: max(grades) for name, grades in groups.items()}, table.groupBy(key, 'max'))
+            means = table.groupBy(key)
+            for name, grades in groups.items():
+                self.assertAlmostEqual(numpy.mean(grades), means[name])
+
+        self.assertEqual(
+            {name: min(grades) for name, grades in grouped(0, 'science').items()},
+            table.groupBy('student', 'min', subject='science'))
+        self.assertEqual(
+            {'math': sum(teachers[2].studentGrades('math').values())},
+            table.groupBy('subject', 'sum', subject='math', teacher_id='teacher2'))
+
+        distributions = table.gradeDistributions()
+        self.assertEqual(
+            [sum(1 for row in rows if row[2] == 'art' and row[3] == grade) for grade in range(1, 11)],
+            distributions['art'].tolist())
+
+        # The shared student is averaged across both teachers.
+        averages = {name: numpy.mean(grades) for name, grades in grouped(0).items()}
+        self.assertIn(2, grouped(0)[shared_student])
+        top = table.topStudents(3)
+        self.assertEqual(sorted(averages.values(), reverse=True)[:3], [average for _, average in top])
+        self.assertEqual(averages[top[0][0]], top[0][1])
+
+        self.assertEqual(
+            numpy.percentile([row[3] for row in rows if row[2] == 'math'], [10, 50]).tolist(),
+            table.gradePercentiles([10, 50], subject='math').tolist())
+        self.assertAlmostEqual(
+            numpy.percentile(list(averages.values()), 75), table.studentAveragePercentiles(75))
+
+    def testIterateJsonObjectItems(self):
+        """ Test the incremental parsing of a JSON object """
+        data = {
+            'a': {'b': [1, 2.5, {'c': 'x}y'}], 'd': None},
+            'e': 12345,
+            'f': '',
+            ' g ': [[], {}],
+        }
+        for indent in [None, 4]:
+            text = json.dumps(data, indent=indent)
+            for chunk_size in [1, 3, 1000]:
+                items = list(iterateJsonObjectItems(io.StringIO(text), chunk_size=chunk_size))
+                self.assertEqual(list(data.items()), items)
+
+        self.assertEqual([], list(iterateJsonObjectItems(io.StringIO(' { } '))))
+        with self.assertRaises(ValueError):
+            list(iterateJsonObjectItems(io.StringIO('{"a": 1 "b": 2}')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+""" Module implementing secondary indexes over the teachers in a database """
+
+from bisect import bisect_left
+from bisect import insort
+
+
+class TeacherIndexes(object):
+
+	def __init__(self):
+		"""
+		This class implements the secondary indexes of a database of teachers:
+		the teachers of each student, the teachers of each type, and the
+		teachers sorted by success. The indexes are updated as teachers are
+		added, removed or changed, so that the queries never scan the teachers.
+		"""
+		# The IDs of the teachers of each student, and of each teacher type.
+		self._teacher_ids_by_student = {}
+		self._teacher_ids_by_type = {}
+
+		# The (success, teacher ID) pairs sorted by success, and the success
+		# of each teacher ID to locate its pair.
+		self._sorted_success = []
+		self._success_by_id = {}
+
+	def insert(self, teacher_id, teacher, success):
+		"""
+		Add a teacher to the indexes.
+
+		:param teacher_id:
+			The ID of the teacher.
+		:type teacher_id:
+			str
+
+		:param teacher:
+			The teacher.
+		:type teacher:
+			:class:`TeacherJessica` | :class:`TeacherArya`
+
+		:param success:
+			The success of the teacher.
+		:type success:
+			float
+		"""
+		for student_name in teacher.studentNames():
+			self._teacher_ids_by_student.setdefault(student_name, set()).add(teacher_id)
+
+		self._teacher_ids_by_type.setdefault(type(teacher).__name__, set()).add(teacher_id)
+
+		insort(self._sorted_success, (success, teacher_id))
+		self._success_by_id[teacher_id] = success
+
+	def insertMany(self, teacher_ids, teachers, success_rates):
+		"""
+		Add several teachers to the indexes, sorting the success index once.
+
+		:param teacher_ids:
+			The IDs of the teachers.
+		:type teacher_ids:
+			list of str
+
+		:param teachers:
+			The teachers.
+		:type teachers:
+			list of :class:`TeacherJessica` | :class:`TeacherArya`
+
+		:param success_rates:
+			The success of each teacher.
+		:type success_rates:
+			list of float
+		"""
+		for teacher_id, teacher in zip(teacher_ids, teachers):
+			for student_name in teacher.studentNames():
+				self._teacher_ids_by_student.setdefault(student_name, set()).add(teacher_id)
+
+			self._teacher_ids_by_type.setdefault(type(teacher).__name__, set()).add(teacher_id)
+
+		self._sorted_success.extend(zip(success_rates, teacher_ids))
+		self._sorted_success.sort()
+		self._success_by_id.update(zip(teacher_ids, success_rates))
+
+	def remove(self, teacher_id, teacher):
+		"""
+		Remove a teacher from the indexes.
+
+		:param teacher_id:
+			The ID of the teacher.
+		:type teacher_id:
+			str
+
+		:param teacher:
+			The teacher.
+		:type teacher:
+			:class:`TeacherJessica` | :class:`TeacherArya`
+		"""
+		for student_name in teacher.studentNames():
+			_discard(self._teacher_ids_by_student, student_name, teacher_id)
+
+		_discard(self._teacher_ids_by_type, type(teacher).__name__, teacher_id)
+
+		self._removeSuccess(teacher_id)
+
+	def removeMany(self, teacher_ids, teachers):
+		"""
+		Remove several teachers from the indexes, filtering the success index once.
+
+		:param teacher_ids:
+			The IDs of the teachers.
+		:type teacher_ids:
+			list of str
+
+		:param teachers:
+			The teachers.
+		:type teachers:
+			list of :class:`TeacherJessica` | :class:`TeacherArya`
+		"""
+		for teacher_id, teacher in zip(teacher_ids, teachers):
+			for student_name in teacher.studentNames():
+				_discard(self._teacher_ids_by_student, student_name, teacher_id)
+
+			_discard(self._teacher_ids_by_type, type(teacher).__name__, teacher_id)
+			del self._success_by_id[teacher_id]
+
+		removed_ids = set(teacher_ids)
+		self._sorted_success = [
+			pair for pair in self._sorted_success if pair[1] not in removed_ids
+		]
+
+	def updateSuccess(self, teacher_id, success):
+		"""
+		Move a teacher in the success index.
+
+		:param teacher_id:
+			The ID of the teacher.
+		:type teacher_id:
+			str
+
+		:param success:
+			The new success of the teacher.
+		:type success:
+			float
+		"""
+		self._removeSuccess(teacher_id)
+		insort(self._sorted_success, (success, teacher_id))
+		self._success_by_id[teacher_id] = success
+
+	def _removeSuccess(self, teacher_id):
+		"""
+		Utility method for removing a teacher from the success index.
+		"""
+		success = self._success_by_id.pop(teacher_id)
+		del self._sorted_success[bisect_left(self._sorted_success, (success, teacher_id))]
+
+	def clear(self):
+		"""
+		Remove all teachers from the indexes.
+		"""
+		self.__init__()
+
+	def teachersWithStudent(self, student_name):
+		"""
+		:returns:
+			The IDs of the teachers of the given student.
+		:rtype:
+			set of str
+		"""
+		return set(self._teacher_ids_by_student.get(student_name, ()))
+
+	def teachersOfType(self, teacher_type):
+		"""
+		:returns:
+			The IDs of the teachers of exactly the given type, given by class
+			or by class name.
+		:rtype:
+			set of str
+		"""
+		if isinstance(teacher_type, type):
+			teacher_type = teacher_type.__name__
+
+		return set(self._teacher_ids_by_type.get(teacher_type, ()))
+
+	def teachersWithSuccessBetween(self, minimum=None, maximum=None):
+		"""
+		:param minimum:
+			The lowest success included.
+			|DEFAULT| No lower bound.
+		:type minimum:
+			None | float
+
+		:param maximum:
+			The success above the range, excluded.
+			|DEFAULT| No upper bound.
+		:type maximum:
+			None | float
+
+		:returns:
+			The IDs of the teachers whose success is in the range, in order of
+			increasing success.
+		:rtype:
+			list of str
+		"""
+		# Pairs of a success with any ID sort after the bare success.
+		start = 0 if minimum is None else bisect_left(self._sorted_success, (minimum,))
+		end = len(self._sorted_success) if maximum is None else bisect_left(
+			self._sorted_success, (maximum,))
+
+		return [teacher_id for _, teacher_id in self._sorted_success[start:end]]
+
+
+def _discard(ids_by_key, key, teacher_id):
+	"""
+	Utility method for removing a teacher ID from the set of IDs of a key,
+	and the key once it has no IDs left.
+	"""
+	teacher_ids = ids_by_key[key]
+	teacher_ids.discard(teacher_id)
+	if not teacher_ids:
+		del ids_by_key[key]
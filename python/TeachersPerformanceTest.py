@@ -0,0 +1,222 @@
+"""
+A module containing tests guarding the performance of the hot paths of the
+teachers and their database against regressions.
+
+Each path is timed on synthetic data at several sizes, and the best time of a
+few repeats is compared to the baseline stored in
+teachers_performance_baselines.json. A path fails when it is slower than its
+baseline by more than the threshold factor. The baselines depend on the
+machine, so the tests only run when the TEACHERS_PERFORMANCE environment
+variable is set to 1, on a machine without other load:
+
+    TEACHERS_PERFORMANCE=1 python -m pytest TeachersPerformanceTest.py
+
+After a deliberate change, or on a new machine, record the baselines again
+with
+
+    python TeachersPerformanceTest.py --update-baselines
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+from SerializationBackends import registeredSerializationBackends
+from SerializationBenchmark import syntheticTeacherArya
+from Teachers import TeacherArya
+from TeachersDataBase import TeachersDataBase
+
+
+# The numbers of students of the teachers, and of teachers of the databases,
+# at which the paths are timed.
+ROSTER_SIZES = [10, 100, 1000]
+DATABASE_SIZES = [10, 100, 1000]
+STUDENTS_PER_DATABASE_TEACHER = 10
+
+# The number of times each path is timed, the best time is kept.
+REPEATS = 5
+
+# A path regresses when it takes longer than its baseline times the threshold,
+# plus a margin absorbing the noise of the timer on the fastest paths. The
+# threshold can be overridden with the TEACHERS_PERFORMANCE_THRESHOLD
+# environment variable.
+THRESHOLD = float(os.environ.get('TEACHERS_PERFORMANCE_THRESHOLD', 3.0))
+MARGIN = 0.0005
+
+BASELINES_FILENAME = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'teachers_performance_baselines.json')
+
+
+def syntheticDataBase(number_of_teachers, seed=0):
+    """ Utility method for creating a database of synthetic teachers """
+    teacher_ids = ['teacher%d' % index for index in range(number_of_teachers)]
+    teachers = [
+        syntheticTeacherArya(STUDENTS_PER_DATABASE_TEACHER, seed=seed + index)
+        for index in range(number_of_teachers)
+    ]
+    return TeachersDataBase(teachers=teachers, teacher_ids=teacher_ids)
+
+
+def constructionArguments(teacher):
+    """ Utility method returning the arguments with which the given teacher can be constructed """
+    # The grades are given as dicts, as when a teacher is constructed from
+    # data, and not as the views of another teacher.
+    return {
+        'student_math_grades': dict(teacher.studentMathGrades()),
+        'student_art_grades': dict(teacher.studentArtGrades()),
+        'student_science_grades': dict(teacher.studentScienceGrades()),
+        'students_getting_along_matrix': teacher.studentsGettingAlongMatrix(),
+    }
+
+
+def freshCopies(teacher):
+    """ Utility method returning copies of a teacher, without any cached metrics """
+    return [
+        TeacherArya.fromArrays(
+            teacher.studentNames(), teacher.studentGradesMatrix().copy(),
+            students_getting_along_matrix=teacher.studentsGettingAlongMatrix(), trusted=True)
+        for _ in range(REPEATS)
+    ]
+
+
+def bestTime(function, setup=None):
+    """
+    Utility method returning the best time of the repeats of a function. The
+    setup, if given, is called before each repeat and its result is passed
+    to the function, outside the timing.
+    """
+    times = []
+    for _ in range(REPEATS):
+        argument = None if setup is None else setup()
+        t0 = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - t0)
+
+    return min(times)
+
+
+def timeTeacherPaths():
+    """ Utility method timing the paths of a teacher at each roster size """
+    times = {}
+    for number_of_students in ROSTER_SIZES:
+        teacher = syntheticTeacherArya(number_of_students, seed=number_of_students)
+        size = 'students=%d' % number_of_students
+
+        arguments = constructionArguments(teacher)
+        times['construction/' + size] = bestTime(lambda _: TeacherArya(**arguments))
+
+        # The metrics are cached, so each repeat is timed on a fresh copy.
+        copies = freshCopies(teacher)
+        times['determineAverageGrade/' + size] = bestTime(
+            lambda copy: copy.determineAverageGrade(weights=[0.2, 0.3, 0.5]), setup=copies.pop)
+        copies = freshCopies(teacher)
+        times['calculateTeacherSuccess/' + size] = bestTime(
+            lambda copy: copy.calculateTeacherSuccess(), setup=copies.pop)
+
+        with tempfile.TemporaryDirectory() as directory:
+            hdf5_filename = os.path.join(directory, 'teacher.h5')
+            times['hdf5Save/' + size] = bestTime(lambda _: teacher.saveToFile(hdf5_filename))
+            times['hdf5Load/' + size] = bestTime(lambda _: TeacherArya.instantiateFromFile(hdf5_filename))
+
+            # One round trip per file format, whatever its extensions.
+            backends = {}
+            for extension, backend in sorted(registeredSerializationBackends().items()):
+                backends.setdefault(type(backend).__name__, extension)
+            for backend_name, extension in sorted(backends.items()):
+                filename = os.path.join(directory, 'teacher' + extension)
+
+                def roundTrip(_):
+                    teacher.saveToFile(filename)
+                    TeacherArya.instantiateFromFile(filename)
+
+                times['serializableRoundTrip/%s/%s' % (backend_name, size)] = bestTime(roundTrip)
+
+    return times
+
+
+def timeDataBasePaths():
+    """ Utility method timing the paths of a database at each number of teachers """
+    times = {}
+    for number_of_teachers in DATABASE_SIZES:
+        database = syntheticDataBase(number_of_teachers)
+        size = 'teachers=%d' % number_of_teachers
+
+        # The report is read from a snapshot of the database, which is taken
+        # again after each change.
+        def changeDataBase():
+            teacher = database.retrieveTeacher('teacher0')
+            database.removeTeacher('teacher0')
+            database.addTeacher('teacher0', teacher)
+
+        def reportInfo(_):
+            with contextlib.redirect_stdout(io.StringIO()):
+                database.reportInfo()
+
+        times['reportInfo/' + size] = bestTime(reportInfo, setup=changeDataBase)
+
+        with tempfile.TemporaryDirectory() as directory:
+            json_filename = os.path.join(directory, 'teachers.json')
+            times['jsonSave/' + size] = bestTime(lambda _: database.saveToFile(json_filename))
+            times['jsonLoad/' + size] = bestTime(
+                lambda _: TeachersDataBase(teachers=[], teacher_ids=[]).populateFromFile(json_filename))
+
+    return times
+
+
+def readBaselines():
+    """ Utility method reading the stored baselines, keyed by path """
+    with open(BASELINES_FILENAME) as baselines_file:
+        return json.load(baselines_file)
+
+
+def writeBaselines(times):
+    """ Utility method storing the given times as the baselines """
+    with open(BASELINES_FILENAME, 'w') as baselines_file:
+        json.dump(dict(sorted(times.items())), baselines_file, indent=4)
+        baselines_file.write('\n')
+
+
+@unittest.skipUnless(
+    os.environ.get('TEACHERS_PERFORMANCE') == '1',
+    'The performance tests only run with TEACHERS_PERFORMANCE=1.')
+class TeachersPerformanceTest(unittest.TestCase):
+    """ Test class guarding against performance regressions of the hot paths """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.baselines = readBaselines()
+
+    def assertNoRegressions(self, times):
+        """ Check the given times against the baselines """
+        regressions = []
+        for path, path_time in sorted(times.items()):
+            self.assertIn(path, self.baselines, 'No baseline for %s, record the baselines again.' % path)
+            if path_time > THRESHOLD * self.baselines[path] + MARGIN:
+                regressions.append('%s: %.3f ms against a baseline of %.3f ms' % (
+                    path, 1e3 * path_time, 1e3 * self.baselines[path]))
+
+        self.assertEqual([], regressions)
+
+    def testTeacherPaths(self):
+        """ Test the construction, metrics and serialization of teachers """
+        self.assertNoRegressions(timeTeacherPaths())
+
+    def testDataBasePaths(self):
+        """ Test the report, saving and loading of databases """
+        self.assertNoRegressions(timeDataBasePaths())
+
+
+if __name__ == '__main__':
+    if '--update-baselines' in sys.argv:
+        times = timeTeacherPaths()
+        times.update(timeDataBasePaths())
+        writeBaselines(times)
+        for path, path_time in sorted(times.items()):
+            print('{:<50} {:>12.3f} ms'.format(path, 1e3 * path_time))
+    else:
+        unittest.main()
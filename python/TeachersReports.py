@@ -0,0 +1,442 @@
+"""
+Module implementing the html reports of the grades of teachers, and their
+generation for many teachers in a pool of workers.
+
+The charts are drawn either with the object-oriented API of matplotlib on
+figures of their own, never with the global state of ``pyplot``, so that
+reports can be generated concurrently, or directly as SVG markup, which is
+much faster and doesn't need matplotlib. matplotlib is imported on first use,
+since importing it is slow.
+"""
+
+import base64
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+import html
+import io
+import numpy
+import os
+import textwrap
+
+
+# The mime type of each image format.
+_image_mime_types = {
+	'png': 'image/png',
+	'svg': 'image/svg+xml',
+}
+
+# The colors of the bars of the subjects in the SVG charts, those of matplotlib.
+_subject_colors = ('#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b')
+
+
+def teacherReportTitle(teacher):
+	"""
+	:returns:
+		The title of the report of a teacher, such as "Grades of Jessica's students".
+	:rtype:
+		str
+	"""
+	return "Grades of %s's students" % type(teacher).__name__.replace('Teacher', '', 1)
+
+
+def drawGradesChart(figure, student_names, subjects, grades):
+	"""
+	Draw a bar chart of the grades of the students on the given figure, with
+	one group of bars per student and one bar per subject.
+
+	:param figure:
+		The figure to draw on.
+	:type figure:
+		``matplotlib.figure.Figure``
+
+	:param student_names:
+		The names of the students.
+	:type student_names:
+		list of str
+
+	:param subjects:
+		The subjects of the columns of the grades.
+	:type subjects:
+		tuple of str
+
+	:param grades:
+		The grades, one row per student and one column per subject.
+	:type grades:
+		``numpy.ndarray``
+	"""
+	axes = figure.add_subplot()
+
+	# Set up the x axis and create a bar plot with all grades shown for
+	# each student.
+	x_axis = numpy.arange(len(student_names))
+	bar_width = 0.8 / len(subjects)
+	for column, subject in enumerate(subjects):
+		offset = (column - (len(subjects) - 1) / 2.0) * bar_width
+		axes.bar(x_axis + offset, grades[:, column], bar_width, label=subject.capitalize())
+
+	# Set up the ticks, labels and a legend.
+	axes.set_xticks(x_axis)
+	axes.set_xticklabels(student_names, fontsize=14)
+	axes.tick_params(axis='y', labelsize=14)
+	axes.set_xlabel('Student', fontsize=18)
+	axes.set_ylabel('Grade', fontsize=18)
+	axes.legend(fontsize=14, loc='upper center')
+
+	# Set limit to 1 to 10 + a little extra.
+	axes.set_ylim(1.0, 10.1)
+
+
+def renderGradesImage(student_names, subjects, grades, image_format='png', dpi=200):
+	"""
+	Render a bar chart of the grades of the students, see :func:`drawGradesChart`.
+
+	:param image_format:
+		The format of the image: 'png' or 'svg'.
+		|DEFAULT| 'png'
+	:type image_format:
+		str
+
+	:param dpi:
+		The resolution of the image.
+		|DEFAULT| 200
+	:type dpi:
+		int
+
+	:returns:
+		The image, and its width and height in pixels.
+	:rtype:
+		tuple of (bytes, float, float)
+	"""
+	if image_format not in _image_mime_types:
+		raise Exception('Unknown image format %s.' % image_format)
+
+	from matplotlib.backends.backend_agg import FigureCanvasAgg
+	from matplotlib.figure import Figure
+
+	figure = Figure(dpi=dpi)
+	FigureCanvasAgg(figure)
+	drawGradesChart(figure, student_names, subjects, grades)
+
+	image = io.BytesIO()
+	figure.savefig(image, format=image_format, dpi=dpi)
+	width, height = figure.get_size_inches() * dpi
+
+	return image.getvalue(), width, height
+
+
+def renderGradesSvg(student_names, subjects, grades, width=640, height=480):
+	"""
+	Render a bar chart of the grades of the students directly as SVG markup,
+	without matplotlib: one group of bars per student and one bar per
+	subject, on a grades axis from 0 to 10.
+
+	:param student_names:
+		The names of the students.
+	:type student_names:
+		list of str
+
+	:param subjects:
+		The subjects of the columns of the grades.
+	:type subjects:
+		tuple of str
+
+	:param grades:
+		The grades, one row per student and one column per subject.
+	:type grades:
+		``numpy.ndarray``
+
+	:param width:
+		The width of the chart in pixels.
+		|DEFAULT| 640
+	:type width:
+		int
+
+	:param height:
+		The height of the chart in pixels.
+		|DEFAULT| 480
+	:type height:
+		int
+
+	:returns:
+		The SVG element.
+	:rtype:
+		str
+	"""
+	# The plot area, inside the margins of the labels and the legend.
+	left, right, top, bottom = 60, width - 20, 40, height - 60
+	plot_width, plot_height = right - left, bottom - top
+	group_width = plot_width / max(len(student_names), 1)
+	bar_width = 0.8 * group_width / len(subjects)
+
+	elements = [
+		'<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" font-family="sans-serif" '
+		'font-size="12">' % (width, height)
+	]
+
+	# The grid lines and ticks of the grades.
+	for grade in range(0, 11, 2):
+		y = bottom - grade * plot_height / 10.0
+		elements.append(
+			'<line x1="%d" y1="%.1f" x2="%d" y2="%.1f" stroke="#dddddd"/>'
+			'<text x="%d" y="%.1f" text-anchor="end">%d</text>' % (left, y, right, y, left - 6, y + 4, grade))
+
+	# The bars, positioned all at once from the grades matrix.
+	grades = numpy.asarray(grades)
+	bar_heights = grades * (plot_height / 10.0)
+	for column, subject in enumerate(subjects):
+		color = _subject_colors[column % len(_subject_colors)]
+		x_positions = left + group_width * (numpy.arange(len(student_names)) + 0.1) + column * bar_width
+		elements.extend(
+			'<rect x="%.1f" y="%.1f" width="%.1f" height="%.1f" fill="%s"/>' % (
+				x, bottom - bar_height, bar_width, bar_height, color)
+			for x, bar_height in zip(x_positions.tolist(), bar_heights[:, column].tolist()))
+
+		# The legend, above the plot area.
+		elements.append(
+			'<rect x="%d" y="12" width="12" height="12" fill="%s"/><text x="%d" y="22">%s</text>' % (
+				left + 90 * column, color, left + 90 * column + 16, html.escape(subject.capitalize())))
+
+	# The axes and their labels.
+	elements.append(
+		'<line x1="%d" y1="%d" x2="%d" y2="%d" stroke="black"/>'
+		'<line x1="%d" y1="%d" x2="%d" y2="%d" stroke="black"/>' % (
+			left, top, left, bottom, left, bottom, right, bottom))
+	elements.extend(
+		'<text x="%.1f" y="%d" text-anchor="middle">%s</text>' % (
+			left + group_width * (index + 0.5), bottom + 18, html.escape(name))
+		for index, name in enumerate(student_names))
+	elements.append(
+		'<text x="%.1f" y="%d" text-anchor="middle" font-size="16">Student</text>'
+		'<text x="16" y="%.1f" text-anchor="middle" font-size="16" transform="rotate(-90 16 %.1f)">'
+		'Grade</text>' % (left + plot_width / 2.0, height - 16, top + plot_height / 2.0, top + plot_height / 2.0))
+
+	elements.append('</svg>')
+	return ''.join(elements)
+
+
+def gradesHtml(title, image_element):
+	"""
+	:returns:
+		The html page of a report, showing the given image element.
+	:rtype:
+		str
+	"""
+	# Define a html template and add the image.
+	return textwrap.dedent("""\
+		<html>
+		<head>
+		<title>{}</title>
+		</head>
+		<body>
+		<h2>Visualization of grades</h2>
+
+		{}
+
+		</body>
+		</html>""").format(html.escape(title, quote=False), image_element)
+
+
+def writeGradesReport(
+		html_filename,
+		title,
+		student_names,
+		subjects,
+		grades,
+		image_format='png',
+		inline_image=True,
+		dpi=200,
+		renderer='matplotlib'):
+	"""
+	Write the html report of the grades of the students of a teacher.
+
+	:param html_filename:
+		The name of the html file.
+	:type html_filename:
+		str
+
+	:param title:
+		The title of the report.
+	:type title:
+		str
+
+	:param student_names:
+		The names of the students.
+	:type student_names:
+		list of str
+
+	:param subjects:
+		The subjects of the columns of the grades.
+	:type subjects:
+		tuple of str
+
+	:param grades:
+		The grades, one row per student and one column per subject.
+	:type grades:
+		``numpy.ndarray``
+
+	:param image_format:
+		The format of the image drawn by matplotlib: 'png' or 'svg'.
+		|DEFAULT| 'png'
+	:type image_format:
+		str
+
+	:param inline_image:
+		Whether the image is embedded in the html file, encoded in base64 or
+		as SVG markup, instead of being written next to it, under the name of
+		the html file with the suffix ``_grades``.
+		|DEFAULT| True
+	:type inline_image:
+		bool
+
+	:param dpi:
+		The resolution of the image drawn by matplotlib.
+		|DEFAULT| 200
+	:type dpi:
+		int
+
+	:param renderer:
+		How the chart is drawn: 'matplotlib', or 'svg' for SVG markup written
+		directly, without matplotlib and in a fraction of the time.
+		|DEFAULT| 'matplotlib'
+	:type renderer:
+		str
+	"""
+	if renderer == 'svg':
+		svg = renderGradesSvg(student_names, subjects, grades)
+		image, image_format = svg.encode('utf-8'), 'svg'
+		width, height = 640, 480
+	elif renderer == 'matplotlib':
+		image, width, height = renderGradesImage(
+			student_names, subjects, grades, image_format=image_format, dpi=dpi)
+	else:
+		raise Exception('Unknown renderer %s.' % renderer)
+
+	if inline_image and renderer == 'svg':
+		image_element = svg
+	else:
+		if inline_image:
+			image_source = 'data:%s;base64,%s' % (
+				_image_mime_types[image_format], base64.b64encode(image).decode('ascii'))
+		else:
+			image_filename = os.path.splitext(html_filename)[0] + '_grades.' + image_format
+			with open(image_filename, 'wb') as f:
+				f.write(image)
+			image_source = os.path.basename(image_filename)
+
+		image_element = '<img src="%s" alt="Grades" width="%s" height="%s">' % (image_source, width, height)
+
+	# Write the image to the given html file.
+	with open(html_filename, 'w') as f:
+		f.write(gradesHtml(title, image_element))
+
+
+def _writeGradesReports(jobs, **report_options):
+	"""
+	Utility method run by the workers of :func:`generateGradesReports`: writes
+	the reports of a list of jobs.
+	"""
+	for html_filename, title, student_names, subjects, grades in jobs:
+		writeGradesReport(html_filename, title, student_names, subjects, grades, **report_options)
+
+	return len(jobs)
+
+
+def generateGradesReports(
+		teachers,
+		html_filenames,
+		number_of_workers=None,
+		use_threads=False,
+		chunk_size=16,
+		**report_options):
+	"""
+	Write the html reports of many teachers in a pool of workers. Only the
+	names, subjects and grades of the teachers are sent to the workers.
+
+	:param teachers:
+		The teachers.
+	:type teachers:
+		list of :class:`TeacherJessica` | :class:`TeacherArya`
+
+	:param html_filenames:
+		The name of the html file of each teacher.
+	:type html_filenames:
+		list of str
+
+	:param number_of_workers:
+		The number of workers.
+		|DEFAULT| The number of processors.
+	:type number_of_workers:
+		None | int
+
+	:param use_threads:
+		Whether the workers are threads instead of processes.
+		|DEFAULT| False
+	:type use_threads:
+		bool
+
+	:param chunk_size:
+		The number of reports sent to a worker at a time.
+		|DEFAULT| 16
+	:type chunk_size:
+		int
+
+	:param report_options:
+		The options of the reports, see :func:`writeGradesReport`.
+	:type report_options:
+		dict
+	"""
+	if len(teachers) != len(html_filenames):
+		raise Exception('The number of html files must match the number of teachers.')
+
+	jobs = [
+		(html_filename, teacherReportTitle(teacher), teacher.studentNames(), teacher.subjects(),
+			teacher.studentGradesMatrix())
+		for teacher, html_filename in zip(teachers, html_filenames)
+	]
+
+	number_of_workers = number_of_workers or os.cpu_count() or 1
+	executor_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+	with executor_class(max_workers=number_of_workers) as executor:
+		futures = [
+			executor.submit(_writeGradesReports, jobs[start:start + chunk_size], **report_options)
+			for start in range(0, len(jobs), chunk_size)
+		]
+		for future in futures:
+			future.result()
+
+
+def generateDataBaseGradesReports(database, directory, **options):
+	"""
+	Write the html report of each teacher of a database, to the file named
+	after the ID of the teacher in the given directory.
+
+	:param database:
+		The database.
+	:type database:
+		:class:`TeachersDataBase`
+
+	:param directory:
+		The directory of the reports, which is created if needed.
+	:type directory:
+		str
+
+	:param options:
+		The options of :func:`generateGradesReports`.
+	:type options:
+		dict
+
+	:returns:
+		The name of the html file of each teacher, keyed by the teacher ID.
+	:rtype:
+		dict of type {str: str}
+	"""
+	os.makedirs(directory, exist_ok=True)
+
+	teachers_and_ids = database.snapshot().teachersAndIds()
+	html_filenames = {
+		teacher_id: os.path.join(directory, teacher_id + '.html') for teacher_id, _ in teachers_and_ids
+	}
+	generateGradesReports(
+		[teacher for _, teacher in teachers_and_ids], list(html_filenames.values()), **options)
+
+	return html_filenames
@@ -0,0 +1,505 @@
+"""
+Module implementing an asyncio service which serves one database of teachers
+to many clients over a local TCP socket, and the matching client.
+
+The protocol is JSON Lines: each request is one line holding a dict with an
+"id", chosen by the client, the "method" and its "params". Each response is
+one line holding the "id" of its request and either the "result" or the
+"error" message. A client may send many requests on a connection without
+waiting for the responses, which may come back in any order.
+
+Teachers are sent in the format of :func:`TeachersDataBase.teacherToRecord`.
+"""
+
+import asyncio
+import itertools
+import json
+import numpy
+import threading
+
+from TeachersDataBase import teacherFromRecord
+from TeachersDataBase import teacherToRecord
+
+
+# The longest line of the protocol, which must hold the largest teacher.
+MAXIMUM_LINE_LENGTH = 1 << 28
+
+
+def _jsonCompatible(value):
+	"""
+	Utility method for converting the result of a method of the database into
+	JSON-compatible data.
+	"""
+	if isinstance(value, numpy.ndarray):
+		return value.tolist()
+	if isinstance(value, numpy.generic):
+		return value.item()
+	if isinstance(value, (set, frozenset)):
+		return sorted(value)
+	if isinstance(value, (list, tuple)):
+		return [_jsonCompatible(item) for item in value]
+	if isinstance(value, dict):
+		return {key: _jsonCompatible(item) for key, item in value.items()}
+
+	return value
+
+
+class TeachersService(object):
+
+	# The methods of the database served as they are.
+	_database_methods = frozenset([
+		'numberOfEntries',
+		'determineSuccessAverage',
+		'determineSuccessStandardDeviation',
+		'determineSuccessPercentiles',
+		'determineSuccessHistogram',
+		'totalNumberOfStudents',
+		'numberOfTeachersPerType',
+		'teachersWithStudent',
+		'teachersOfType',
+		'teachersWithSuccessBetween',
+		'removeTeacher',
+	])
+
+	def __init__(self, database):
+		"""
+		This class implements an asyncio service which keeps one database of
+		teachers in memory and serves its queries and changes to any number of
+		clients, see :class:`TeachersServiceClient`, so that the clients don't
+		each have to load the database.
+
+		:param database:
+			The database to serve.
+		:type database:
+			:class:`TeachersDataBase`
+		"""
+		self._database = database
+		self._server = None
+		self._clients = {}
+
+	async def start(self, host='127.0.0.1', port=0):
+		"""
+		Start listening for clients.
+
+		:param host:
+			The address to listen on.
+			|DEFAULT| '127.0.0.1'
+		:type host:
+			str
+
+		:param port:
+			The port to listen on, or 0 for any free port.
+			|DEFAULT| 0
+		:type port:
+			int
+
+		:returns:
+			The address and the port listened on.
+		:rtype:
+			tuple of (str, int)
+		"""
+		self._server = await asyncio.start_server(
+			self._serveClient, host, port, limit=MAXIMUM_LINE_LENGTH)
+		return self._server.sockets[0].getsockname()[:2]
+
+	async def close(self):
+		"""
+		Stop listening for clients, and close the connections of the clients.
+		"""
+		if self._server is not None:
+			self._server.close()
+
+			# Closing the connection of a client ends the task serving it.
+			client_tasks = list(self._clients.items())
+			for _, writer in client_tasks:
+				writer.close()
+			await asyncio.gather(*[task for task, _ in client_tasks], return_exceptions=True)
+
+			await self._server.wait_closed()
+			self._server = None
+
+	async def _serveClient(self, reader, writer):
+		"""
+		Utility method answering the requests of one client until it disconnects.
+		"""
+		task = asyncio.current_task()
+		self._clients[task] = writer
+		try:
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+
+				writer.write(self._answer(line).encode() + b'\n')
+				await writer.drain()
+		except ConnectionError:
+			pass
+		finally:
+			del self._clients[task]
+			writer.close()
+			try:
+				await writer.wait_closed()
+			except ConnectionError:
+				pass
+
+	def _answer(self, line):
+		"""
+		Utility method answering one request line.
+		"""
+		request_id = None
+		try:
+			request = json.loads(line)
+			request_id = request.get('id')
+			result = self.call(request['method'], request.get('params', {}))
+			return json.dumps({'id': request_id, 'result': result})
+		except Exception as error:
+			return json.dumps({'id': request_id, 'error': str(error)})
+
+	def call(self, method, params):
+		"""
+		Call a method of the database with JSON-compatible parameters.
+
+		:param method:
+			The name of the method.
+		:type method:
+			str
+
+		:param params:
+			The keyword arguments of the method.
+		:type params:
+			dict
+
+		:returns:
+			The JSON-compatible result of the method.
+		:rtype:
+			object
+		"""
+		if method == 'retrieveTeacher':
+			teacher = self._database.retrieveTeacher(**params)
+			return None if teacher is None else teacherToRecord(teacher)
+
+		if method == 'addTeacher':
+			self._database.addTeacher(params['teacher_id'], teacherFromRecord(params['teacher']))
+			return None
+
+		if method not in self._database_methods:
+			raise Exception('Unknown method %s.' % method)
+
+		return _jsonCompatible(getattr(self._database, method)(**params))
+
+
+class LocalTeachersService(object):
+
+	def __init__(self, database, host='127.0.0.1', port=0):
+		"""
+		This class implements a stand-in server: a :class:`TeachersService`
+		running in an event loop of its own, in a background thread, so that
+		a database can be served from a script or a test without an event loop.
+		Use it as a context manager, or call :meth:`stop`.
+
+		:param database:
+			The database to serve.
+		:type database:
+			:class:`TeachersDataBase`
+
+		:param host:
+			The address to listen on.
+			|DEFAULT| '127.0.0.1'
+		:type host:
+			str
+
+		:param port:
+			The port to listen on, or 0 for any free port.
+			|DEFAULT| 0
+		:type port:
+			int
+		"""
+		self._service = TeachersService(database)
+		self._loop = asyncio.new_event_loop()
+		self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+		self._thread.start()
+
+		self._address = asyncio.run_coroutine_threadsafe(
+			self._service.start(host, port), self._loop).result()
+
+	def address(self):
+		"""
+		:returns:
+			The address and the port of the service.
+		:rtype:
+			tuple of (str, int)
+		"""
+		return self._address
+
+	def stop(self):
+		"""
+		Stop the service and its thread.
+		"""
+		asyncio.run_coroutine_threadsafe(self._service.close(), self._loop).result()
+		self._loop.call_soon_threadsafe(self._loop.stop)
+		self._thread.join()
+		self._loop.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exception_info):
+		self.stop()
+
+
+class _Connection(object):
+
+	def __init__(self, reader, writer):
+		"""
+		This class implements one connection of a :class:`TeachersServiceClient`,
+		on which requests are pipelined: each request is sent at once, and a
+		task resolves the future of each request as its response arrives.
+		"""
+		self._reader = reader
+		self._writer = writer
+		self._pending = {}
+		self._closed = False
+		self._request_ids = itertools.count()
+		self._receiver = asyncio.ensure_future(self._receive())
+
+	def numberOfPendingRequests(self):
+		"""
+		:returns:
+			The number of requests waiting for their response.
+		:rtype:
+			int
+		"""
+		return len(self._pending)
+
+	def isClosed(self):
+		"""
+		:returns:
+			Whether the connection is closed, by either side.
+		:rtype:
+			bool
+		"""
+		return self._closed
+
+	async def call(self, method, params):
+		"""
+		Send a request and wait for its response.
+		"""
+		if self._closed:
+			raise ConnectionError('The connection to the service was closed.')
+
+		request_id = next(self._request_ids)
+		future = asyncio.get_running_loop().create_future()
+		self._pending[request_id] = future
+
+		request = {'id': request_id, 'method': method, 'params': params}
+		self._writer.write(json.dumps(request).encode() + b'\n')
+		await self._writer.drain()
+
+		return await future
+
+	async def _receive(self):
+		"""
+		Utility method resolving the futures of the requests as the responses arrive.
+		"""
+		try:
+			while True:
+				line = await self._reader.readline()
+				if not line:
+					raise ConnectionError('The connection to the service was closed.')
+
+				response = json.loads(line)
+				future = self._pending.pop(response['id'])
+				if 'error' in response:
+					future.set_exception(Exception(response['error']))
+				else:
+					future.set_result(response['result'])
+		except Exception as error:
+			# No request can be answered any more.
+			self._closed = True
+			self._writer.close()
+			for future in self._pending.values():
+				if not future.done():
+					future.set_exception(error)
+			self._pending.clear()
+
+	async def close(self):
+		"""
+		Close the connection.
+		"""
+		self._closed = True
+		self._writer.close()
+		await self._receiver
+
+
+class TeachersServiceClient(object):
+
+	def __init__(self, host, port, pool_size=4):
+		"""
+		This class implements an asyncio client of a :class:`TeachersService`.
+		The client keeps a pool of connections, opened as they are needed, and
+		sends each request on the connection with the fewest requests waiting,
+		without waiting for the earlier requests: many concurrent calls share
+		a few connections. Use it as an async context manager, or call
+		:meth:`close`.
+
+		:param host:
+			The address of the service.
+		:type host:
+			str
+
+		:param port:
+			The port of the service.
+		:type port:
+			int
+
+		:param pool_size:
+			The largest number of connections.
+			|DEFAULT| 4
+		:type pool_size:
+			int
+		"""
+		self._host = host
+		self._port = port
+		self._pool_size = pool_size
+		self._connections = []
+		self._connecting = None
+
+	async def _connection(self):
+		"""
+		Utility method choosing the connection of a request, opening a new one
+		while all connections are busy and the pool is not full.
+		"""
+		while True:
+			# Connections closed by the service are dropped from the pool.
+			self._connections = [
+				connection for connection in self._connections if not connection.isClosed()
+			]
+			idle = [
+				connection for connection in self._connections if connection.numberOfPendingRequests() == 0
+			]
+			if idle:
+				return idle[0]
+
+			# Only one connection is opened at a time.
+			if len(self._connections) < self._pool_size and self._connecting is None:
+				self._connecting = asyncio.ensure_future(asyncio.open_connection(
+					self._host, self._port, limit=MAXIMUM_LINE_LENGTH))
+				try:
+					reader, writer = await self._connecting
+				finally:
+					self._connecting = None
+				connection = _Connection(reader, writer)
+				self._connections.append(connection)
+				return connection
+
+			if self._connections:
+				return min(self._connections, key=_Connection.numberOfPendingRequests)
+
+			# Wait for the first connection to be opened.
+			await asyncio.shield(self._connecting)
+
+	async def call(self, method, **params):
+		"""
+		Call a method of the database of the service.
+
+		:param method:
+			The name of the method.
+		:type method:
+			str
+
+		:returns:
+			The JSON-compatible result of the method: sets are returned as
+			sorted lists, and arrays as lists.
+		:rtype:
+			object
+		"""
+		connection = await self._connection()
+		return await connection.call(method, params)
+
+	async def retrieveTeacher(self, teacher_id):
+		"""
+		:returns:
+			The teacher corresponding to the given ID if found in the database,
+			None otherwise.
+		:rtype:
+			None | :class:`TeacherJessica` | :class`TeacherArya`
+		"""
+		record = await self.call('retrieveTeacher', teacher_id=teacher_id)
+		return None if record is None else teacherFromRecord(record)
+
+	async def addTeacher(self, teacher_id, teacher):
+		"""
+		Add a teacher to the database.
+
+		:param teacher_id:
+			An ID that uniquely determines the teacher.
+		:type teacher_id:
+			str
+
+		:param teacher:
+			The teacher to add to the database.
+		:type teacher:
+			:class:`TeacherJessica` | :class:`TeacherArya`
+		"""
+		await self.call('addTeacher', teacher_id=teacher_id, teacher=teacherToRecord(teacher))
+
+	async def removeTeacher(self, teacher_id):
+		"""
+		Remove a teacher from the database.
+
+		:param teacher_id:
+			An ID that uniquely determines the teacher to remove.
+		:type teacher_id:
+			str
+		"""
+		await self.call('removeTeacher', teacher_id=teacher_id)
+
+	async def numberOfEntries(self):
+		"""
+		:returns:
+			The number of teacher entries in the database.
+		:rtype:
+			int
+		"""
+		return await self.call('numberOfEntries')
+
+	async def determineSuccessAverage(self):
+		"""
+		:returns:
+			The average success rate of the teachers in the database.
+		:rtype:
+			float
+		"""
+		return await self.call('determineSuccessAverage')
+
+	async def determineSuccessStandardDeviation(self):
+		"""
+		:returns:
+			The standard deviation of the success rate of the teachers.
+		:rtype:
+			float
+		"""
+		return await self.call('determineSuccessStandardDeviation')
+
+	async def totalNumberOfStudents(self):
+		"""
+		:returns:
+			The total number of students across all teachers.
+		:rtype:
+			int
+		"""
+		return await self.call('totalNumberOfStudents')
+
+	async def close(self):
+		"""
+		Close all connections.
+		"""
+		connections, self._connections = self._connections, []
+		for connection in connections:
+			await connection.close()
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, *exception_info):
+		await self.close()
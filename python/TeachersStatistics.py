@@ -0,0 +1,395 @@
+""" Module implementing an array-backed table of statistics of the teachers in a database """
+
+import numpy
+
+
+class TeacherStatisticsTable(object):
+
+	def __init__(self, initial_capacity=16):
+		"""
+		This class implements a table holding one row per teacher, with the
+		success of the teacher, the number of students and a code for the type
+		of the teacher. The columns are contiguous numpy arrays, so that the
+		aggregate statistics of all teachers are a single numpy reduction.
+		Rows are added and removed in O(1) amortized time: the arrays grow
+		geometrically, and a removed row is replaced by the last one.
+
+		:param initial_capacity:
+			The number of rows for which memory is reserved initially.
+			|DEFAULT| 16
+		:type initial_capacity:
+			int
+		"""
+		self._success = numpy.empty(initial_capacity, dtype=numpy.float64)
+		self._number_of_students = numpy.empty(initial_capacity, dtype=numpy.int64)
+		self._type_codes = numpy.empty(initial_capacity, dtype=numpy.int16)
+
+		# The teacher ID of each row, and the row of each teacher ID.
+		self._teacher_ids = []
+		self._rows = {}
+
+		# The names of the teacher types, indexed by their code.
+		self._type_names = []
+		self._type_codes_by_name = {}
+
+		# The total number of students is kept up to date on each change.
+		self._total_number_of_students = 0
+
+	def __len__(self):
+		return len(self._teacher_ids)
+
+	def __contains__(self, teacher_id):
+		return teacher_id in self._rows
+
+	def _reserve(self, number_of_rows):
+		"""
+		Utility method for making sure the arrays can hold the given number of rows.
+		"""
+		capacity = len(self._success)
+		if number_of_rows <= capacity:
+			return
+
+		new_capacity = max(number_of_rows, 2 * capacity)
+		for name in ('_success', '_number_of_students', '_type_codes'):
+			old_array = getattr(self, name)
+			new_array = numpy.empty(new_capacity, dtype=old_array.dtype)
+			new_array[:len(self)] = old_array[:len(self)]
+			setattr(self, name, new_array)
+
+	def _typeCode(self, teacher_type):
+		"""
+		:returns:
+			The code of the given teacher type, a new one if the type is new.
+		:rtype:
+			int
+		"""
+		code = self._type_codes_by_name.get(teacher_type)
+		if code is None:
+			code = len(self._type_names)
+			self._type_names.append(teacher_type)
+			self._type_codes_by_name[teacher_type] = code
+
+		return code
+
+	def insert(self, teacher_id, success, number_of_students, teacher_type):
+		"""
+		Add a row for a teacher.
+
+		:param teacher_id:
+			The ID of the teacher, which must not be in the table yet.
+		:type teacher_id:
+			str
+
+		:param success:
+			The success of the teacher.
+		:type success:
+			float
+
+		:param number_of_students:
+			The number of students of the teacher.
+		:type number_of_students:
+			int
+
+		:param teacher_type:
+			The name of the type of the teacher.
+		:type teacher_type:
+			str
+		"""
+		if teacher_id in self._rows:
+			raise Exception('The teacher ID %s is already in the statistics table.' % teacher_id)
+
+		row = len(self)
+		self._reserve(row + 1)
+
+		self._success[row] = success
+		self._number_of_students[row] = number_of_students
+		self._type_codes[row] = self._typeCode(teacher_type)
+		self._teacher_ids.append(teacher_id)
+		self._rows[teacher_id] = row
+
+		self._total_number_of_students += number_of_students
+
+	def insertMany(self, teacher_ids, success_rates, numbers_of_students, teacher_types):
+		"""
+		Add rows for several teachers at once, growing the arrays once.
+
+		:param teacher_ids:
+			The IDs of the teachers, which must be distinct and not in the
+			table yet.
+		:type teacher_ids:
+			list of str
+
+		:param success_rates:
+			The success of each teacher.
+		:type success_rates:
+			list of float
+
+		:param numbers_of_students:
+			The number of students of each teacher.
+		:type numbers_of_students:
+			list of int
+
+		:param teacher_types:
+			The name of the type of each teacher.
+		:type teacher_types:
+			list of str
+		"""
+		for teacher_id in teacher_ids:
+			if teacher_id in self._rows:
+				raise Exception('The teacher ID %s is already in the statistics table.' % teacher_id)
+
+		start = len(self)
+		end = start + len(teacher_ids)
+		self._reserve(end)
+
+		self._success[start:end] = success_rates
+		self._number_of_students[start:end] = numbers_of_students
+		self._type_codes[start:end] = [self._typeCode(teacher_type) for teacher_type in teacher_types]
+		self._teacher_ids.extend(teacher_ids)
+		self._rows.update(zip(teacher_ids, range(start, end)))
+
+		self._total_number_of_students += int(sum(numbers_of_students))
+
+	def update(self, teacher_id, success, number_of_students):
+		"""
+		Update the row of a teacher.
+
+		:param teacher_id:
+			The ID of the teacher.
+		:type teacher_id:
+			str
+
+		:param success:
+			The new success of the teacher.
+		:type success:
+			float
+
+		:param number_of_students:
+			The new number of students of the teacher.
+		:type number_of_students:
+			int
+		"""
+		row = self._rows[teacher_id]
+
+		self._total_number_of_students += number_of_students - int(self._number_of_students[row])
+		self._success[row] = success
+		self._number_of_students[row] = number_of_students
+
+	def remove(self, teacher_id):
+		"""
+		Remove the row of a teacher, by moving the last row in its place.
+
+		:param teacher_id:
+			The ID of the teacher.
+		:type teacher_id:
+			str
+		"""
+		row = self._rows.pop(teacher_id)
+		self._total_number_of_students -= int(self._number_of_students[row])
+
+		last_row = len(self) - 1
+		if row != last_row:
+			self._success[row] = self._success[last_row]
+			self._number_of_students[row] = self._number_of_students[last_row]
+			self._type_codes[row] = self._type_codes[last_row]
+
+			last_teacher_id = self._teacher_ids[last_row]
+			self._teacher_ids[row] = last_teacher_id
+			self._rows[last_teacher_id] = row
+
+		self._teacher_ids.pop()
+
+	def copy(self):
+		"""
+		:returns:
+			A copy of the table, which is not changed by the later changes of
+			this table.
+		:rtype:
+			:class:`TeacherStatisticsTable`
+		"""
+		table = TeacherStatisticsTable(initial_capacity=0)
+		table._success = self._success[:len(self)].copy()
+		table._number_of_students = self._number_of_students[:len(self)].copy()
+		table._type_codes = self._type_codes[:len(self)].copy()
+		table._teacher_ids = list(self._teacher_ids)
+		table._rows = dict(self._rows)
+		table._type_names = list(self._type_names)
+		table._type_codes_by_name = dict(self._type_codes_by_name)
+		table._total_number_of_students = self._total_number_of_students
+		return table
+
+	def clear(self):
+		"""
+		Remove all rows.
+		"""
+		self._teacher_ids = []
+		self._rows = {}
+		self._total_number_of_students = 0
+
+	def teacherIds(self):
+		"""
+		:returns:
+			The teacher IDs, in the order of the rows.
+		:rtype:
+			list of str
+		"""
+		return list(self._teacher_ids)
+
+	def successRates(self):
+		"""
+		:returns:
+			The success of each teacher, in the order of the rows. The array
+			is a read-only view of the table.
+		:rtype:
+			``numpy.ndarray``
+		"""
+		success_rates = self._success[:len(self)]
+		success_rates.flags.writeable = False
+		return success_rates
+
+	def numbersOfStudents(self):
+		"""
+		:returns:
+			The number of students of each teacher, in the order of the rows.
+			The array is a read-only view of the table.
+		:rtype:
+			``numpy.ndarray``
+		"""
+		numbers_of_students = self._number_of_students[:len(self)]
+		numbers_of_students.flags.writeable = False
+		return numbers_of_students
+
+	def _checkNotEmpty(self):
+		"""
+		Utility method raising an exception if the table is empty.
+		"""
+		if len(self) == 0:
+			raise Exception('There are no teachers to calculate statistics of.')
+
+	def successMean(self):
+		"""
+		:returns:
+			The mean success of the teachers.
+		:rtype:
+			float
+		"""
+		self._checkNotEmpty()
+		return float(numpy.mean(self.successRates()))
+
+	def successStandardDeviation(self):
+		"""
+		:returns:
+			The (population) standard deviation of the success of the teachers.
+		:rtype:
+			float
+		"""
+		self._checkNotEmpty()
+		return float(numpy.std(self.successRates()))
+
+	def successMoments(self):
+		"""
+		:returns:
+			The number of teachers, the mean success and the sum of the squared
+			differences of the success from the mean. The moments of several
+			tables can be combined into those of all their teachers, see
+			:func:`combineSuccessMoments`.
+		:rtype:
+			tuple of (int, float, float)
+		"""
+		if len(self) == 0:
+			return 0, 0.0, 0.0
+
+		success_rates = self.successRates()
+		mean = float(numpy.mean(success_rates))
+		deviations = success_rates - mean
+		return len(self), mean, float(numpy.dot(deviations, deviations))
+
+	def successPercentiles(self, percentiles):
+		"""
+		:param percentiles:
+			The percentiles to calculate, between 0 and 100.
+		:type percentiles:
+			float | list of float
+
+		:returns:
+			The percentiles of the success of the teachers.
+		:rtype:
+			float | ``numpy.ndarray``
+		"""
+		self._checkNotEmpty()
+		return numpy.percentile(self.successRates(), percentiles)
+
+	def successHistogram(self, bins=10, success_range=(0.0, 100.0)):
+		"""
+		:param bins:
+			The number of bins, or the bin edges.
+			|DEFAULT| 10
+		:type bins:
+			int | list of float
+
+		:param success_range:
+			The range of success covered by the bins.
+			|DEFAULT| (0.0, 100.0)
+		:type success_range:
+			tuple of (float, float)
+
+		:returns:
+			The number of teachers in each bin, and the bin edges.
+		:rtype:
+			tuple of (``numpy.ndarray``, ``numpy.ndarray``)
+		"""
+		return numpy.histogram(self.successRates(), bins=bins, range=success_range)
+
+	def totalNumberOfStudents(self):
+		"""
+		:returns:
+			The total number of students of all teachers, kept up to date on
+			each change of the table.
+		:rtype:
+			int
+		"""
+		return self._total_number_of_students
+
+	def numberOfTeachersPerType(self):
+		"""
+		:returns:
+			The number of teachers of each type.
+		:rtype:
+			dict of type {str: int}
+		"""
+		counts = numpy.bincount(self._type_codes[:len(self)], minlength=len(self._type_names))
+		return {
+			type_name: int(count) for type_name, count in zip(self._type_names, counts) if count > 0
+		}
+
+
+def combineSuccessMoments(moments):
+	"""
+	Combine the moments of the success of several groups of teachers, as
+	returned by :meth:`TeacherStatisticsTable.successMoments`, into those of
+	all the teachers, with the pairwise update of Chan et al. which is stable
+	for groups of very different means.
+
+	:param moments:
+		The moments of each group.
+	:type moments:
+		iterable of tuple of (int, float, float)
+
+	:returns:
+		The number of teachers, the mean success and the sum of the squared
+		differences of the success from the mean.
+	:rtype:
+		tuple of (int, float, float)
+	"""
+	count, mean, sum_of_squares = 0, 0.0, 0.0
+	for other_count, other_mean, other_sum_of_squares in moments:
+		if other_count == 0:
+			continue
+
+		total_count = count + other_count
+		delta = other_mean - mean
+		mean += delta * other_count / total_count
+		sum_of_squares += other_sum_of_squares + delta * delta * count * other_count / total_count
+		count = total_count
+
+	return count, mean, sum_of_squares
@@ -1,11 +1,20 @@
 """ A module containing unit tests for the classes defined in Teachers module """
 
+import base64
 import os
+import shutil
 import unittest
+import xml.etree.ElementTree
 import numpy
 
+from SerializationBackends import NpzBackend
 from Teachers import TeacherArya
 from Teachers import TeacherJessica
+from Teachers import packUpperTriangular
+from Teachers import teacherType
+from Teachers import unpackUpperTriangular
+from TeachersReports import generateGradesReports
+from TeachersReports import renderGradesSvg
 
 class TeacherJessicaTest(unittest.TestCase):
     """ Test class for the class TeacherJessica """
@@ -40,6 +49,97 @@ class TeacherJessicaTest(unittest.TestCase):
             numpy.array_equal(
                 getting_along_matrix, teacher3.studentsGettingAlongMatrix()))
 
+        # Create a teacher from the grades of another teacher.
+        teacher4 = TeacherJessica(
+            student_math_grades=teacher2.studentMathGrades(),
+            student_art_grades=teacher2.studentArtGrades())
+        self.assertEqual(math_grades, teacher4.studentMathGrades())
+        self.assertEqual(art_grades, teacher4.studentArtGrades())
+
+    def testGradesMatrix(self):
+        """ Test the columnar storage of the grades """
+        # Give the art grades in another order than the math grades.
+        math_grades = {'Kim': 7, 'Nadine': 8, 'Jacob': 9}
+        art_grades = {'Jacob': 5, 'Kim': 8, 'Nadine': 10}
+        teacher = TeacherJessica(
+            student_math_grades=math_grades,
+            student_art_grades=art_grades)
+
+        # The rows follow the order of the math grades.
+        grades = teacher.studentGradesMatrix()
+        self.assertEqual(numpy.int8, grades.dtype)
+        self.assertEqual([[7, 8], [8, 10], [9, 5]], grades.tolist())
+        self.assertEqual(('math', 'art'), teacher.subjects())
+
+        # The matrix can't be changed behind the back of the teacher.
+        with self.assertRaises(ValueError):
+            grades[0, :] = 10
+
+        # The grades are read through views of the matrix.
+        art_view = teacher.studentGrades('art')
+        self.assertEqual(art_grades, art_view)
+        self.assertEqual(10, art_view['Nadine'])
+        self.assertIn('Jacob', art_view)
+        self.assertEqual([8, 10, 5], list(art_view.values()))
+        self.assertEqual(str(art_view.toDict()), str(art_view))
+        with self.assertRaises(TypeError):
+            art_view['Kim'] = 9
+
+    def testFromArrays(self):
+        """ Test the construction of the object from the columnar grades """
+        names = ['Kim', 'Nadine']
+        grades = numpy.array([[7, 6], [8, 9]])
+        teacher = TeacherJessica.fromArrays(names, grades)
+        self.assertEqual({'Kim': 7, 'Nadine': 8}, teacher.studentMathGrades())
+        self.assertEqual({'Kim': 6, 'Nadine': 9}, teacher.studentArtGrades())
+        self.assertEqual(numpy.int8, teacher.studentGradesMatrix().dtype)
+
+        # The teacher doesn't share the given matrix.
+        grades = numpy.array([[7, 6], [8, 9]], dtype=numpy.int8)
+        teacher = TeacherJessica.fromArrays(names, grades)
+        teacher.setStudentGrade('Kim', 'math', 1)
+        self.assertEqual([[7, 6], [8, 9]], grades.tolist())
+
+        # Check that invalid data is rejected, unless it is trusted.
+        invalid_arguments = [
+            (names, numpy.array([[7, 6], [8, 11]])),
+            (names, numpy.array([[7.0, 6.0], [8.0, 9.0]])),
+            (names, numpy.array([[7, 6, 5], [8, 9, 5]])),
+            (['Kim', 'Kim'], grades),
+            (['Kim', 3], grades),
+        ]
+        for arguments in invalid_arguments:
+            with self.assertRaises(Exception):
+                TeacherJessica.fromArrays(*arguments)
+
+        teacher = TeacherJessica.fromArrays(names, numpy.array([[7, 6], [8, 11]]), trusted=True)
+        self.assertEqual(11, teacher.studentArtGrades()['Nadine'])
+
+        # Large rosters are checked in blocks, up to the last one.
+        names = ['student%d' % index for index in range(200000)]
+        grades = numpy.full((len(names), 2), 5, dtype=numpy.int8)
+        self.assertEqual(len(names), TeacherJessica.fromArrays(names, grades).numberOfStudents())
+        for invalid_grade in [0, 11]:
+            grades[-1, 1] = invalid_grade
+            with self.assertRaisesRegex(Exception, 'between 1 and 10'):
+                TeacherJessica.fromArrays(names, grades)
+
+    def testCompactRepresentation(self):
+        """ Test that teachers have no instance dict and share the student names """
+        # Build the names at runtime, so that they are not interned already.
+        first_names = ['student%d' % index for index in range(2)]
+        second_names = ['student%d' % index for index in range(2)]
+        first_teacher = TeacherJessica.fromArrays(first_names, numpy.array([[7, 6], [8, 9]]))
+        second_teacher = TeacherArya.fromArrays(second_names, numpy.array([[7, 6, 5], [8, 9, 10]]))
+
+        for teacher in [first_teacher, second_teacher]:
+            self.assertFalse(hasattr(teacher, '__dict__'))
+            with self.assertRaises(AttributeError):
+                teacher.unknown_attribute = 1
+
+        for first_name, second_name in zip(first_teacher.studentNames(), second_teacher.studentNames()):
+            self.assertIs(first_name, second_name)
+
     def testDetermineAverageGrade(self):
         """ Test the method for calculating the average grade for the students """
         # Set up math grades and art grades for three students and
@@ -60,6 +160,64 @@ class TeacherJessicaTest(unittest.TestCase):
         averages = teacher.determineAverageGrade(weights=[0.1, 0.9])
         self.assertEqual(expected_averages, averages)
 
+        # Check the averages as an array aligned with the student names.
+        averages = teacher.determineAverageGrade(weights=[0.1, 0.9], as_array=True)
+        self.assertEqual(list(expected_averages.values()), averages.tolist())
+
+        # Check that invalid weights are rejected.
+        with self.assertRaises(Exception):
+            teacher.determineAverageGrade(weights=[0.1, 0.8, 0.1])
+        with self.assertRaises(Exception):
+            teacher.determineAverageGrade(weights=[0.0, 0.0])
+
+    def testDetermineAverageGradeLargeRoster(self):
+        """ Test the vectorized averages against the per-student average """
+        random_number_generator = numpy.random.default_rng(3)
+        names = ['student%d' % index for index in range(1000)]
+        math_grades = random_number_generator.integers(1, 11, size=len(names))
+        art_grades = random_number_generator.integers(1, 11, size=len(names))
+        teacher = TeacherJessica(
+            student_math_grades=dict(zip(names, math_grades.tolist())),
+            student_art_grades=dict(zip(names, art_grades.tolist())))
+
+        weights = [0.3, 0.7]
+        averages = teacher.determineAverageGrade(weights=weights)
+        for name, math_grade, art_grade in zip(names, math_grades, art_grades):
+            self.assertEqual(
+                numpy.average([math_grade, art_grade], weights=weights), averages[name])
+
+    def testDetermineAverageGradeScenarios(self):
+        """ Test the averages under many weightings against the averages of each weighting """
+        random_number_generator = numpy.random.default_rng(4)
+        names = ['student%d' % index for index in range(100)]
+        grades = random_number_generator.integers(1, 11, size=(len(names), 3))
+        weights_matrix = random_number_generator.random((20, 3))
+        teacher_jessica = TeacherJessica.fromArrays(names, grades[:, :2])
+        teacher_arya = TeacherArya.fromArrays(names, grades)
+
+        for teacher in [teacher_jessica, teacher_arya]:
+            number_of_subjects = len(teacher.subjects())
+            averages = teacher.determineAverageGradeScenarios(weights_matrix[:, :number_of_subjects])
+            self.assertEqual((100, 20), averages.shape)
+            for scenario, weights in enumerate(weights_matrix[:, :number_of_subjects]):
+                self.assertTrue(numpy.allclose(
+                    teacher.determineAverageGrade(weights=weights, as_array=True),
+                    averages[:, scenario], atol=0.01))
+
+        # Subjects not taught by the teacher are left out.
+        averages = teacher_jessica.determineAverageGradeScenarios(
+            weights_matrix, subjects=['math', 'art', 'science'])
+        self.assertTrue(numpy.allclose(
+            teacher_jessica.determineAverageGradeScenarios(weights_matrix[:, :2]), averages))
+
+        # Check that invalid weights are rejected.
+        with self.assertRaises(Exception):
+            teacher_jessica.determineAverageGradeScenarios(weights_matrix)
+        with self.assertRaises(Exception):
+            teacher_jessica.determineAverageGradeScenarios([[0.5, 0.5], [0.0, 0.0]])
+        with self.assertRaises(Exception):
+            teacher_jessica.determineAverageGradeScenarios([[1.0]], subjects=['science'])
+
     def testCalculateTeacherSuccess(self):
         """ Test the method for calculating the success of a teacher """
         # Set up math grades and a perfectly getting along set of students.
@@ -96,6 +254,160 @@ class TeacherJessicaTest(unittest.TestCase):
         self.assertGreater(teacher_success, 60)
         self.assertLess(teacher_success, 90)
 
+        # Without a matrix, the success of the default matrix is given.
+        teacher = TeacherJessica(student_math_grades=math_grades)
+        default_matrix = numpy.array([[1.0, 0.5], [0.0, 1.0]])
+        teacher_with_default = TeacherJessica(
+            student_math_grades=math_grades,
+            students_getting_along_matrix=default_matrix)
+        self.assertEqual(
+            teacher_with_default.calculateTeacherSuccess(), teacher.calculateTeacherSuccess())
+
+    def testCachedMetrics(self):
+        """ Test that the derived metrics are cached until the data changes """
+        math_grades = {'Kim': 7, 'Nadine': 8}
+        teacher = TeacherJessica(
+            student_math_grades=math_grades,
+            students_getting_along_matrix=numpy.ones((2, 2)))
+        changes = []
+        teacher.addObserver(changes.append)
+
+        # The averages and the success are computed once.
+        averages = teacher.determineAverageGrade(as_array=True)
+        self.assertIs(averages, teacher.determineAverageGrade(as_array=True))
+        self.assertFalse(averages.flags.writeable)
+        self.assertEqual(100.0, teacher.calculateTeacherSuccess())
+
+        # Only the averages with the last custom weights are kept besides.
+        weighted_averages = teacher.determineAverageGrade(weights=[0.1, 0.9], as_array=True)
+        self.assertIs(weighted_averages, teacher.determineAverageGrade(weights=[0.1, 0.9], as_array=True))
+        for weight in numpy.linspace(0.1, 0.9, 50):
+            teacher.determineAverageGrade(weights=[weight, 1 - weight], as_array=True)
+        self.assertEqual(
+            {'average_grades', 'weighted_average_grades', 'success'}, set(teacher._derived_metrics))
+        self.assertIsNot(weighted_averages, teacher.determineAverageGrade(weights=[0.1, 0.9], as_array=True))
+        self.assertIs(averages, teacher.determineAverageGrade(as_array=True))
+
+        # Changing a grade invalidates the averages and notifies the observers.
+        teacher.setStudentGrade('Kim', 'art', 10)
+        self.assertEqual({'Kim': 8.5, 'Nadine': 8.0}, teacher.determineAverageGrade())
+        self.assertEqual([teacher], changes)
+
+        # Changing the getting-along matrix invalidates the success.
+        teacher.setStudentsGettingAlongMatrix(numpy.zeros((2, 2)))
+        self.assertEqual(0.0, teacher.calculateTeacherSuccess())
+        self.assertEqual(2, len(changes))
+
+        # Invalid changes are rejected and no observer is notified.
+        with self.assertRaises(Exception):
+            teacher.setStudentGrade('Kim', 'art', 11)
+        with self.assertRaises(Exception):
+            teacher.setStudentGrade('Jacob', 'art', 5)
+        teacher.removeObserver(changes.append)
+        teacher.setStudentGrade('Kim', 'math', 5)
+        self.assertEqual(2, len(changes))
+
+    def testGettingAlongMatrixStorage(self):
+        """ Test the success with packed, low precision and sparse matrices """
+        from scipy.sparse import csr_matrix
+
+        names = ['student%d' % index for index in range(50)]
+        math_grades = {name: 7 for name in names}
+        random_number_generator = numpy.random.default_rng(5)
+        getting_along_matrix = numpy.triu(random_number_generator.random((50, 50)))
+        expected_success = TeacherJessica(
+            student_math_grades=math_grades,
+            students_getting_along_matrix=getting_along_matrix).calculateTeacherSuccess()
+
+        # The packed upper triangle gives the same success in double precision,
+        # and nearly the same in single and half precision.
+        packed = packUpperTriangular(getting_along_matrix)
+        self.assertEqual((50 * 51 // 2,), packed.shape)
+        self.assertTrue(numpy.array_equal(getting_along_matrix, unpackUpperTriangular(packed, 50)))
+        for dtype, delta in [(numpy.float64, 0.0), (numpy.float32, 0.01), (numpy.float16, 0.1)]:
+            teacher = TeacherJessica(
+                student_math_grades=math_grades,
+                students_getting_along_matrix=packUpperTriangular(getting_along_matrix, dtype=dtype))
+            self.assertEqual(dtype, teacher.studentsGettingAlongMatrix().dtype)
+            self.assertAlmostEqual(expected_success, teacher.calculateTeacherSuccess(), delta=delta)
+
+        # Same with a sparse matrix.
+        teacher = TeacherJessica(
+            student_math_grades=math_grades,
+            students_getting_along_matrix=csr_matrix(getting_along_matrix))
+        self.assertAlmostEqual(expected_success, teacher.calculateTeacherSuccess(), delta=0.01)
+
+        # A matrix not matching the number of students is rejected.
+        with self.assertRaises(Exception):
+            TeacherJessica(
+                student_math_grades=math_grades,
+                students_getting_along_matrix=numpy.ones((3, 3)))
+
+    def testIncrementalGettingAlong(self):
+        """ Test that changing entries and rows of the matrix keeps the success up to date """
+        from scipy.sparse import csr_matrix
+
+        names = ['student%d' % index for index in range(20)]
+        math_grades = {name: 7 for name in names}
+        random_number_generator = numpy.random.default_rng(7)
+        getting_along_matrix = numpy.triu(random_number_generator.random((20, 20)))
+        new_row = numpy.zeros(20)
+        new_row[3:] = random_number_generator.random(17)
+
+        for storage in [
+                None,
+                getting_along_matrix.copy(),
+                packUpperTriangular(getting_along_matrix),
+                csr_matrix(getting_along_matrix)]:
+            teacher = TeacherJessica(
+                student_math_grades=math_grades, students_getting_along_matrix=storage)
+            changes = []
+            teacher.addObserver(changes.append)
+            teacher.determineAverageGrade(as_array=True)
+            teacher.calculateTeacherSuccess()
+
+            teacher.setStudentsGettingAlong('student1', 'student5', 0.25)
+            teacher.setStudentsGettingAlong('student4', 'student4', 0.0)
+            teacher.setStudentGettingAlongRow('student3', new_row)
+            self.assertEqual(3, len(changes))
+
+            # The success matches that of a teacher with the changed matrix.
+            matrix = teacher.studentsGettingAlongMatrix()
+            expected_teacher = TeacherJessica(
+                student_math_grades=math_grades, students_getting_along_matrix=matrix.copy())
+            self.assertAlmostEqual(
+                expected_teacher.calculateTeacherSuccess(), teacher.calculateTeacherSuccess(), places=6)
+            if matrix.ndim == 1:
+                matrix = unpackUpperTriangular(matrix, 20)
+            elif not isinstance(matrix, numpy.ndarray):
+                matrix = matrix.toarray()
+            self.assertEqual(0.25, matrix[1, 5])
+            self.assertEqual(0.0, matrix[4, 4])
+            self.assertTrue(numpy.array_equal(new_row, matrix[3]))
+
+        # The entries before the diagonal of a packed matrix can't be set, and
+        # the students must be students of the teacher.
+        teacher = TeacherJessica(
+            student_math_grades=math_grades,
+            students_getting_along_matrix=packUpperTriangular(getting_along_matrix))
+        with self.assertRaises(Exception):
+            teacher.setStudentsGettingAlong('student5', 'student1', 0.25)
+        with self.assertRaises(Exception):
+            teacher.setStudentGettingAlongRow('student3', numpy.ones(20))
+        with self.assertRaises(Exception):
+            teacher.setStudentsGettingAlong('Jacob', 'student1', 0.25)
+
+        # Zeroing a full matrix entry by entry gives no success at all, and
+        # not a negative sum of squares from the rounding errors.
+        teacher = TeacherJessica(
+            student_math_grades=math_grades,
+            students_getting_along_matrix=100 * random_number_generator.random((20, 20)))
+        for name in names:
+            for other_name in names:
+                teacher.setStudentsGettingAlong(name, other_name, 0.0)
+                self.assertGreaterEqual(teacher.calculateTeacherSuccess(), 0.0)
+        self.assertEqual(0.0, teacher.calculateTeacherSuccess())
+
     def testSerialization(self):
         """ Test that a TeacherJessica object can be serialized """
         # Create an object.
@@ -125,6 +437,25 @@ class TeacherJessicaTest(unittest.TestCase):
         # Remove the temp file.
         os.remove(filename)
 
+    def testTeacherTypeRegistry(self):
+        """ Test the lookup of the teacher classes by name """
+        self.assertIs(TeacherArya, teacherType('TeacherArya'))
+        self.assertIs(TeacherJessica, teacherType('TeacherJessica'))
+        with self.assertRaises(Exception):
+            teacherType('__import__')
+
+    def testSerializationSchema(self):
+        """ Test that the cached serialization schema is computed per class """
+        # Fetch the base class schema first, so that it is cached before the
+        # schema of the inherited class is computed.
+        jessica_names = [prop.name for prop in TeacherJessica._serializationSchema()]
+        arya_names = [prop.name for prop in TeacherArya._serializationSchema()]
+        self.assertNotIn('student_science_grades', jessica_names)
+        self.assertIn('student_science_grades', arya_names)
+
+        # The schema is computed only once.
+        self.assertIs(TeacherArya._serializationSchema(), TeacherArya._serializationSchema())
+
 
     # TODO: a unit test for html image generation and tests for TeacherArya.
 
@@ -132,6 +463,23 @@ class TeacherJessicaTest(unittest.TestCase):
 class TeacherAryaTest(unittest.TestCase):
     """ Test class for the class TeacherArya """
 
+    def testDetermineAverageGrade(self):
+        """ Test the method for calculating the average grade for the students """
+        math_grades = {'Kim': 7, 'Nadine': 8}
+        art_grades = {'Kim': 8, 'Nadine': 10}
+        science_grades = {'Nadine': 9, 'Kim': 5}
+        teacher = TeacherArya(
+            student_math_grades=math_grades,
+            student_science_grades=science_grades,
+            student_art_grades=art_grades)
+
+        # Check the science column and the rounded averages.
+        self.assertEqual(science_grades, teacher.studentScienceGrades())
+        self.assertEqual({'Kim': 6.67, 'Nadine': 9.0}, teacher.determineAverageGrade())
+        self.assertEqual(
+            {'Kim': 5.4, 'Nadine': 8.8},
+            teacher.determineAverageGrade(weights=[0.2, 0.0, 0.8]))
+
     def testSerialization(self):
         """ Test that a TeacherJessica object can be serialized """
         # Create an object.
@@ -164,6 +512,106 @@ class TeacherAryaTest(unittest.TestCase):
         # Remove the temp file.
         os.remove(filename)
 
+    def testSerializationBackends(self):
+        """ Test that a TeacherArya object round-trips through each file format """
+        math_grades = {'Kim': 7, 'Nadine': 8}
+        science_grades = {'Kim': 5, 'Nadine': 9}
+        getting_along_matrix = numpy.array([[0.9, 0.6], [0.6, 0.7]])
+        teacher = TeacherArya(
+            student_math_grades=math_grades,
+            student_science_grades=science_grades,
+            students_getting_along_matrix=getting_along_matrix)
+
+        # The format is selected by the extension of the file name.
+        for filename in ['test_file.h5', 'test_file.npz', 'test_file.msgpack']:
+            teacher.saveToFile(filename)
+            read_teacher = TeacherArya.instantiateFromFile(filename)
+
+            self.assertEqual(math_grades, read_teacher.studentMathGrades())
+            self.assertEqual(science_grades, read_teacher.studentScienceGrades())
+            self.assertTrue(numpy.array_equal(
+                getting_along_matrix, read_teacher.studentsGettingAlongMatrix())
+            )
+
+            os.remove(filename)
+
+        # Check that the npz arrays can be memory-mapped.
+        filename = 'test_file.npz'
+        teacher.saveToFile(filename)
+        read_teacher = TeacherArya.instantiateFromFile(
+            filename, backend=NpzBackend(mmap_mode='r'))
+        self.assertIsInstance(read_teacher.studentsGettingAlongMatrix(), numpy.memmap)
+        self.assertTrue(numpy.array_equal(
+            getting_along_matrix, read_teacher.studentsGettingAlongMatrix())
+        )
+        del read_teacher
+        os.remove(filename)
+
+        # A teacher without a getting-along matrix round-trips too.
+        teacher = TeacherJessica(student_math_grades=math_grades)
+        teacher.saveToFile(filename)
+        read_teacher = TeacherJessica.instantiateFromFile(filename)
+        self.assertIsNone(read_teacher.studentsGettingAlongMatrix())
+        self.assertEqual(teacher.calculateTeacherSuccess(), read_teacher.calculateTeacherSuccess())
+        os.remove(filename)
+
+    def testHtmlVisualization(self):
+        """ Test the html visualizations of the grades, one at a time and in a pool of workers """
+        teacher = TeacherArya(
+            student_math_grades={'Kim': 7, 'Nadine': 8},
+            student_science_grades={'Kim': 5, 'Nadine': 9})
+
+        # The image is written next to the html file, under its name.
+        teacher.generateHtmlVisualization('test_report.html')
+        with open('test_report.html') as f:
+            self.assertIn('<img src="test_report_grades.png"', f.read())
+        with open('test_report_grades.png', 'rb') as f:
+            self.assertEqual(b'\x89PNG', f.read(4))
+        os.remove('test_report.html')
+        os.remove('test_report_grades.png')
+
+        # Many reports with embedded images, by processes and by threads.
+        teachers = [teacher, TeacherJessica(student_math_grades={'Kim': 7, 'Nadine': 8})] * 3
+        os.makedirs('test_reports', exist_ok=True)
+        html_filenames = [os.path.join('test_reports', '%d.html' % index) for index in range(6)]
+        for use_threads in [False, True]:
+            generateGradesReports(
+                teachers, html_filenames, number_of_workers=2, use_threads=use_threads, chunk_size=2,
+                image_format='svg', dpi=50)
+            with open(html_filenames[1]) as f:
+                html = f.read()
+            self.assertIn("Grades of Jessica's students", html)
+            image = html.split('data:image/svg+xml;base64,')[1].split('"')[0]
+            self.assertIn(b'<svg', base64.b64decode(image))
+
+        self.assertEqual(
+            sorted(os.path.basename(name) for name in html_filenames), sorted(os.listdir('test_reports')))
+        shutil.rmtree('test_reports')
+
+    def testSvgRenderer(self):
+        """ Test the charts written as SVG markup without matplotlib """
+        names = ['Kim', 'Nadine & Jacob']
+        grades = numpy.array([[7, 6, 5], [8, 9, 10]])
+        svg = xml.etree.ElementTree.fromstring(renderGradesSvg(names, ('math', 'art', 'science'), grades))
+
+        # One bar per student and subject, plus one legend entry per subject.
+        rectangles = svg.findall('{http://www.w3.org/2000/svg}rect')
+        self.assertEqual(6 + 3, len(rectangles))
+        texts = [text.text for text in svg.findall('{http://www.w3.org/2000/svg}text')]
+        self.assertIn('Nadine & Jacob', texts)
+        self.assertIn('Science', texts)
+
+        # The bars are proportional to the grades.
+        bar_heights = [float(rectangle.get('height')) for rectangle in rectangles[:2]]
+        self.assertAlmostEqual(7.0 / 8.0, bar_heights[0] / bar_heights[1])
+
+        # The chart is embedded in the html file.
+        teacher = TeacherArya.fromArrays(names, grades)
+        teacher.generateHtmlVisualization('test_report.html', inline_image=True, renderer='svg')
+        with open('test_report.html') as f:
+            self.assertIn('<svg xmlns=', f.read())
+        os.remove('test_report.html')
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -70,10 +70,8 @@ print('Math (Teacher Arya):', teacher_arya1.studentMathGrades())
 # Print the average grade.
 print('Average (Teacher Arya):', teacher_arya1.determineAverageGrade())
 
-# Catch the exception from trying to create a visualization.
-try:
-	teacher_arya1.generateHtmlVisualization(html_filename='new.html')
-except Exception as ex:
-	print("""\n Teacher Arya's grades could not be visualized because:""", ex)
+# Generate a visualization of all three subjects, with the image embedded
+# in the html file.
+teacher_arya1.generateHtmlVisualization(html_filename='new.html', inline_image=True)
 
 